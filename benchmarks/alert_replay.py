@@ -0,0 +1,117 @@
+"""Alert rule replay harness for Raki AI
+
+Feeds a metric trace through the alert rules and reports how many rule
+evaluations and alerts it produced, next to the number of announcements the
+old "speak every issue every 5 minutes" monitor would have made.
+
+    python benchmarks/alert_replay.py                      # synthetic trace
+    python benchmarks/alert_replay.py --record 600 --out trace.jsonl
+    python benchmarks/alert_replay.py --trace trace.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import raki_ai
+
+
+def synthetic_trace(hours, interval, seed):
+    """Noisy load with a few sustained CPU spikes and a slow RAM leak"""
+    rng = random.Random(seed)
+    start = 1_700_000_000.0
+    samples = int(hours * 3600 / interval)
+    battery = 100.0
+    for i in range(samples):
+        t = start + i * interval
+        minute = i * interval / 60
+        spike = 50 if (minute % 90) < 12 else 0
+        battery = max(3.0, battery - interval / 240)
+        yield t, {
+            'cpu': min(100.0, max(0.0, 45 + spike + rng.gauss(0, 6))),
+            'ram': min(100.0, 60 + minute * 0.05 + rng.gauss(0, 1)),
+            'disk': 89.5 + 0.8 * math.sin(minute / 20),
+            'temperature': 60 + spike / 2 + rng.gauss(0, 2),
+            'battery': battery,
+            'battery_plugged': 0.0,
+            'net_sent': rng.uniform(0, 5e4),
+            'net_recv': rng.uniform(0, 5e5)
+        }
+
+
+def load_trace(path):
+    """Read a JSON Lines trace of {"time": ..., "sample": {...}} records"""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record['time'], record['sample']
+
+
+def record_trace(seconds, interval, path):
+    """Sample this machine for a while and write the trace"""
+    sampler = raki_ai.MetricsSampler(interval=interval, capacity=int(seconds / interval) + 1)
+    sampler.start()
+    time.sleep(seconds)
+    sampler.stop()
+    with open(path, 'w') as f:
+        for timestamp, sample in sampler.export_trace():
+            f.write(json.dumps({'time': timestamp, 'sample': sample}) + "\n")
+
+
+def naive_announcements(trace, rules, period=300):
+    """Count announcements made by checking thresholds every `period` seconds"""
+    count = 0
+    next_check = None
+    for timestamp, sample in trace:
+        if next_check is None:
+            next_check = timestamp + period
+        if timestamp < next_check:
+            continue
+        next_check += period
+        if any(sample.get(r['metric']) is not None and r.get('kind', 'threshold') == 'threshold'
+               and all(sample.get(m) == v for m, v in r.get('only_if', {}).items())
+               and (sample[r['metric']] > r['threshold'] if r.get('direction', 'above') == 'above'
+                    else sample[r['metric']] < r['threshold'])
+               for r in rules):
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trace', help="JSON Lines trace to replay")
+    parser.add_argument('--hours', type=float, default=24, help="length of the synthetic trace")
+    parser.add_argument('--interval', type=float, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--record', type=float, metavar='SECONDS',
+                        help="record a live trace instead of replaying")
+    parser.add_argument('--out', default='metrics_trace.jsonl')
+    parser.add_argument('--events', action='store_true', help="include every alert event")
+    args = parser.parse_args()
+
+    if args.record:
+        record_trace(args.record, args.interval, args.out)
+        print(json.dumps({'recorded': args.out}))
+        return
+
+    if args.trace:
+        trace = list(load_trace(args.trace))
+    else:
+        trace = list(synthetic_trace(args.hours, args.interval, args.seed))
+
+    rules = raki_ai.DEFAULT_ALERT_RULES
+    engine = raki_ai.AlertEngine(rules)
+    result = engine.replay(trace)
+    result['naive_announcements'] = naive_announcements(trace, rules)
+    if not args.events:
+        result.pop('events')
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
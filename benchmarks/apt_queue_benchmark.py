@@ -0,0 +1,86 @@
+"""Package install batching benchmark for Raki AI
+
+Runs a burst of install requests against benchmarks/fake_apt.py, once as
+one apt call per request (the old behaviour) and once through
+PackageManager's batching queue, and times validation of misspelled names.
+
+    python benchmarks/apt_queue_benchmark.py --installs 6 --lock 0.5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import raki_ai
+
+FAKE_APT = os.path.join(BENCH_DIR, 'fake_apt.py')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--installs', type=int, default=6)
+    parser.add_argument('--gap', type=float, default=0.5, help="seconds between requests")
+    parser.add_argument('--lock', type=float, default=0.5, help="fake apt per-transaction cost")
+    parser.add_argument('--window', type=float, default=1.0, help="batch window")
+    args = parser.parse_args()
+
+    os.environ['FAKE_APT_LOCK'] = str(args.lock)
+    os.environ['FAKE_APT_PER_PACKAGE'] = '0.05'
+    names = ['vlc', 'gimp', 'htop', 'curl', 'tmux', 'neofetch', 'inkscape', 'audacity'][:args.installs]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        index_file = os.path.join(workdir, 'index.txt')
+
+        def manager(**kwargs):
+            return raki_ai.PackageManager(apt=FAKE_APT, apt_cache=FAKE_APT, sudo=False,
+                                          index_file=index_file, lists_dir=workdir, **kwargs)
+
+        # One transaction per request, each waited on in turn
+        sequential = manager()
+        start = time.perf_counter()
+        for name in names:
+            sequential.run_transaction([name])
+            time.sleep(args.gap)
+        sequential_s = time.perf_counter() - start
+
+        # Requests queued as they arrive, installed together
+        done = threading.Event()
+        batches = []
+
+        def on_result(batch, result):
+            batches.append((batch, result['status']))
+            if sum(len(b) for b, _ in batches) == len(names):
+                done.set()
+
+        batched = manager(batch_window=args.window, on_result=on_result)
+        start = time.perf_counter()
+        for name in names:
+            batched.install([name])
+            time.sleep(args.gap)
+        done.wait(timeout=120)
+        batched_s = time.perf_counter() - start
+
+        # Validation against the cached index, including fuzzy suggestions
+        checker = manager()
+        checker.load_index()
+        start = time.perf_counter()
+        suggestions = {typo: checker.check(typo) for typo in ('vlcc', 'gimpp', 'firefx', 'htop')}
+        check_ms = (time.perf_counter() - start) * 1000 / len(suggestions)
+
+    print(json.dumps({
+        'installs': len(names),
+        'sequential': {'seconds': round(sequential_s, 2), 'transactions': sequential.stats['transactions']},
+        'batched': {'seconds': round(batched_s, 2), 'transactions': batched.stats['transactions'],
+                    'batches': [b for b, _ in batches]},
+        'check_ms_per_name': round(check_ms, 3),
+        'suggestions': {k: v[1] for k, v in suggestions.items()}
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Audio front-end benchmark for Raki AI
+
+Generates WAV fixtures at runtime (a synthetic voice, clean, quiet or
+loud, with and without room noise, at common capture rates), runs them
+through AudioFrontEnd in microphone-sized buffers and reports:
+
+- checks: resampling accuracy and alias rejection, noise removed between
+  words, SNR against the clean voice, and output level for quiet and
+  loud speakers against the AGC target; each with a pass flag
+- cpu_ms_per_audio_s: processing cost per second of audio, per stage
+  and for the whole chain, at each capture rate (above 16 kHz every
+  stage includes resampling)
+
+With --vosk-model and --wav, real recordings are also recognized by
+Vosk with and without the front-end.
+
+    python benchmarks/audio_frontend_benchmark.py --seconds 10
+    python benchmarks/audio_frontend_benchmark.py --vosk-model vosk_models/en --wav hello.wav
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import raki_ai
+
+RATES = (16000, 44100, 48000)
+BUFFER_SECONDS = 0.25  # What VoskSTT reads per call
+
+
+def voice(rate, seconds, rms, seed=1):
+    """Speech-like signal: gliding harmonics shaped into syllables with pauses, plus the on/off mask"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * seconds)) / rate
+    f0 = 150 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / rate
+    # Harmonics up to 4 kHz with two formant-like peaks
+    weights = [np.exp(-((k * 150 - 700) / 300) ** 2) + 0.6 * np.exp(-((k * 150 - 1800) / 400) ** 2) + 0.05
+               for k in range(1, 27)]
+    signal = sum(weight * np.sin(k * phase) for k, weight in enumerate(weights, 1))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    words = (np.sin(2 * np.pi * 0.5 * t + rng.uniform(0, 1)) > -0.2).astype(float)
+    signal = signal * syllables * words
+    signal *= rms / np.sqrt((signal[words > 0] ** 2).mean())
+    return signal, words > 0
+
+
+def room_noise(rate, seconds, rms, seed=2):
+    """Fan-like noise: white noise tilted towards low frequencies plus mains hum"""
+    rng = np.random.default_rng(seed)
+    noise = np.cumsum(rng.normal(size=int(rate * seconds)))
+    noise -= np.convolve(noise, np.ones(64) / 64, mode='same')  # Remove the drift
+    noise += 0.3 * rng.normal(size=noise.size) * noise.std()
+    noise += 0.5 * noise.std() * np.sin(2 * np.pi * 50 * np.arange(noise.size) / rate)
+    return noise * rms / noise.std()
+
+
+def write_wav(path, samples, rate):
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(np.clip(np.rint(samples), -32768, 32767).astype(np.int16).tobytes())
+
+
+def read_wav(path):
+    with wave.open(path, 'rb') as w:
+        return w.readframes(w.getnframes()), w.getframerate()
+
+
+def stream(frontend, data, rate):
+    """Feed data in microphone-sized buffers like VoskSTT does"""
+    step = int(rate * BUFFER_SECONDS) * 2
+    out = [frontend.process(data[i:i + step], rate, final=i + step >= len(data))
+           for i in range(0, len(data), step)]
+    return np.frombuffer(b"".join(out), dtype=np.int16).astype(np.float64)
+
+
+def db(ratio):
+    return round(float(10 * np.log10(ratio)), 1)
+
+
+def resample_checks():
+    """1 kHz tone accuracy and 12 kHz alias rejection from 44.1 kHz"""
+    rate = 44100
+    t = np.arange(rate * 2) / rate
+    frontend = raki_ai.AudioFrontEnd(rate, suppression=0, agc_target=0)
+    tone = 8000 * np.sin(2 * np.pi * 1000 * t)
+    out = stream(frontend, tone.astype(np.int16).tobytes(), rate)
+    delay = (frontend.bank.size - 1) / 2 / frontend.down
+    reference = 8000 * np.sin(2 * np.pi * 1000 * (np.arange(out.size) - delay) / 16000)
+    inner = slice(1000, out.size - 1000)
+    snr = db((reference[inner] ** 2).sum() / ((out[inner] - reference[inner]) ** 2).sum())
+
+    frontend = raki_ai.AudioFrontEnd(rate, suppression=0, agc_target=0)
+    alias = stream(frontend, (8000 * np.sin(2 * np.pi * 12000 * t)).astype(np.int16).tobytes(), rate)
+    rejection = db((8000 ** 2 / 2) / max(1e-9, (alias[1000:] ** 2).mean()))
+    return {
+        'resample_snr_db': {'value': snr, 'pass': snr >= 60},
+        'alias_rejection_db': {'value': rejection, 'pass': rejection >= 60}
+    }
+
+
+def fixture_checks(workdir, seconds):
+    """Noise and level checks on generated WAV fixtures"""
+    rate = 44100
+    speech, talking = voice(rate, seconds, rms=1500)
+    noise = room_noise(rate, seconds, rms=500)
+    fixtures = {
+        'noisy_44k.wav': speech + noise,
+        'clean_44k.wav': speech,
+        'quiet_44k.wav': speech * 0.3,  # Needs about 16 dB of the 20 dB max_gain
+        'loud_44k.wav': speech * 8
+    }
+    for name, samples in fixtures.items():
+        write_wav(os.path.join(workdir, name), samples, rate)
+
+    def run(name, **options):
+        data, file_rate = read_wav(os.path.join(workdir, name))
+        return stream(raki_ai.AudioFrontEnd(file_rate, **options), data, file_rate)
+
+    # 16 kHz masks and references, delayed like the resampler output
+    frontend = raki_ai.AudioFrontEnd(rate, suppression=0, agc_target=0)
+    delay = int(round((frontend.bank.size - 1) / 2 / frontend.down))
+    mask = np.roll(np.interp(np.arange(int(seconds * 16000)) * rate / 16000, np.arange(talking.size), talking) > 0.5, delay)
+    clean = run('clean_44k.wav', suppression=0, agc_target=0)
+    noisy = run('noisy_44k.wav', suppression=0, agc_target=0)
+    denoised = run('noisy_44k.wav', agc_target=0)
+    n = min(mask.size, clean.size, noisy.size, denoised.size)
+    mask, clean, noisy, denoised = mask[:n], clean[:n], noisy[:n], denoised[:n]
+    settle = int(0.5 * 16000)  # Let the noise estimate settle
+    gaps = ~mask
+    gaps[:settle] = False
+
+    noise_removed = db((noisy[gaps] ** 2).mean() / max(1e-9, (denoised[gaps] ** 2).mean()))
+    snr_before = db((clean[settle:] ** 2).sum() / ((noisy[settle:] - clean[settle:]) ** 2).sum())
+    snr_after = db((clean[settle:] ** 2).sum() / ((denoised[settle:] - clean[settle:]) ** 2).sum())
+
+    checks = {
+        'noise_removed_between_words_db': {'value': noise_removed, 'pass': noise_removed >= 10},
+        'snr_db': {'before': snr_before, 'after': snr_after, 'pass': snr_after > snr_before}
+    }
+    target = 3000
+    for name in ('quiet_44k.wav', 'loud_44k.wav'):
+        out = run(name, suppression=0, agc_target=target)[:n]
+        speaking = mask.copy()
+        speaking[:settle] = False
+        level = db((out[speaking] ** 2).mean() / target ** 2)
+        checks[f"{name.split('_')[0]}_level_vs_target_db"] = {'value': level, 'pass': abs(level) <= 3}
+    return checks
+
+
+def cpu_costs(seconds):
+    """CPU milliseconds per second of audio, per stage and in total"""
+    stages = {
+        'resample': {'suppression': 0, 'agc_target': 0},
+        'noise_suppression': {'agc_target': 0},
+        'agc': {'suppression': 0},
+        'full': {}
+    }
+    report = {}
+    for rate in RATES:
+        speech, _ = voice(rate, seconds, rms=1500)
+        data = (speech + room_noise(rate, seconds, rms=500)).astype(np.int16).tobytes()
+        report[str(rate)] = {}
+        for stage, options in stages.items():
+            if stage == 'resample' and rate == 16000:
+                continue
+            frontend = raki_ai.AudioFrontEnd(rate, **options)
+            start = time.process_time()
+            stream(frontend, data, rate)
+            report[str(rate)][stage] = round((time.process_time() - start) * 1000 / seconds, 2)
+    return report
+
+
+def recognize(model_path, paths):
+    """Vosk transcripts with and without the front-end"""
+    from vosk import Model, KaldiRecognizer
+    model = Model(model_path)
+    results = {}
+    for path in paths:
+        data, rate = read_wav(path)
+        transcripts = {}
+        for label, frontend in (('raw', None), ('frontend', raki_ai.AudioFrontEnd(rate))):
+            if frontend is None and rate != 16000:
+                transcripts[label] = None  # The old path needs 16 kHz input
+                continue
+            audio = stream(frontend, data, rate).astype(np.int16).tobytes() if frontend else data
+            recognizer = KaldiRecognizer(model, 16000)
+            recognizer.AcceptWaveform(audio)
+            transcripts[label] = json.loads(recognizer.FinalResult()).get('text', '')
+        results[os.path.basename(path)] = transcripts
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10, help="length of generated audio")
+    parser.add_argument('--vosk-model', help="Vosk model directory for recognition checks")
+    parser.add_argument('--wav', nargs='*', default=[], help="recordings to recognize with --vosk-model")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        checks = resample_checks()
+        checks.update(fixture_checks(workdir, args.seconds))
+    report = {
+        'checks': checks,
+        'all_passed': all(check['pass'] for check in checks.values()),
+        'cpu_ms_per_audio_s': cpu_costs(args.seconds)
+    }
+    if args.vosk_model:
+        report['recognition'] = recognize(args.vosk_model, args.wav)
+    print(json.dumps(report, indent=2))
+    return 0 if report['all_passed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Playback interruption benchmark for Raki AI
+
+Plays long utterances through SpeechPlayer with an external "player"
+process (a sleeping child standing in for aplay) and measures:
+
+- stop: time from player.stop() to playback having ended
+- barge_in: time from the user's first word to playback having ended,
+  with BargeInMonitor reading a synthetic real-time microphone that
+  carries speaker echo and then speech
+
+    python benchmarks/barge_in_benchmark.py --trials 20
+"""
+import argparse
+import json
+import math
+import os
+import random
+import struct
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import raki_ai
+
+RATE = raki_ai.BargeInMonitor.RATE
+
+
+class ProcessEngine:
+    """TTS engine whose playback is a child process, like aplay or festival"""
+    def set_rate(self, rate):
+        pass
+
+    def set_pitch(self, pitch):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+    def speak(self, text, lang, control=None):
+        raki_ai.run_player([sys.executable, '-c', 'import time; time.sleep(30)'], control)
+
+
+def tone(frames, rms, freq):
+    """int16 frame of a sine at the given RMS"""
+    amplitude = rms * math.sqrt(2)
+    return struct.pack(f'<{frames}h', *(
+        int(amplitude * math.sin(2 * math.pi * freq * i / RATE) + random.gauss(0, 30))
+        for i in range(frames)))
+
+
+class SyntheticMicrophone:
+    """PyAudio stand-in that delivers frames in real time"""
+    def __init__(self):
+        self.speech_at = None
+        self.onset = None
+
+    def open(self, **kwargs):
+        return SyntheticStream(self, kwargs['frames_per_buffer'])
+
+
+class SyntheticStream:
+    def __init__(self, mic, frames):
+        self.mic = mic
+        self.frames = frames
+        self.echo = tone(frames, 500, 220)
+        self.speech = tone(frames, 4000, 180)
+
+    def read(self, frames, exception_on_overflow=True):
+        start = time.perf_counter()
+        time.sleep(frames / RATE)
+        if self.mic.speech_at is not None and start >= self.mic.speech_at:
+            if self.mic.onset is None:
+                self.mic.onset = start
+            return self.speech
+        return self.echo
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def percentiles(values):
+    values = sorted(values)
+    return {
+        'p50_ms': round(values[len(values) // 2] * 1000, 1),
+        'p95_ms': round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 1),
+        'max_ms': round(values[-1] * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trials', type=int, default=20)
+    args = parser.parse_args()
+
+    player = raki_ai.SpeechPlayer(ProcessEngine(), lambda profile: 0.3).start()
+
+    # Explicit stop() while a long answer plays
+    stop_latencies = []
+    for _ in range(args.trials):
+        utterance = player.say(["A long research summary."] * 5)
+        time.sleep(random.uniform(0.2, 0.4))
+        requested = time.perf_counter()
+        player.stop()
+        utterance.wait()
+        stop_latencies.append(time.perf_counter() - requested)
+
+    # User talks over playback; the monitor must notice and cut it
+    mic = SyntheticMicrophone()
+    monitor = raki_ai.BargeInMonitor(player, raki_ai.SpeechOnsetDetector(), audio=mic).start()
+    barge_latencies = []
+    missed = 0
+    for _ in range(args.trials):
+        mic.speech_at, mic.onset = None, None
+        utterance = player.say(["Here is what I found about Ethiopian coffee."] * 5)
+        mic.speech_at = time.perf_counter() + random.uniform(0.3, 0.6)
+        if not utterance.wait(5):
+            missed += 1
+            player.stop()
+            utterance.wait()
+            continue
+        barge_latencies.append(time.perf_counter() - mic.onset)
+        time.sleep(0.1)
+    monitor.stop()
+
+    report = {
+        'trials': args.trials,
+        'stop': percentiles(stop_latencies),
+        'barge_in': percentiles(barge_latencies) if barge_latencies else None,
+        'barge_in_missed': missed,
+        'false_triggers': monitor.stats['detections'] - len(barge_latencies),
+        'player': player.stats,
+        'recorded_mean_ms': {
+            sample['labels']['source']: round(sample['value']['sum'] / sample['value']['count'] * 1000, 1)
+            for sample in raki_ai.registry.snapshot()['raki_tts_interrupt_seconds']['samples']
+        }
+    }
+    print(json.dumps(report, indent=2))
+    player.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""End-to-end turn benchmark for Raki AI
+
+Runs the real RakiAI main loop against scripted speech recognition, a
+recording TTS engine (or the real MaryTTS client against a stand-in
+server) and local stand-ins for Custom Search and SMTP. Each scenario
+runs in a fresh process in its own working directory:
+
+- command_mix: greetings, jokes, research, conversation, email, reminders
+- long_responses: deep research and help, spoken in many chunks
+- reminder_burst: many reminders set back to back
+- history_growth: a long conversation, comparing early and late turns
+
+and reports throughput, p50/p99 turn latency and peak RSS as JSON. A
+turn runs from the start of listening to the end of the spoken reply.
+--save writes the report as a baseline; --baseline compares against one
+and exits 1 when a scenario is slower, hungrier or less productive than
+--tolerance allows. The phrase pack and barge-in are off so timings
+don't depend on background rendering or a microphone.
+
+    python benchmarks/e2e_benchmark.py --turns 40 --save baseline.json
+    python benchmarks/e2e_benchmark.py --turns 40 --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from fake_audio import RecordingTTS, ScriptedSTT, install_silent_player
+from fake_services import start_marytts, start_search, start_smtp
+from research_benchmark import WORDS
+
+COMMAND_MIX = [
+    "hello raki",
+    "how are you",
+    "tell me a joke",
+    "research coffee ceremony",
+    "discuss life in the city",
+    "thank you",
+    ("email abebe@example.com about lunch on friday", "lunch plans"),
+    "remind me to water the plants at 21:30"
+]
+
+# (metric, direction that is better) checked against a baseline
+GATED = [('turn_ms.p50', 'lower'), ('turn_ms.p99', 'lower'),
+         ('throughput_turns_per_s', 'higher'), ('peak_rss_mb', 'lower')]
+
+
+def command_mix(rng, turns):
+    return [rng.choice(COMMAND_MIX) for _ in range(turns)]
+
+
+def long_responses(rng, turns):
+    topics = ["deep research ethiopian coffee history", "help", "research highland farming"]
+    return [topics[i % len(topics)] for i in range(turns)]
+
+
+def reminder_burst(rng, turns):
+    return [f"remind me to task {i} at {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+            for i in range(turns)]
+
+
+def history_growth(rng, turns):
+    return ["talk about " + " ".join(rng.choice(WORDS) for _ in range(30)) for _ in range(turns)]
+
+
+SCENARIOS = {
+    'command_mix': command_mix,
+    'long_responses': long_responses,
+    'reminder_burst': reminder_burst,
+    'history_growth': history_growth
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def latency_summary(latencies):
+    return {
+        'p50': round(percentile(latencies, 50) * 1000, 1),
+        'p99': round(percentile(latencies, 99) * 1000, 1),
+        'max': round(max(latencies) * 1000, 1)
+    }
+
+
+def run_child(args):
+    """Run one scenario in this process and print its result"""
+    import raki_ai
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    stt = ScriptedSTT(SCENARIOS[args.child](rng, args.turns), latency=args.stt_ms / 1000)
+    raki_ai.RakiAI.init_stt = lambda self: stt
+    engine = None
+    if args.tts == 'fake':
+        engine = RecordingTTS(args.synth_ms / 1000, args.ms_per_char / 1000)
+        raki_ai.HumanizedTTS.init_engine = lambda self: engine
+
+    assistant = raki_ai.RakiAI()
+    try:
+        assistant.main_loop()
+        # Let queued email reach the SMTP stand-in
+        deadline = time.monotonic() + 10
+        while assistant.outbox.pending() and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        assistant.shutdown()
+
+    latencies = stt.turn_latencies()
+    elapsed = stt.turn_starts[-1] - stt.turn_starts[0]
+    result = {
+        'turns': len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_turns_per_s': round(len(latencies) / elapsed, 2),
+        'turn_ms': latency_summary(latencies),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'reminders_pending': len(assistant.reminders),
+        'history_length': len(assistant.conversation_history)
+    }
+    if engine:
+        result['tts'] = engine.stats()
+    if args.child == 'history_growth':
+        tenth = max(1, len(latencies) // 10)
+        result['first_tenth_p50_ms'] = latency_summary(latencies[:tenth])['p50']
+        result['last_tenth_p50_ms'] = latency_summary(latencies[-tenth:])['p50']
+    print(json.dumps(result))
+
+
+def write_config(directory, search, marytts, smtp, args):
+    """Point a fresh RakiAI at the stand-ins"""
+    config = {
+        'google_api_key': 'bench',
+        'google_cse_id': 'bench',
+        'search_api_url': f"http://127.0.0.1:{search.server_address[1]}/customsearch/v1",
+        'tts_provider': 'marytts' if args.tts == 'marytts' else 'pyttsx3',
+        'marytts_url': f"http://127.0.0.1:{marytts.server_address[1]}",
+        'email': 'raki@localhost',
+        'email_password': 'bench',
+        'smtp_host': '127.0.0.1',
+        'smtp_port': smtp.server_address[1],
+        'smtp_ssl': False,
+        'location_provider': 'static',
+        'scan_ports': '1-16',
+        'barge_in': False,
+        'phrase_pack': False
+    }
+    with open(os.path.join(directory, 'raki_config.json'), 'w') as f:
+        json.dump(config, f)
+
+
+def lookup(result, path):
+    for key in path.split('.'):
+        result = result[key]
+    return result
+
+
+def compare(scenarios, baseline, tolerance):
+    """Metrics worse than the baseline by more than tolerance"""
+    regressions = []
+    for name, result in scenarios.items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if not reference or 'error' in result or 'error' in reference:
+            continue
+        for metric, better in GATED:
+            value, expected = lookup(result, metric), lookup(reference, metric)
+            worse = value > expected * (1 + tolerance) if better == 'lower' else value < expected * (1 - tolerance)
+            if worse:
+                regressions.append({'scenario': name, 'metric': metric, 'baseline': expected, 'value': value})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', default=",".join(SCENARIOS), help="comma-separated scenario names")
+    parser.add_argument('--turns', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--tts', choices=['fake', 'marytts'], default='fake',
+                        help="recording engine, or the MaryTTS client against the stand-in")
+    parser.add_argument('--stt-ms', type=float, default=0, help="injected recognition latency per utterance")
+    parser.add_argument('--synth-ms', type=float, default=20, help="fake TTS time per chunk")
+    parser.add_argument('--ms-per-char', type=float, default=0.5, help="fake TTS time per character")
+    parser.add_argument('--search-ms', type=float, default=50, help="Custom Search stand-in latency")
+    parser.add_argument('--smtp-ms', type=float, default=0, help="SMTP stand-in latency per command")
+    parser.add_argument('--save', metavar='FILE', help="write the report here as a baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="fail on regressions against this report")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return 0
+
+    names = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    search = start_search(args.search_ms / 1000)
+    marytts = start_marytts(per_char=args.ms_per_char / 1000)
+    smtp = start_smtp(args.smtp_ms / 1000)
+    scenarios = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.tts == 'marytts':
+            install_silent_player(workdir)
+        for name in names:
+            directory = os.path.join(workdir, name)
+            os.makedirs(directory)
+            write_config(directory, search, marytts, smtp, args)
+            counts = (search.requests_served, marytts.requests_served, len(smtp.messages))
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--child', name],
+                                  cwd=directory, capture_output=True, text=True)
+            try:
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+            except (IndexError, ValueError):
+                scenarios[name] = {'error': proc.stderr.strip().splitlines()[-1:] or proc.returncode}
+                continue
+            result['search_requests'] = search.requests_served - counts[0]
+            result['marytts_requests'] = marytts.requests_served - counts[1]
+            result['emails_delivered'] = len(smtp.messages) - counts[2]
+            scenarios[name] = result
+
+    for server in (search, marytts, smtp):
+        server.shutdown()
+
+    report = {
+        'settings': {key: getattr(args, key) for key in
+                     ('turns', 'seed', 'tts', 'stt_ms', 'synth_ms', 'ms_per_char', 'search_ms', 'smtp_ms')},
+        'scenarios': scenarios
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(scenarios, json.load(f), args.tolerance)
+    print(json.dumps(report, indent=2))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+    failed = any('error' in result for result in scenarios.values()) or report.get('regressions')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Stand-in for apt and apt-cache used by benchmarks and tests
+
+    fake_apt.py pkgnames              # like apt-cache pkgnames
+    fake_apt.py update
+    fake_apt.py install -y vlc gimp
+    fake_apt.py upgrade -y
+
+Each transaction sleeps FAKE_APT_LOCK seconds (lock and dependency
+resolution) plus FAKE_APT_PER_PACKAGE seconds per package, and appends a
+line to FAKE_APT_LOG if set.
+"""
+import os
+import sys
+import time
+
+PACKAGES = """vlc gimp git curl wget htop vim emacs nano python3 python3-pip nodejs npm
+firefox chromium thunderbird libreoffice inkscape blender audacity ffmpeg
+obs-studio transmission-gtk neofetch tmux zsh fish openssh-server nginx
+apache2 mariadb-server postgresql redis-server docker.io build-essential
+cmake gcc g++ clang make golang rustc cargo default-jdk maven gradle""".split()
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('-')]
+    if not args:
+        print("usage: fake_apt.py pkgnames|update|install|upgrade", file=sys.stderr)
+        return 1
+
+    action, packages = args[0], args[1:]
+    if action == 'pkgnames':
+        print("\n".join(PACKAGES))
+        return 0
+
+    lock = float(os.environ.get('FAKE_APT_LOCK', '0.5'))
+    per_package = float(os.environ.get('FAKE_APT_PER_PACKAGE', '0.1'))
+    if os.environ.get('FAKE_APT_LOG'):
+        with open(os.environ['FAKE_APT_LOG'], 'a') as f:
+            f.write(" ".join([action] + packages) + "\n")
+
+    print("Reading package lists... Done")
+    print("Building dependency tree... Done")
+    time.sleep(lock)
+    if action == 'install':
+        missing = [p for p in packages if p not in PACKAGES]
+        if missing:
+            print(f"E: Unable to locate package {missing[0]}")
+            return 100
+        for package in packages:
+            print(f"Unpacking {package} (1.0-1) ...")
+            time.sleep(per_package)
+            print(f"Setting up {package} (1.0-1) ...")
+    elif action == 'update':
+        print("Get:1 http://deb.example stable InRelease [1 kB]")
+        print("Fetched 1 kB in 0s")
+    elif action == 'upgrade':
+        print("0 upgraded, 0 newly installed, 0 to remove and 0 not upgraded.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
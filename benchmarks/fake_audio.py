@@ -0,0 +1,143 @@
+"""Deterministic audio stand-ins for running RakiAI without a microphone or speakers
+
+    raki_ai.RakiAI.init_stt = lambda self: ScriptedSTT(turns)
+    raki_ai.HumanizedTTS.init_engine = lambda self: RecordingTTS()
+    raki_ai.STTWorker(BusyDecoder, SyntheticCapture)
+"""
+import array
+import collections
+import os
+import random
+import threading
+import time
+
+from fake_services import silent_wav
+
+
+class ScriptedSTT:
+    """Speech recognizer that "hears" a fixed script of turns
+
+    A turn is one utterance, or a list of them when the assistant asks a
+    follow-up question (an email subject, say). turn_starts records when
+    each turn's first listen() began, so consecutive entries bound one
+    turn: recognition, command handling and speaking the reply. After the
+    script, every listen() hears final.
+    """
+    def __init__(self, turns, latency=0.0, final="exit"):
+        self.queue = collections.deque()
+        for turn in turns:
+            utterances = [turn] if isinstance(turn, str) else list(turn)
+            self.queue.extend((utterance, i == 0) for i, utterance in enumerate(utterances))
+        self.latency = latency
+        self.final = final
+        self.turn_starts = []
+
+    def listen(self):
+        utterance, new_turn = self.queue.popleft() if self.queue else (self.final, True)
+        if new_turn:
+            self.turn_starts.append(time.perf_counter())
+        if self.latency:
+            time.sleep(self.latency)
+        return utterance
+
+    def turn_latencies(self):
+        """Seconds per completed turn"""
+        return [end - start for start, end in zip(self.turn_starts, self.turn_starts[1:])]
+
+
+class SyntheticCapture:
+    """Real-time paced 16 kHz "microphone" producing low noise"""
+
+    def __init__(self, chunk_seconds=0.05, seed=1):
+        rng = random.Random(seed)
+        self.frames = int(16000 * chunk_seconds)
+        self.chunk = array.array('h', (rng.randint(-300, 300) for _ in range(self.frames))).tobytes()
+        self.chunk_seconds = chunk_seconds
+        self.next_chunk = time.monotonic()
+
+    def read(self):
+        self.next_chunk += self.chunk_seconds
+        time.sleep(max(0.0, self.next_chunk - time.monotonic()))
+        return self.chunk
+
+
+def burn(seconds):
+    """Busy pure-Python work, holding the GIL like interpreter-side decoding does"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(500))
+
+
+class BusyDecoder:
+    """Recognizer with Kaldi-like CPU cost: work per 250 ms chunk plus a final spike
+
+    transcribe() reads utterance_seconds of audio from a RingReader and
+    returns text, like VoskSTT.transcribe.
+    """
+
+    def __init__(self, chunk_ms=60, final_ms=250, utterance_seconds=1.5, text="hello raki"):
+        self.chunk_ms = chunk_ms
+        self.final_ms = final_ms
+        self.utterance_seconds = utterance_seconds
+        self.text = text
+
+    def transcribe(self, reader):
+        chunks = reader.chunks(4000)
+        for _ in range(max(1, int(self.utterance_seconds / 0.25))):
+            next(chunks)
+            burn(self.chunk_ms / 1000)
+        burn(self.final_ms / 1000)
+        return self.text
+
+
+class RecordingTTS:
+    """TTS engine that records every call and simulates synthesis and playback
+
+    Speaking takes fixed + per_char seconds per character, cut short when
+    the player cancels the utterance.
+    """
+    def __init__(self, fixed=0.02, per_char=0.0005):
+        self.fixed = fixed
+        self.per_char = per_char
+        self.rate = self.pitch = self.volume = 1.0
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate):
+        self.rate = rate
+
+    def set_pitch(self, pitch):
+        self.pitch = pitch
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def voice_key(self, lang):
+        return f"recording:{lang}:{self.rate}:{self.pitch}:{self.volume}"
+
+    def render(self, text, lang):
+        time.sleep(self.fixed + self.per_char * len(text))
+        return silent_wav(), 'wav'
+
+    def speak(self, text, lang, control=None):
+        with self.lock:
+            self.calls.append((text, lang))
+        duration = self.fixed + self.per_char * len(text)
+        if control:
+            control.cancelled.wait(duration)
+        else:
+            time.sleep(duration)
+
+    def stats(self):
+        with self.lock:
+            return {'calls': len(self.calls), 'chars': sum(len(text) for text, _ in self.calls)}
+
+
+def install_silent_player(directory):
+    """Put a stand-in "aplay" that swallows its input first on PATH"""
+    player = os.path.join(directory, 'aplay')
+    with open(player, 'w') as f:
+        f.write("#!/bin/sh\ncat > /dev/null\n")
+    os.chmod(player, 0o755)
+    os.environ['PATH'] = directory + os.pathsep + os.environ['PATH']
+    return player
@@ -0,0 +1,172 @@
+"""Local stand-ins for the network services Raki AI talks to
+
+- MaryTTS: /voices and /process, answering with a silent WAV after a
+  delay that grows with the text length
+- Custom Search: /customsearch/v1 with result links to /page/N articles
+  served by the same server, for research and deep research
+- SMTP: plain-text server that accepts AUTH PLAIN and keeps every
+  message it receives
+
+Each start_* function returns a running server on a free 127.0.0.1 port
+with a requests_served counter; call .shutdown() when done.
+"""
+import io
+import json
+import random
+import socketserver
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from research_benchmark import article
+
+
+def silent_wav(seconds=0.1, rate=16000):
+    """Mono 16-bit WAV of silence"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b'\0\0' * int(rate * seconds))
+    return buffer.getvalue()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Shared plumbing: counting, latency and quiet logs"""
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client hung up after its byte cap
+
+    def count(self):
+        with self.server.lock:
+            self.server.requests_served += 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSearchHandler(StandInHandler):
+    """Answers like the Custom Search API after a fixed delay"""
+
+    def do_GET(self):
+        self.count()
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        if url.path.startswith('/page/'):
+            page = url.path.rsplit('/', 1)[-1]
+            rng = random.Random(page)
+            self.send_body(article(rng, f"Coffee page {page}", 12).encode(), 'text/html; charset=utf-8')
+            return
+
+        params = parse_qs(url.query)
+        query = params.get('q', [''])[0]
+        count = int(params.get('num', ['3'])[0])
+        items = [{
+            'title': f"{query} result {i}",
+            'snippet': f"Snippet {i} about {query}. " * 5,
+            'link': f"http://{self.server.server_address[0]}:{self.server.server_address[1]}/page/{i}"
+        } for i in range(count)]
+        self.send_body(json.dumps({'items': items}).encode(), 'application/json')
+
+
+class FakeMaryTTSHandler(StandInHandler):
+    """Answers like a MaryTTS server; synthesis time grows with the text"""
+    VOICES = [{'name': 'cmu-slt-hsmm', 'locale': 'en_US'}, {'name': 'bench-am', 'locale': 'am_ET'}]
+
+    def do_GET(self):
+        self.count()
+        url = urlparse(self.path)
+        if url.path == '/voices':
+            self.send_body(json.dumps(self.VOICES).encode(), 'application/json')
+            return
+        text = parse_qs(url.query).get('INPUT_TEXT', [''])[0]
+        time.sleep(self.server.latency + self.server.per_char * len(text))
+        self.send_body(self.server.clip, 'audio/x-wav')
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough ESMTP for smtplib: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, QUIT"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        with self.server.lock:
+            self.server.requests_served += 1
+        self.reply("220 localhost ESMTP stand-in")
+        sender, recipients = None, []
+        for raw in self.rfile:
+            line = raw.decode('utf-8', 'replace').rstrip("\r\n")
+            verb = line.split(' ', 1)[0].upper()
+            time.sleep(self.server.latency)
+            if verb == 'EHLO':
+                self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN\r\n250 8BITMIME\r\n")
+            elif verb == 'HELO':
+                self.reply("250 localhost")
+            elif verb == 'AUTH':
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == 'MAIL':
+                sender, recipients = line[10:].strip('<> '), []
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                recipients.append(line[8:].strip('<> '))
+                self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data in self.rfile:
+                    if data in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data)
+                with self.server.lock:
+                    self.server.messages.append({'from': sender, 'to': recipients,
+                                                 'data': b"".join(lines).decode('utf-8', 'replace')})
+                self.reply("250 OK queued")
+            elif verb in ('RSET', 'NOOP'):
+                self.reply("250 OK")
+            elif verb == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(server, **attributes):
+    """Attach stand-in settings and counters, then serve in the background"""
+    server.lock = threading.Lock()
+    server.requests_served = 0
+    for name, value in attributes.items():
+        setattr(server, name, value)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_search(latency=0.1):
+    """Custom Search stand-in; also serves the result pages"""
+    return serve(ThreadingHTTPServer(('127.0.0.1', 0), FakeSearchHandler), latency=latency)
+
+
+def start_marytts(latency=0.05, per_char=0.001, clip_seconds=0.1):
+    """MaryTTS stand-in taking latency + per_char × characters per request"""
+    return serve(ThreadingHTTPServer(('127.0.0.1', 0), FakeMaryTTSHandler),
+                 latency=latency, per_char=per_char, clip=silent_wav(clip_seconds))
+
+
+def start_smtp(latency=0.0):
+    """SMTP stand-in; received messages collect in server.messages"""
+    return serve(FakeSMTPServer(('127.0.0.1', 0), FakeSMTPHandler), latency=latency, messages=[])
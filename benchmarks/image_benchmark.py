@@ -0,0 +1,115 @@
+"""Image pipeline benchmark for Raki AI
+
+Generates large JPEG and PNG samples, serves them locally and compares the
+old path (download, full-resolution decode) with ImagePipeline's cold fetch
+(draft decode, thumbnail, disk cache) and warm "next image" lookups.
+
+    python benchmarks/image_benchmark.py --width 8000 --height 6000
+"""
+import argparse
+import functools
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import raki_ai
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def make_samples(directory, width, height, count):
+    """Write `count` large JPEGs plus one PNG; return file names"""
+    import numpy as np
+    rng = np.random.default_rng(1)
+    names = []
+    for i in range(count):
+        # Smooth gradients with noise compress like photos rather than flat color
+        y, x = np.mgrid[0:height, 0:width]
+        base = ((x * (i + 1) + y) % 256).astype(np.uint8)
+        noise = rng.integers(0, 24, size=(height, width), dtype=np.uint8)
+        pixels = np.dstack([base, base // 2 + noise, 255 - base])
+        name = f"sample{i}.jpg"
+        Image.fromarray(pixels).save(os.path.join(directory, name), quality=90)
+        names.append(name)
+    Image.new('RGB', (width // 2, height // 2), (30, 120, 200)).save(os.path.join(directory, 'sample.png'))
+    names.append('sample.png')
+    return names
+
+
+def naive_show(http, url):
+    """What show_image used to do, minus the viewer"""
+    response = http.get(url)
+    img = Image.open(io.BytesIO(response.content))
+    img.load()
+    return img.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=6000)
+    parser.add_argument('--height', type=int, default=4000)
+    parser.add_argument('--count', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as cache_dir:
+        names = make_samples(site, args.width, args.height, args.count)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=site))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls = [f"http://127.0.0.1:{server.server_address[1]}/{name}" for name in names]
+        http = raki_ai.HttpClient()
+
+        naive = []
+        for url in urls:
+            start = time.perf_counter()
+            naive_show(http, url)
+            naive.append((time.perf_counter() - start) * 1000)
+
+        pipeline = raki_ai.ImagePipeline(http, directory=cache_dir)
+        start = time.perf_counter()
+        pipeline.prefetch(urls)
+        first = pipeline.get(urls[0])
+        first_ms = (time.perf_counter() - start) * 1000
+        for url in urls:
+            pipeline.get(url)
+        prefetch_all_ms = (time.perf_counter() - start) * 1000
+
+        # "Show next image": everything is already on disk
+        warm = []
+        for url in urls:
+            start = time.perf_counter()
+            with Image.open(pipeline.get(url)) as img:
+                img.load()
+            warm.append((time.perf_counter() - start) * 1000)
+
+        with Image.open(first) as img:
+            thumb_size = img.size
+        server.shutdown()
+
+    print(json.dumps({
+        'images': len(urls),
+        'source_size': [args.width, args.height],
+        'thumbnail_size': list(thumb_size),
+        'naive_ms': {'median': round(statistics.median(naive), 1), 'total': round(sum(naive), 1)},
+        'pipeline_first_image_ms': round(first_ms, 1),
+        'pipeline_all_prefetched_ms': round(prefetch_all_ms, 1),
+        'next_image_ms': {'median': round(statistics.median(warm), 2), 'max': round(max(warm), 2)},
+        'decoded_mb': {'naive': round(args.width * args.height * 3 / 1e6, 1),
+                       'pipeline': round(thumb_size[0] * thumb_size[1] * 3 / 1e6, 1)},
+        'stats': pipeline.stats
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Long-uptime memory benchmark for Raki AI's caches and buffers
+
+Compresses days of use into seconds: every simulated hour brings new web
+searches, package-name checks, phrase-pack plays, traced spans and
+conversation turns, against the real ResponseCache, PackageManager index,
+PhrasePack, Tracer, MetricsSampler and StateStore. A MemoryAccountant
+checks the budget once per simulated hour, as the scheduler would.
+
+Runs once without a budget and once with --budget-mb, reporting per
+simulated day the accounted bytes, tracemalloc's traced bytes and RSS,
+plus evictions per owner and the cost of a check. With a budget the
+accounted total should level off under it instead of following the
+caches up.
+
+    python benchmarks/memory_benchmark.py --days 14 --budget-mb 16
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import raki_ai
+
+from research_benchmark import WORDS
+
+
+def package_names(rng, count):
+    return {f"{rng.choice(WORDS)}-{rng.choice(WORDS)}{i}" for i in range(count)}
+
+
+def build(workdir, args, budget):
+    """Real caches and buffers in workdir, registered with an accountant"""
+    rng = random.Random(args.seed)
+    cipher = raki_ai.StreamCipher(base64.urlsafe_b64encode(os.urandom(32)))
+    cache = raki_ai.ResponseCache(cipher, os.path.join(workdir, 'web_cache'),
+                                  max_bytes=args.web_cache_mb * 1024 * 1024)
+
+    index_file = os.path.join(workdir, 'package_index.txt')
+    names = sorted(package_names(rng, args.packages))
+    with open(index_file, 'w') as f:
+        f.write("\n".join(names))
+    packages = raki_ai.PackageManager(apt='true', apt_cache='true', index_file=index_file)
+
+    phrases = raki_ai.PhrasePack(os.path.join(workdir, 'phrase_pack.rakp'))
+    clip = os.urandom(args.clip_kb * 1024)
+    phrases.add({f"clip{i}": (clip, 'wav') for i in range(args.clips)})
+
+    tracer = raki_ai.Tracer(enabled=True)
+    metrics = raki_ai.MetricsSampler(capacity=720)
+    state = raki_ai.StateStore()
+
+    memory = raki_ai.MemoryAccountant(budget=budget, policy=args.policy)
+    memory.register('state', state.memory_bytes)
+    memory.register('metrics', metrics.memory_bytes)
+    memory.register('trace', tracer.memory_bytes, tracer.release)
+    memory.register('web_cache', cache.memory_bytes, cache.release, lambda: cache.last_used)
+    memory.register('packages', packages.memory_bytes, packages.release, lambda: packages.index_used)
+    memory.register('phrase_pack', phrases.memory_bytes, phrases.release, lambda: phrases.last_used)
+    return {'cache': cache, 'packages': packages, 'phrases': phrases, 'tracer': tracer,
+            'state': state, 'names': names, 'memory': memory}
+
+
+def simulate_hour(parts, rng, args, hour):
+    """One hour of assistant use"""
+    for i in range(args.searches):
+        query = {'q': f"{rng.choice(WORDS)} {rng.choice(WORDS)} {hour} {i}"}
+        if parts['cache'].get('https://search', query) is None:
+            parts['cache'].put('https://search', query, {'items': [{'snippet': " ".join(WORDS[:40])}]})
+    for _ in range(args.package_checks):
+        parts['packages'].check(rng.choice(parts['names']))
+    for _ in range(args.plays):
+        parts['phrases'].get(f"clip{rng.randrange(args.clips)}")
+    for _ in range(args.spans):
+        now = time.perf_counter()
+        parts['tracer'].record('process_command', now, now + 0.01, {'intent': 'research'})
+    for _ in range(args.turns):
+        parts['state'].append('history', {'user': " ".join(rng.choice(WORDS) for _ in range(20)),
+                                          'ai': "answer", 'language': 'en'}, limit=20)
+
+
+def run(args, budget):
+    rng = random.Random(args.seed)
+    days = []
+    check_ms = []
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as workdir:
+        parts = build(workdir, args, budget)
+        memory = parts['memory']
+        for hour in range(args.days * 24):
+            simulate_hour(parts, rng, args, hour)
+            start = time.perf_counter()
+            memory.check()
+            check_ms.append((time.perf_counter() - start) * 1000)
+            if hour % 24 == 23:
+                report = memory.report()
+                days.append({
+                    'day': hour // 24 + 1,
+                    'accounted_mb': round(report['total'] / 1048576, 2),
+                    'traced_mb': round(tracemalloc.get_traced_memory()[0] / 1048576, 2),
+                    'rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                    'owners_mb': {name: round(size / 1048576, 2) for name, size in report['owners'].items()}
+                })
+        evicted = {key[0]: value for key, value in raki_ai.MEMORY_EVICTED.current().items()}
+        parts['phrases'].close()
+    tracemalloc.stop()
+    raki_ai.MEMORY_EVICTED.values.clear()
+    check_ms.sort()
+    return {
+        'budget_mb': budget / 1048576,
+        'days': days,
+        'peak_accounted_mb': max(day['accounted_mb'] for day in days),
+        'final_accounted_mb': days[-1]['accounted_mb'],
+        'evicted_mb': {name: round(value / 1048576, 2) for name, value in evicted.items()},
+        'stats': memory.stats,
+        'check_ms': {'p50': round(check_ms[len(check_ms) // 2], 2), 'max': round(check_ms[-1], 2)}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--budget-mb', type=float, default=16)
+    parser.add_argument('--policy', choices=['largest', 'lru'], default='largest')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--searches', type=int, default=20, help="new searches per hour")
+    parser.add_argument('--web-cache-mb', type=float, default=20, help="web_cache_max_bytes in MB")
+    parser.add_argument('--packages', type=int, default=60000, help="names in the package index")
+    parser.add_argument('--package-checks', type=int, default=1, help="install name checks per hour")
+    parser.add_argument('--clips', type=int, default=200)
+    parser.add_argument('--clip-kb', type=int, default=40)
+    parser.add_argument('--plays', type=int, default=20, help="phrase-pack plays per hour")
+    parser.add_argument('--spans', type=int, default=200, help="traced spans per hour")
+    parser.add_argument('--turns', type=int, default=10, help="conversation turns per hour")
+    args = parser.parse_args()
+
+    unlimited = run(args, 0)
+    budgeted = run(args, int(args.budget_mb * 1048576))
+    for result in (unlimited, budgeted):
+        # Keep the report readable: first, middle and last day in full
+        keep = {0, len(result['days']) // 2, len(result['days']) - 1}
+        result['days'] = [day for i, day in enumerate(result['days']) if i in keep]
+    print(json.dumps({'settings': vars(args), 'unlimited': unlimited, 'budgeted': budgeted}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
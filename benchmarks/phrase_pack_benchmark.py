@@ -0,0 +1,126 @@
+"""Phrase pack benchmark for Raki AI
+
+Speaks every fixed phrase through HumanizedTTS twice: once synthesizing
+live with an engine that takes --synth-ms per chunk (roughly MaryTTS on a
+small machine) and once from a freshly built phrase pack. Playback goes
+to a silent stand-in "aplay" placed on PATH, so only synthesis and pack
+lookups are timed.
+
+    python benchmarks/phrase_pack_benchmark.py --synth-ms 250
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import wave
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import raki_ai
+
+
+def silent_wav(seconds=0.2, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b'\0\0' * int(rate * seconds))
+    return buffer.getvalue()
+
+
+class SlowSynthEngine:
+    """Engine with a fixed synthesis cost per chunk"""
+    def __init__(self, synth_seconds):
+        self.synth_seconds = synth_seconds
+        self.rate = self.pitch = self.volume = 1.0
+        self.renders = 0
+
+    def set_rate(self, rate):
+        self.rate = rate
+
+    def set_pitch(self, pitch):
+        self.pitch = pitch
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def voice_key(self, lang):
+        return f"bench:{lang}:{self.rate}:{self.pitch}:{self.volume}"
+
+    def render(self, text, lang):
+        self.renders += 1
+        time.sleep(self.synth_seconds)
+        return silent_wav(), 'wav'
+
+    def speak(self, text, lang, control=None):
+        data, fmt = self.render(text, lang)
+        raki_ai.play_audio_bytes(data, fmt, control)
+
+
+def speak_all(tts, phrases):
+    timings = []
+    for text, lang in phrases:
+        start = time.perf_counter()
+        tts.humanized_speak(text, lang)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summary(timings):
+    return {
+        'mean_ms': round(statistics.mean(timings) * 1000, 1),
+        'max_ms': round(max(timings) * 1000, 1),
+        'total_s': round(sum(timings), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--synth-ms', type=float, default=250)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Silent player that accepts a clip on stdin like aplay does
+        player = os.path.join(workdir, 'aplay')
+        with open(player, 'w') as f:
+            f.write("#!/bin/sh\ncat > /dev/null\n")
+        os.chmod(player, 0o755)
+        os.environ['PATH'] = workdir + os.pathsep + os.environ['PATH']
+
+        raki_ai.HumanizedTTS.init_engine = lambda self: SlowSynthEngine(args.synth_ms / 1000)
+        tts = raki_ai.HumanizedTTS({'tts_provider': 'bench'})
+        tts.speech_profiles = {name: dict(p, pauses=0) for name, p in tts.speech_profiles.items()}
+        phrases = raki_ai.static_phrases()
+
+        live = speak_all(tts, phrases)
+
+        pack = raki_ai.PhrasePack(os.path.join(workdir, 'phrases.rakp')).open()
+        start = time.perf_counter()
+        tts.update_phrase_pack(pack, phrases, wait=True)
+        build_s = time.perf_counter() - start
+
+        tts.player.phrases = raki_ai.PhrasePack(pack.path).open()  # Fresh mapping, as at startup
+        renders_before = tts.engine.renders
+        packed = speak_all(tts, phrases)
+
+        print(json.dumps({
+            'phrases': len(phrases),
+            'synth_ms_per_chunk': args.synth_ms,
+            'live': summary(live),
+            'phrase_pack': summary(packed),
+            'build_s': round(build_s, 2),
+            'pack_clips': pack.stats['clips'],
+            'pack_bytes': pack.stats['bytes'],
+            'syntheses_with_pack': tts.engine.renders - renders_before,
+            'pack_hits': tts.player.phrases.stats['hits'],
+            'pack_misses': tts.player.phrases.stats['misses']
+        }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Speech provider failover benchmark for Raki AI
+
+Speaks a short sentence every --interval seconds through the real MaryTTS
+client against the local stand-in, with a recording engine standing in
+for pyttsx3 as the local fallback. Partway through, MaryTTS goes away for
+--outage seconds, either refusing connections (refused) or accepting them
+and never answering within provider_timeout (hang), then comes back.
+
+Three routing modes:
+
+- single: MaryTTS alone, as before failover existed
+- retry: fallback without circuit breakers; every call tries MaryTTS first
+- breaker: TTSProviders with circuit breakers and background probes
+
+Per mode and outage kind it reports sentences lost, calls that still went
+to the dead server, speak latency during the outage, how long after the
+outage began the fallback took over, and how long after MaryTTS came back
+it served again.
+
+    python benchmarks/provider_failover_benchmark.py --outage 5 --timeout 1
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from http.server import ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import raki_ai
+
+from fake_audio import RecordingTTS, install_silent_player
+from fake_services import FakeMaryTTSHandler, serve, start_marytts
+
+SENTENCE = "The coffee ceremony starts at three."
+MODES = {
+    'single': {'names': ['marytts'], 'failures': 10 ** 9, 'failure_rate': 2},
+    'retry': {'names': ['marytts', 'pyttsx3'], 'failures': 10 ** 9, 'failure_rate': 2},
+    'breaker': {'names': ['marytts', 'pyttsx3']}
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class MaryTTSStandIn:
+    """The MaryTTS stand-in on a fixed port that can be taken down and brought back"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.server = start_marytts(latency=latency)
+        self.port = self.server.server_address[1]
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def fail(self, kind, hang_seconds):
+        if kind == 'refused':
+            self.server.shutdown()
+            self.server.server_close()
+        else:
+            self.server.latency = hang_seconds
+
+    def restore(self, kind):
+        if kind == 'refused':
+            self.server = serve(ThreadingHTTPServer(('127.0.0.1', self.port), FakeMaryTTSHandler),
+                                latency=self.latency, per_char=0.001, clip=self.server.clip)
+        else:
+            self.server.latency = self.latency
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run(mode, kind, args):
+    """One timeline: healthy, outage, recovered"""
+    standin = MaryTTSStandIn(args.latency_ms / 1000)
+    config = {'marytts_url': standin.url, 'provider_timeout': args.timeout}
+    options = dict(MODES[mode])
+    names = options.pop('names')
+    options.setdefault('cooldown', args.cooldown)
+
+    def factory(name):
+        if name == 'marytts':
+            return raki_ai.MaryTTS(config)
+        return RecordingTTS(fixed=args.local_ms / 1000, per_char=0)
+
+    pool = raki_ai.TTSProviders(names, factory, **options).prepare()
+    scheduler = raki_ai.Scheduler().start()
+    scheduler.every('providers', args.probe_interval, pool.probe, jitter=0)
+
+    calls = []  # (start, seconds, provider or None)
+    start = time.monotonic()
+    outage_at = start + args.healthy
+    restore_at = outage_at + args.outage
+    end = restore_at + args.after
+    failed = restored = False
+    while time.monotonic() < end:
+        now = time.monotonic()
+        if not failed and now >= outage_at:
+            standin.fail(kind, args.timeout * 3)
+            outage_at = time.monotonic()  # Shutting the server down takes a moment
+            failed = True
+        if not restored and now >= restore_at:
+            standin.restore(kind)
+            restore_at = time.monotonic()
+            restored = True
+        pool.last_used = None
+        began = time.monotonic()
+        pool.speak(SENTENCE, 'en')
+        calls.append((began, time.monotonic() - began, pool.last_used))
+        time.sleep(max(0.0, began + args.interval - time.monotonic()))
+    scheduler.stop()
+    standin.stop()
+
+    counts = raki_ai.PROVIDER_CALLS.current()
+    raki_ai.PROVIDER_CALLS.values.clear()
+    outage = [call for call in calls if outage_at <= call[0] < restore_at]
+    after = [call for call in calls if call[0] >= restore_at]
+    fallback = [began for began, _, provider in outage if provider and provider != 'marytts']
+    back = [began for began, _, provider in after if provider == 'marytts']
+    latencies = [seconds for _, seconds, _ in outage]
+    return {
+        'calls': len(calls),
+        'lost': sum(1 for _, _, provider in calls if provider is None),
+        'dead_server_calls': counts.get(('tts', 'marytts', 'failure'), 0),
+        'failed_probes': counts.get(('tts', 'marytts', 'probe_failure'), 0),
+        'outage_speak_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 1),
+            'p99': round(percentile(latencies, 99) * 1000, 1),
+            'max': round(max(latencies) * 1000, 1)
+        },
+        'failover_s': round(fallback[0] - outage_at, 2) if fallback else None,
+        'recovery_s': round(back[0] - restore_at, 2) if back else None,
+        'stats': pool.stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--healthy', type=float, default=2, help="seconds before the outage")
+    parser.add_argument('--outage', type=float, default=5)
+    parser.add_argument('--after', type=float, default=10, help="seconds after MaryTTS is back")
+    parser.add_argument('--interval', type=float, default=0.1, help="seconds between sentences")
+    parser.add_argument('--timeout', type=float, default=1, help="provider_timeout")
+    parser.add_argument('--cooldown', type=float, default=2, help="provider_cooldown")
+    parser.add_argument('--probe-interval', type=float, default=0.5, help="provider_probe_interval")
+    parser.add_argument('--latency-ms', type=float, default=30, help="MaryTTS stand-in latency")
+    parser.add_argument('--local-ms', type=float, default=20, help="local engine time per sentence")
+    parser.add_argument('--kinds', default='refused,hang', help="outage kinds to run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        install_silent_player(workdir)
+        results = {kind: {mode: run(mode, kind, args) for mode in MODES}
+                   for kind in args.kinds.split(',') if kind}
+    print(json.dumps({'settings': vars(args), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Deep research benchmark for Raki AI
+
+Generates a static site fixture (ordinary article pages, one oversized page
+and one slow host path), serves it locally and runs PageFetcher plus
+summarize_pages over it. Reports wall time, fetch counters, summary size
+and peak Python memory as JSON. Timings include tracemalloc overhead.
+
+    python benchmarks/research_benchmark.py --pages 8 --huge-mb 50
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import raki_ai
+
+WORDS = ("coffee highland ethiopia harvest arabica ceremony roasting export farmers "
+         "region altitude washed natural processing market history origin kaffa "
+         "cultivation climate rainfall quality flavor aroma tradition").split()
+
+
+def article(rng, title, paragraphs):
+    """One page with boilerplate around an article body"""
+    body = "".join(
+        "<p>" + " ".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+            for _ in range(rng.randint(3, 6))
+        ) + "</p>\n"
+        for _ in range(paragraphs)
+    )
+    return (f"<html><head><title>{title}</title><script>var x = 1;</script>"
+            f"<style>p {{ margin: 0 }}</style></head><body>"
+            f"<nav><a href='/'>Home</a> <a href='/about'>About</a></nav>"
+            f"<article><h1>{title}</h1>{body}</article>"
+            f"<footer>Copyright fixture</footer></body></html>")
+
+
+def build_site(directory, pages, huge_mb, seed):
+    """Write the fixture pages; return their relative paths"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(pages):
+        name = f"page{i}.html"
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(article(rng, f"Coffee page {i}", 60))
+        paths.append(name)
+
+    # One page far larger than the fetch cap
+    with open(os.path.join(directory, 'huge.html'), 'w') as f:
+        f.write("<html><body><article>")
+        chunk = article(rng, "Huge", 20)
+        written = 0
+        while written < huge_mb * 1024 * 1024:
+            f.write(chunk)
+            written += len(chunk)
+        f.write("</article></body></html>")
+    paths.append('huge.html')
+    paths.append('slow/page0.html')
+    return paths
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """Static files; anything under /slow/ is delayed"""
+    slow_delay = 20
+
+    def do_GET(self):
+        if self.path.startswith('/slow/'):
+            time.sleep(self.slow_delay)
+            self.path = self.path[len('/slow'):]
+        try:
+            super().do_GET()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The fetcher hung up after its byte cap
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=8)
+    parser.add_argument('--huge-mb', type=int, default=50)
+    parser.add_argument('--budget', type=float, default=3.0)
+    parser.add_argument('--per-host', type=int, default=2)
+    parser.add_argument('--max-bytes', type=int, default=1500000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as site:
+        paths = build_site(site, args.pages, args.huge_mb, args.seed)
+        handler = functools.partial(FixtureHandler, directory=site)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}/"
+
+        fetcher = raki_ai.PageFetcher(raki_ai.HttpClient(), per_host=args.per_host,
+                                      max_bytes=args.max_bytes)
+        tracemalloc.start()
+        start = time.perf_counter()
+        pages = fetcher.fetch_all([base + p for p in paths], args.budget)
+        fetch_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        summary = raki_ai.summarize_pages(pages, "ethiopia coffee harvest")
+        summarize_ms = (time.perf_counter() - start) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        server.shutdown()
+
+    print(json.dumps({
+        'urls': len(paths),
+        'pages_returned': len(pages),
+        'parser': fetcher.parser,
+        'fetch_ms': round(fetch_ms, 1),
+        'summarize_ms': round(summarize_ms, 1),
+        'budget_ms': args.budget * 1000,
+        'fetch_stats': fetcher.stats,
+        'summary_chars': len(summary),
+        'peak_python_mb': round(peak / 1024 / 1024, 2)
+    }, indent=2))
+    os._exit(0)  # Don't wait for the deliberately slow request
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Background scheduling benchmark for Raki AI
+
+Runs the assistant's periodic services (metrics sampling, reminder
+checks, alert polling, security re-scans) two ways while --load threads
+burn CPU:
+
+- legacy: one daemon thread per service sleeping in a while loop, as
+  before the Scheduler existed
+- scheduler: every service registered on one Scheduler
+
+and reports threads used, how far each task's start drifts from its
+period, and how long a clean shutdown takes. Intervals are scaled down
+so a run takes seconds; with the real 60-120 s sleeps the legacy
+shutdown waits out the longest sleep.
+
+    python benchmarks/scheduler_benchmark.py --seconds 5 --load 2
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import raki_ai
+
+# name: (interval, work seconds); ratios follow the production defaults
+SERVICES = {
+    'metrics': (0.05, 0.002),
+    'reminders': (0.6, 0.0005),
+    'monitor': (0.01, 0.0),
+    'security_scan': (0.24, 0.02)
+}
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def burn(stop):
+    while not stop.is_set():
+        busy(0.01)
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        'runs': len(values),
+        'p50_ms': round(values[len(values) // 2] * 1000, 2),
+        'p99_ms': round(values[min(len(values) - 1, int(len(values) * 0.99))] * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2)
+    }
+
+
+class Recorder:
+    """Record how far each start strays from the previous start + interval"""
+    def __init__(self):
+        self.drift = {name: [] for name in SERVICES}
+        self.last = {}
+
+    def wrap(self, name, interval, work):
+        def task():
+            now = time.perf_counter()
+            if name in self.last:
+                self.drift[name].append(abs(now - self.last[name] - interval))
+            self.last[name] = now
+            busy(work)
+        return task
+
+    def report(self):
+        return {name: percentiles(values) for name, values in self.drift.items()}
+
+
+def run_legacy(seconds):
+    shutdown = threading.Event()
+    recorder = Recorder()
+
+    def loop(task, interval):
+        while not shutdown.is_set():
+            task()
+            time.sleep(interval)
+
+    threads = [threading.Thread(target=loop, args=(recorder.wrap(name, *spec), spec[0]), daemon=True)
+               for name, spec in SERVICES.items()]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+
+    start = time.perf_counter()
+    shutdown.set()
+    for thread in threads:
+        thread.join()
+    return {
+        'threads': len(threads),
+        'drift': recorder.report(),
+        'shutdown_ms': round((time.perf_counter() - start) * 1000, 2)
+    }
+
+
+def run_scheduler(seconds):
+    scheduler = raki_ai.Scheduler().start()
+    recorder = Recorder()
+    for name, spec in SERVICES.items():
+        scheduler.every(name, spec[0], recorder.wrap(name, *spec), jitter=0, delay=0)
+    time.sleep(seconds)
+
+    start = time.perf_counter()
+    scheduler.stop()
+    shutdown_ms = round((time.perf_counter() - start) * 1000, 2)
+    return {
+        'threads': len(scheduler.threads),
+        'drift': recorder.report(),
+        'stats': scheduler.stats,
+        'shutdown_ms': shutdown_ms
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--load', type=int, default=2, help="CPU-burning threads running alongside")
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    burners = [threading.Thread(target=burn, args=(stop,), daemon=True) for _ in range(args.load)]
+    for thread in burners:
+        thread.start()
+    try:
+        report = {
+            'seconds': args.seconds,
+            'load_threads': args.load,
+            'legacy': run_legacy(args.seconds),
+            'scheduler': run_scheduler(args.seconds)
+        }
+    finally:
+        stop.set()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Time-to-first-audio benchmark for speech segmentation in Raki AI
+
+Speaks long Amharic and English replies through HumanizedTTS with an
+engine whose synthesis time grows with chunk length, comparing the old
+"split on '. '" behaviour with segment_speech(), and a reply streamed
+sentence by sentence with one that is joined before speaking.
+
+    python benchmarks/segmentation_benchmark.py --ms-per-char 4
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import raki_ai
+
+AMHARIC_TEXT = " ".join([raki_ai.CANNED_REPLIES['am']['about'], raki_ai.HELP_MESSAGES['am']]
+                        + raki_ai.ETHIOPIAN_JOKES + raki_ai.ETHIOPIAN_PROVERBS)
+ENGLISH_TEXT = ("Here's what I found about Ethiopian coffee.Coffee was first found in Kaffa,"
+                "in the south west of the country.Today Ethiopia is Africa's largest producer,"
+                "and the coffee ceremony, with its three rounds of abol, tona and baraka, "
+                "is part of daily life.") * 2
+
+
+class LatencyEngine:
+    """Engine whose synthesis takes fixed + per-character time before audio starts"""
+    def __init__(self, fixed, per_char):
+        self.fixed = fixed
+        self.per_char = per_char
+        self.first_audio = None
+        self.chunks = []
+
+    def set_rate(self, rate):
+        pass
+
+    def set_pitch(self, pitch):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+    def speak(self, text, lang, control=None):
+        time.sleep(self.fixed + self.per_char * len(text))
+        if self.first_audio is None:
+            self.first_audio = time.perf_counter()
+        self.chunks.append(len(text))
+
+
+class LegacyTTS(raki_ai.HumanizedTTS):
+    """Sentence splitting as it was: only '.', '!' or '?' followed by spaces"""
+    def chunks(self, pieces, lang, echo=False):
+        text = pieces if isinstance(pieces, str) else "".join(pieces)
+        for sentence in re.split(r'(?<=[.!?]) +', text):
+            yield self.add_prosody(sentence, lang)
+
+
+def streamed(text, delay):
+    """Yield a reply sentence by sentence, as a summarizer would produce it"""
+    for sentence in re.findall(r'.+?(?:[.!?።፧]+|$)', text):
+        time.sleep(delay)
+        yield sentence
+
+
+def run(tts_class, text, lang, args, stream=False):
+    engine = LatencyEngine(args.fixed_ms / 1000, args.ms_per_char / 1000)
+    tts_class.init_engine = lambda self: engine
+    tts = tts_class({'tts_provider': 'bench'})
+    tts.speech_profiles = {name: dict(p, pauses=0.1) for name, p in tts.speech_profiles.items()}
+    start = time.perf_counter()
+    if stream == 'join':
+        tts.humanized_speak("".join(streamed(text, args.produce_ms / 1000)), lang)
+    elif stream:
+        tts.humanized_speak(streamed(text, args.produce_ms / 1000), lang)
+    else:
+        tts.humanized_speak(text, lang)
+    total = time.perf_counter() - start
+    tts.player.shutdown()
+    return {
+        'first_audio_ms': round((engine.first_audio - start) * 1000, 1),
+        'total_ms': round(total * 1000, 1),
+        'chunks': len(engine.chunks),
+        'longest_chunk_chars': max(engine.chunks)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixed-ms', type=float, default=50)
+    parser.add_argument('--ms-per-char', type=float, default=4)
+    parser.add_argument('--produce-ms', type=float, default=150, help="delay per streamed sentence")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = {
+            'amharic': {
+                'chars': len(AMHARIC_TEXT),
+                'legacy': run(LegacyTTS, AMHARIC_TEXT, 'am', args),
+                'segmented': run(raki_ai.HumanizedTTS, AMHARIC_TEXT, 'am', args)
+            },
+            'english_no_spaces': {
+                'chars': len(ENGLISH_TEXT),
+                'legacy': run(LegacyTTS, ENGLISH_TEXT, 'en', args),
+                'segmented': run(raki_ai.HumanizedTTS, ENGLISH_TEXT, 'en', args)
+            },
+            'amharic_streamed': {
+                'joined_then_spoken': run(raki_ai.HumanizedTTS, AMHARIC_TEXT, 'am', args, stream='join'),
+                'streamed': run(raki_ai.HumanizedTTS, AMHARIC_TEXT, 'am', args, stream=True)
+            }
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Startup benchmark for Raki AI
+
+Measures module import time, each startup stage and time to first greeting
+in fresh interpreter processes, then prints the medians as JSON so results
+can be compared across releases.
+
+    python benchmarks/startup_benchmark.py --runs 5 --null-audio
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class NullEngine:
+    """Silent TTS engine so the benchmark doesn't depend on audio hardware"""
+    def set_rate(self, rate):
+        pass
+
+    def set_pitch(self, pitch):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+    def speak(self, text, lang, control=None):
+        pass
+
+
+class NullSTT:
+    """Speech recognizer that never hears anything"""
+    def listen(self):
+        return ""
+
+
+def run_child(null_audio):
+    """Start the assistant once and print its stage timings"""
+    sys.path.insert(0, REPO_ROOT)
+    start = time.perf_counter()
+    import raki_ai
+    import_time = time.perf_counter() - start
+
+    if null_audio:
+        raki_ai.HumanizedTTS.init_engine = lambda self: NullEngine()
+        raki_ai.RakiAI.init_stt = lambda self: NullSTT()
+
+    assistant = raki_ai.RakiAI()
+    assistant.greet()
+    assistant.ready.wait()
+
+    # Background warm-up finishes after ready; give it a moment to report
+    deadline = time.perf_counter() + 30
+    while 'scanner' not in assistant.startup_timings and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+    timings = dict(assistant.startup_timings)
+    timings['import_measured'] = import_time
+    timings['error'] = str(assistant.startup_error) if assistant.startup_error else None
+    print(json.dumps(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--null-audio', action='store_true',
+                        help="replace TTS/STT engines with silent stand-ins")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.null_audio)
+        return
+
+    samples = {}
+    errors = []
+    for _ in range(args.runs):
+        # Each run gets a clean working directory so no state is shared
+        with tempfile.TemporaryDirectory() as workdir:
+            cmd = [sys.executable, os.path.abspath(__file__), '--child']
+            if args.null_audio:
+                cmd.append('--null-audio')
+            out = subprocess.run(cmd, cwd=workdir, capture_output=True, text=True, check=True)
+            timings = json.loads(out.stdout.strip().splitlines()[-1])
+            if timings.pop('error'):
+                errors.append(timings)
+            for stage, value in timings.items():
+                samples.setdefault(stage, []).append(value)
+
+    report = {
+        'runs': args.runs,
+        'python': sys.version.split()[0],
+        'median_ms': {stage: round(statistics.median(values) * 1000, 2)
+                      for stage, values in samples.items()},
+        'max_ms': {stage: round(max(values) * 1000, 2)
+                   for stage, values in samples.items()},
+        'failed_runs': len(errors)
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Concurrency stress benchmark for Raki AI's reminder and history state
+
+Writer threads add reminders (already due) and conversation exchanges
+while firing threads take due reminders and reader threads build
+conversation context, two ways:
+
+- legacy: plain lists appended to and popped by index without locks,
+  as RakiAI used to do
+- store: StateStore with snapshot reads, take() for due reminders and a
+  persistence subscriber that defers writes of the newest snapshot to a
+  Scheduler, as RakiAI does
+
+Every reminder should fire exactly once. The report counts lost and
+double-fired reminders, writes and reads per second, and how many snapshot
+writes the persistence subscriber needed for all the changes.
+
+    python benchmarks/state_store_benchmark.py --writers 8 --ops 5000
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import raki_ai
+
+
+def exchange(i, j):
+    return {'user': f"question {i} {j} about ethiopian coffee", 'ai': "answer", 'language': 'en'}
+
+
+def tally(fired, total):
+    counts = collections.Counter(fired)
+    return {
+        'reminders': total,
+        'fired': len(fired),
+        'lost': total - len(counts),
+        'double_fired': sum(count - 1 for count in counts.values())
+    }
+
+
+def run_threads(args, writer, firer, reader):
+    done = threading.Event()
+    writers = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    others = ([threading.Thread(target=firer, args=(done,)) for _ in range(args.firers)]
+              + [threading.Thread(target=reader, args=(done,)) for _ in range(args.readers)])
+    start = time.perf_counter()
+    for thread in writers + others:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    for thread in others:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def run_legacy(args):
+    state = {'reminders': [], 'history': []}
+    fired = []
+    reads = [0]
+
+    def writer(i):
+        for j in range(args.ops):
+            state['reminders'].append({'id': (i, j), 'time': 0})
+            state['history'].append(exchange(i, j))
+            state['history'] = state['history'][-20:]
+
+    def fire_due():
+        to_remove = []
+        for index, reminder in enumerate(state['reminders']):
+            fired.append(reminder['id'])
+            to_remove.append(index)
+        for index in sorted(to_remove, reverse=True):
+            try:
+                state['reminders'].pop(index)
+            except IndexError:
+                pass
+
+    def firer(done):
+        while not done.is_set():
+            fire_due()
+            time.sleep(args.poll_ms / 1000)
+        fire_due()
+
+    def reader(done):
+        while not done.is_set():
+            for item in state['history'][-3:]:
+                item['user'].split()
+            reads[0] += 1
+            time.sleep(args.poll_ms / 1000)
+
+    elapsed = run_threads(args, writer, firer, reader)
+    total = args.writers * args.ops
+    return dict(tally(fired, total), writes_per_s=round(2 * total / elapsed),
+                reads_per_s=round(reads[0] / elapsed), elapsed_s=round(elapsed, 3))
+
+
+def run_store(args):
+    store = raki_ai.StateStore()
+    scheduler = raki_ai.Scheduler().start()
+    fired = []
+    reads = [0]
+    saves = collections.Counter()
+    saved_versions = {}
+    save_locks = {'reminders': threading.Lock(), 'history': threading.Lock()}
+
+    def persist(name, wait=False):
+        # Same coalescing as RakiAI.persist
+        lock = save_locks[name]
+        while saved_versions.get(name) != store.versioned(name)[0]:
+            if not lock.acquire(blocking=wait):
+                return
+            try:
+                version, items = store.versioned(name)
+                if saved_versions.get(name) != version:
+                    json.dumps(items)
+                    time.sleep(args.save_ms / 1000)
+                    saved_versions[name] = version
+                    saves[name] += 1
+            finally:
+                lock.release()
+
+    def schedule_save(name, snapshot):
+        # Same deferral as RakiAI.schedule_save
+        if not scheduler.pending(f'save_{name}'):
+            scheduler.at(f'save_{name}', time.time() + args.save_delay, lambda: persist(name))
+
+    store.subscribe('reminders', schedule_save)
+    store.subscribe('history', schedule_save)
+
+    def writer(i):
+        for j in range(args.ops):
+            store.append('reminders', {'id': (i, j), 'time': 0})
+            store.append('history', exchange(i, j), limit=20)
+
+    def firer(done):
+        while not done.is_set():
+            fired.extend(reminder['id'] for reminder in store.take('reminders', lambda r: r['time'] <= 1))
+            time.sleep(args.poll_ms / 1000)
+        fired.extend(reminder['id'] for reminder in store.take('reminders', lambda r: True))
+
+    def reader(done):
+        while not done.is_set():
+            for item in store.get('history')[-3:]:
+                item['user'].split()
+            reads[0] += 1
+            time.sleep(args.poll_ms / 1000)
+
+    elapsed = run_threads(args, writer, firer, reader)
+    scheduler.stop()
+    for name in save_locks:
+        persist(name, wait=True)  # Shutdown flush, as RakiAI.shutdown does
+    total = args.writers * args.ops
+    return dict(tally(fired, total), writes_per_s=round(2 * total / elapsed),
+                reads_per_s=round(reads[0] / elapsed), elapsed_s=round(elapsed, 3), changes=2 * total,
+                snapshot_writes=dict(saves), history_kept=len(store.get('history')),
+                final_state_saved=all(saved_versions.get(name) == store.versioned(name)[0] for name in save_locks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--firers', type=int, default=2)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--ops', type=int, default=5000, help="reminders and exchanges per writer")
+    parser.add_argument('--save-ms', type=float, default=2, help="simulated encrypted write time")
+    parser.add_argument('--save-delay', type=float, default=0.2, help="state_save_delay: seconds to gather changes")
+    parser.add_argument('--poll-ms', type=float, default=0.5, help="pause between firing and reading passes")
+    parser.add_argument('--switch-interval', type=float, default=1e-6,
+                        help="thread switch interval; small values expose races sooner")
+    args = parser.parse_args()
+
+    sys.setswitchinterval(args.switch_interval)
+    print(json.dumps({
+        'threads': {'writers': args.writers, 'firers': args.firers, 'readers': args.readers},
+        'legacy': run_legacy(args),
+        'store': run_store(args)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
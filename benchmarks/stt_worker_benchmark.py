@@ -0,0 +1,159 @@
+"""Main-process responsiveness with speech recognition in and out of process
+
+A synthetic real-time microphone feeds a SharedAudioRing and a
+BusyDecoder recognizes utterances from it back to back, with Kaldi-like
+CPU bursts that hold the GIL. Meanwhile the main process runs what
+playback and background work need to stay on time:
+
+- a 5 ms ticker thread (how late each tick wakes)
+- a Scheduler task every 20 ms (how far each interval strays)
+
+Two modes, as the stt_process setting chooses:
+
+- off: capture and decoding run on threads in this process
+- on: an STTWorker runs them in a child process and only transcripts
+  cross the queue; the worker is killed partway through to measure how
+  long recognition takes to come back
+
+    python benchmarks/stt_worker_benchmark.py --seconds 10 --chunk-ms 60
+"""
+import argparse
+import functools
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import raki_ai
+
+from fake_audio import BusyDecoder, SyntheticCapture
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summary(values):
+    return {
+        'p50': round(percentile(values, 50) * 1000, 2),
+        'p99': round(percentile(values, 99) * 1000, 2),
+        'max': round(max(values) * 1000, 2)
+    }
+
+
+class InProcessSTT:
+    """Capture thread and decoder in this process, as with stt_process off"""
+
+    def __init__(self, decoder):
+        self.decoder = decoder
+        self.ring = raki_ai.SharedAudioRing.create(5)
+        self.capture = SyntheticCapture()
+        self.stopping = threading.Event()
+        threading.Thread(target=self.capture_loop, daemon=True).start()
+
+    def capture_loop(self):
+        while not self.stopping.is_set():
+            self.ring.write(self.capture.read())
+
+    def listen(self):
+        return self.decoder.transcribe(self.ring.reader())
+
+    def stop(self):
+        self.stopping.set()
+        time.sleep(0.1)
+        self.ring.close()
+        self.ring.unlink()
+
+
+def measure(stt, args, kill_at=None):
+    """Run the listener, ticker and scheduler together for args.seconds"""
+    done = threading.Event()
+    heard = []  # (monotonic time, text)
+
+    def listener():
+        while not done.is_set():
+            text = stt.listen()
+            heard.append((time.monotonic(), text))
+
+    scheduler = raki_ai.Scheduler().start()
+    ticks = []
+    scheduler.every('tick', 0.02, lambda: ticks.append(time.monotonic()), jitter=0, blocking=False)
+    if isinstance(stt, raki_ai.STTWorker):
+        scheduler.every('stt_worker', 1, stt.supervise, jitter=0)
+        # Let the worker import and start capturing before timing anything
+        while stt.ring.heartbeat_age() is None:
+            time.sleep(0.05)
+
+    thread = threading.Thread(target=listener, daemon=True)
+    cpu = time.process_time()
+    start = time.monotonic()
+    thread.start()
+    lateness = []
+    killed = None
+    next_tick = start
+    while time.monotonic() - start < args.seconds:
+        next_tick += 0.005
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+        lateness.append(max(0.0, time.monotonic() - next_tick))
+        if kill_at is not None and killed is None and time.monotonic() - start >= kill_at:
+            killed = time.monotonic()
+            os.kill(stt.process.pid, signal.SIGKILL)
+    elapsed = time.monotonic() - start
+    cpu = time.process_time() - cpu
+    done.set()
+    scheduler.stop()
+    thread.join(args.seconds)
+
+    intervals = [b - a for a, b in zip(ticks, ticks[1:])]
+    recognized = [at for at, text in heard if text == 'hello raki' and at <= start + elapsed]
+    result = {
+        'utterances': len(recognized),
+        'utterances_per_s': round(len(recognized) / elapsed, 2),
+        'tick_late_ms': summary(lateness),
+        'scheduler_interval_error_ms': summary([abs(i - 0.02) for i in intervals]),
+        'main_process_cpu_s': round(cpu, 2)
+    }
+    if killed is not None:
+        after = [at for at in recognized if at > killed]
+        result['restarts'] = stt.stats['restarts']
+        result['recovery_s'] = round(after[0] - killed, 2) if after else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--chunk-ms', type=float, default=60, help="decoder CPU per 250 ms of audio")
+    parser.add_argument('--final-ms', type=float, default=250, help="decoder CPU spike per utterance")
+    parser.add_argument('--kill-at', type=float, default=None,
+                        help="seconds into the worker run to kill it (default: halfway)")
+    args = parser.parse_args()
+
+    decoder = functools.partial(BusyDecoder, args.chunk_ms, args.final_ms)
+    local = InProcessSTT(decoder())
+    try:
+        off = measure(local, args)
+    finally:
+        local.stop()
+
+    worker = raki_ai.STTWorker(decoder, SyntheticCapture, ring_seconds=5).start()
+    try:
+        on = measure(worker, args, kill_at=args.kill_at if args.kill_at is not None else args.seconds / 2)
+    finally:
+        worker.stop()
+
+    print(json.dumps({
+        'settings': {'seconds': args.seconds, 'chunk_ms': args.chunk_ms, 'final_ms': args.final_ms},
+        'stt_process_off': off,
+        'stt_process_on': on
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
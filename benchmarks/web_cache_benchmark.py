@@ -0,0 +1,77 @@
+"""Search response cache benchmark for Raki AI
+
+Runs a local stand-in for the Custom Search API with artificial latency and
+issues a mix of repeated queries through SearchClient, reporting miss and
+hit latency and the cache hit rate as JSON.
+
+    python benchmarks/web_cache_benchmark.py --queries 200 --latency 0.15
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import raki_ai
+from fake_services import start_search
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--topics', type=int, default=20, help="distinct topics in the mix")
+    parser.add_argument('--latency', type=float, default=0.1, help="stand-in API delay in seconds")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    server = start_search(args.latency)
+    api_url = f"http://127.0.0.1:{server.server_address[1]}/customsearch/v1"
+    rng = random.Random(args.seed)
+    topics = [f"topic {i}" for i in range(args.topics)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cipher = raki_ai.StreamCipher(Fernet.generate_key())
+        cache = raki_ai.ResponseCache(cipher, directory=os.path.join(workdir, 'cache'))
+        client = raki_ai.SearchClient(raki_ai.HttpClient(), cache, api_url, 'test-key', 'test-cx')
+
+        hits, misses = [], []
+        for _ in range(args.queries):
+            # Vary case and spacing to exercise query normalization
+            topic = rng.choice(topics)
+            query = rng.choice([topic, topic.upper(), f"  {topic}  "])
+            before = cache.stats['hits']
+            start = time.perf_counter()
+            client.search(query, num=3)
+            elapsed = (time.perf_counter() - start) * 1000
+            (hits if cache.stats['hits'] > before else misses).append(elapsed)
+
+    server.shutdown()
+    report = {
+        'queries': args.queries,
+        'api_requests': server.requests_served,
+        'hit_rate': round(cache.hit_rate(), 3),
+        'miss_ms': {'p50': round(statistics.median(misses), 2), 'p99': round(percentile(misses, 99), 2)}
+        if misses else None,
+        'hit_ms': {'p50': round(statistics.median(hits), 3), 'p99': round(percentile(hits, 99), 3)}
+        if hits else None,
+        'cache_bytes': cache.total_bytes
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,45 +1,1144 @@
+import time
+_MODULE_LOAD_START = time.perf_counter()
+
 import os
+import sys
 import platform
 import subprocess
-import speech_recognition as sr
-import pyttsx3
 import datetime
-import psutil
 import smtplib
 import json
-import time
 import webbrowser
 import shutil
 import socket
 import re
 import threading
+import queue
+import collections
+import functools
+import itertools
+import heapq
 import random
-import requests
-from bs4 import BeautifulSoup
-from PIL import Image
 import io
 import hashlib
-import nmap
-import geocoder
+import base64
+import struct
+import signal
+import mmap
+import tempfile
 from email.message import EmailMessage
-from cryptography.fernet import Fernet
-from langdetect import detect, LangDetectException
 import logging
 
+# Heavy third-party modules (speech_recognition, pyttsx3, psutil, requests,
+# PIL, nmap, geocoder, cryptography) are imported where they are first used
+# so the assistant can greet before they are all loaded.
+
 # Configuration
 CONFIG_FILE = "raki_config.json"
 REMINDERS_FILE = "encrypted_reminders.rak"
 KEY_FILE = "secret.key"
 HISTORY_FILE = "conversation_history.json"
+LOCATION_CACHE_FILE = "location_cache.rak"
+WEB_CACHE_DIR = "web_cache"
+IMAGE_CACHE_DIR = "image_cache"
+PACKAGE_INDEX_FILE = "package_index.txt"
+APT_UPDATE_STAMP = "apt_update.stamp"
+OUTBOX_FILE = "outbox.rak"
+PHRASE_PACK_FILE = "phrase_pack.rakp"
+PHRASE_PACK_VERSION = 2
+SEARCH_API_URL = "https://www.googleapis.com/customsearch/v1"
 VOSK_MODEL_DIR = "vosk_models"
 MARYTTS_DIR = "marytts"
 MARYTTS_SERVER = "http://localhost:59125"
+STREAM_MAGIC = b"RAKS"
+STREAM_VERSION = 1
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_NONCE_PREFIX_SIZE = 7
+STREAM_HEADER_SIZE = len(STREAM_MAGIC) + 5 + STREAM_NONCE_PREFIX_SIZE
+STREAM_TAG_SIZE = 16
+# Speech segmentation: Latin, Ethiopic, CJK and Arabic sentence and clause marks
+SENTENCE_MARKS = ".!?።፧፨。！？؟"
+CLAUSE_MARKS = ",;:፣፤፥፦、，；：،"
+CLOSING_MARKS = "\"')]}»”’」』"
+DEFAULT_ALERT_RULES = [
+    {'name': 'cpu', 'metric': 'cpu', 'threshold': 85, 'clear': 75, 'duration': 60,
+     'realert': 1800, 'message': "High CPU usage: {value:.0f}%"},
+    {'name': 'ram', 'metric': 'ram', 'threshold': 85, 'clear': 80, 'duration': 60,
+     'realert': 1800, 'message': "High RAM usage: {value:.0f}%"},
+    {'name': 'ram_growth', 'metric': 'ram', 'kind': 'rate', 'threshold': 1, 'clear': 0.2,
+     'duration': 300, 'message': "RAM usage is climbing about {value:.1f}% per minute"},
+    {'name': 'disk', 'metric': 'disk', 'threshold': 90, 'clear': 88,
+     'realert': 86400, 'message': "Low disk space: {value:.0f}% used"},
+    {'name': 'temperature', 'metric': 'temperature', 'threshold': 85, 'clear': 80,
+     'duration': 30, 'realert': 900, 'message': "High temperature: {value:.0f}°C"},
+    {'name': 'battery', 'metric': 'battery', 'threshold': 15, 'direction': 'below',
+     'clear': 20, 'only_if': {'battery_plugged': 0.0},
+     'message': "Low battery: {value:.0f}% remaining"}
+]
+# Asking for the running install or update to stop; the whole command must match, so
+# "remind me to cancel ..." still sets a reminder
+CANCEL_PATTERN = re.compile(r'(cancel|stop)( (the )?(command|install\w*|updat\w*|upgrad\w*))|cancel')
+
+# Fixed phrases; the phrase pack pre-renders all of them
+OPENINGS = {
+    'am': [
+        "ሰላም! ራኪ ኤአይ ነኝ። እንዴት ልርዶዎ?",
+        "ቀን በሰላም! ረዳት ሆኜ ሊገኝ እችላለሁ። እባክዎን ያስቀምጡ።",
+        "ሰላምታ! ዛሬ ምን ላድርግ ይፈልጋሉ?"
+    ],
+    'en': [
+        "Hello! I'm Raki AI, your personal assistant. How can I help?",
+        "Good day! I'm here and ready to assist. What can I do for you?",
+        "Raki AI activated. How may I assist you today?"
+    ]
+}
+HELP_MESSAGES = {
+    'am': "የምሠራው ነገር፦ መተግበሪያ መጫን፣ ስርዓት ማደስ፣ ችግር መፈተስ፣ አስታውስት ማስቀመጥ፣ ኢሜል ላክ፣ ድረገጽ ክፈት፣ ቋንቋ ቀይር፣ የምስል ፍለጋ፣ የድረገጽ ፍለጋ፣ ቀልድ ንገር። ምን ትፈልጋለህ?",
+    'en': "I can help with: Installing software, system updates, diagnostics, "
+          "setting reminders, sending emails, web research, image search, "
+          "changing languages, telling jokes, and more. What would you like to do?"
+}
+ETHIOPIAN_JOKES = [
+    "ለምን ኮምፒውተር በኢትዮጵያ ውስጥ በጣም ያለመሳት ነው? ምክንያቱም ሁል ጊዜ 'ኢትዮጵያ ትርፍ!' ይላል!",
+    "ሁለት ኮምፒውተሮች በአዲስ አበባ ውስጥ ይገናኛሉ። አንደኛው ሌላኛውን ይለውጣል። 'አዎ እርግጥ ነው ነገር ግን ከኔ ጋር የምትነጋገረው በአማርኛ ነው?'",
+    "ለምን ኢትዮጵያዊው ኮምፒውተር በሳምንት ሁለት ጊዜ ይጠፋል? ምክንያቱም ትሩን ያጠፋል!"
+]
+ETHIOPIAN_PROVERBS = [
+    "በብርሃን የተገነባ ቤት በጨለማ አይጠፋም።",
+    "አንድ እጅ ሁለት እጅን ያጠባል።",
+    "ውሀ እስካልገባበት ድረስ ጥጃ አይታወቅም።"
+]
+ENGLISH_JOKES = [
+    "Why do programmers prefer dark mode? Because light attracts bugs!",
+    "What do you call a computer that sings? A Dell!",
+    "Why was the computer cold? It left its Windows open!",
+    "What do you get when you cross a computer and a lifeguard? A screensaver!",
+    "Why did the computer go to the doctor? It had a virus!"
+]
+CULTURAL_ADDONS = [
+    "እባክዎን ያስተውሉ።",
+    "በኢትዮጵያ ባህል መሠረት።",
+    "እንደምትለው ነው።"
+]
+CANNED_REPLIES = {
+    'am': {
+        'greeting': "ሰላም! እንዴት ልርዶዎ?",
+        'help': "እባክዎ ያስቀምጡ፣ ወዲያው እሠራለሁ!",
+        'image_failed': "ምስል ማግኘት አልቻልኩም። ይቅርታ!",
+        'research_failed': "መረጃ ማግኘት አልቻልኩም።",
+        'about': "ራኪ ኤአይ በራኪቦይ ኦኤስ ላይ የሚሰራ የኢትዮጵያ ሰው ሰራሽ አስማት ነው። በፓይዘን ተገንብቶ በኢትዮጵያ ባህል እና ቋንቋ የተለየ ነው!",
+        'language': "አማርኛ ተናገር! እባክዎ ያስቀምጡ።"
+    },
+    'en': {
+        'install_missing': "Please specify which package you'd like me to install.",
+        'cancelling': "Stopping it now.",
+        'nothing_to_cancel': "Nothing is running right now.",
+        'diagnostics_ok': "All systems normal.",
+        'no_research': "No research results found.",
+        'next_image': "Here's the next one.",
+        'no_more_images': "No more images to show.",
+        'after_joke': "Hope that brought a smile!",
+        'incognito_on': "Incognito mode enabled.",
+        'incognito_off': "Incognito mode disabled.",
+        'erased': "All personal data erased.",
+        'greeting': ["Hello! How can I assist you today?"],
+        'thanks': ["You're welcome! Always happy to help."],
+        'how_are_you': ["I'm functioning perfectly! How can I assist you today?"],
+        'ethiopia': [
+            "Ethiopia is the cradle of humanity with a rich cultural heritage dating back millennia.",
+            "Did you know Ethiopia has its own calendar with 13 months?",
+            "Ethiopian coffee is considered some of the finest in the world!"
+        ],
+        'goodbye': ["Goodbye! Feel free to call if you need anything."]
+    }
+}
 
 # Setup logging
 logging.basicConfig(filename='raki_ai.log', level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('RakiAI')
 
+class NullSpan:
+    """Span used while tracing is off"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    """Times one traced region"""
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class Tracer:
+    """Lightweight span recorder with Chrome trace-event export
+
+    Disabled by default; span() then hands back a shared no-op object, so
+    instrumented code pays one attribute check.
+    """
+
+    def __init__(self, enabled=False, capacity=20000):
+        self.enabled = enabled
+        self.events = collections.deque(maxlen=capacity)
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    def span(self, name, **args):
+        """Context manager timing a region"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def record(self, name, start, end, args=None):
+        """Store a completed span"""
+        self.events.append({
+            'name': name,
+            'ph': 'X',
+            'ts': (start - self.origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': self.pid,
+            'tid': threading.get_ident(),
+            'args': args or {}
+        })
+
+    def memory_bytes(self):
+        """Approximate bytes held by buffered spans"""
+        try:
+            return len(self.events) * deep_sizeof(self.events[-1])
+        except IndexError:
+            return 0
+
+    def release(self, nbytes):
+        """Drop the oldest spans holding about nbytes"""
+        per_event = self.memory_bytes() / max(1, len(self.events))
+        dropped = 0
+        while self.events and dropped * per_event < nbytes:
+            try:
+                self.events.popleft()
+            except IndexError:
+                break
+            dropped += 1
+        return int(dropped * per_event)
+
+    def export_chrome(self, path):
+        """Write buffered spans as Chrome trace-event JSON (chrome://tracing, Perfetto)"""
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    @staticmethod
+    def summarize(events):
+        """Count and latency percentiles in ms per span name"""
+        durations = {}
+        for event in events:
+            durations.setdefault(event['name'], []).append(event['dur'] / 1000)
+        report = {}
+        for name, values in durations.items():
+            values.sort()
+            report[name] = {
+                'count': len(values),
+                'total_ms': round(sum(values), 2),
+                'p50_ms': round(values[len(values) // 2], 2),
+                'p95_ms': round(values[min(len(values) - 1, int(len(values) * 0.95))], 2),
+                'max_ms': round(values[-1], 2)
+            }
+        return report
+
+    def report(self, seconds=None):
+        """Summary of the rolling buffer, optionally only the last `seconds`"""
+        events = list(self.events)
+        if seconds is not None:
+            cutoff = (time.perf_counter() - self.origin - seconds) * 1e6
+            events = [e for e in events if e['ts'] >= cutoff]
+        return self.summarize(events)
+
+
+tracer = Tracer()
+
+
+def traced(name):
+    """Decorator recording each call as a span when tracing is enabled"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with Span(tracer, name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class Metric:
+    """Base for registry metrics; samples are keyed by label values"""
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.function = None
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        """Label values in declaration order"""
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def set_function(self, function):
+        """Read values from function() at collection time
+
+        The function returns a number, or a dict of label-value tuples to
+        numbers for labelled metrics.
+        """
+        self.function = function
+        return self
+
+    def current(self):
+        """Snapshot of {label values: value}"""
+        if self.function is None:
+            with self.lock:
+                return dict(self.values)
+        try:
+            value = self.function()
+        except Exception as e:
+            logger.warning(f"Metric {self.name} collection failed: {str(e)}")
+            return {}
+        return value if isinstance(value, dict) else {(): value}
+
+    def samples(self):
+        """(suffix, labels dict, value) triples for export"""
+        return [('', dict(zip(self.labels, key)), value)
+                for key, value in sorted(self.current().items())]
+
+
+class CounterMetric(Metric):
+    """Monotonic count"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Add amount to the labelled count"""
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class GaugeMetric(Metric):
+    """Value that goes up and down"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        """Store the current value"""
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+
+class HistogramMetric(Metric):
+    """Latency distribution in cumulative buckets"""
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """Record one observation in seconds"""
+        key = self.key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['counts'][i] += 1
+                    break
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def time(self, **labels):
+        """Context manager observing the duration of a block"""
+        return HistogramTimer(self, labels)
+
+    def current(self):
+        with self.lock:
+            return {key: {'counts': list(entry['counts']), 'sum': entry['sum'], 'count': entry['count']}
+                    for key, entry in self.values.items()}
+
+    def samples(self):
+        samples = []
+        for key, entry in sorted(self.current().items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry['counts']):
+                cumulative += count
+                samples.append(('_bucket', dict(labels, le=repr(float(bound))), cumulative))
+            samples.append(('_bucket', dict(labels, le='+Inf'), entry['count']))
+            samples.append(('_sum', labels, entry['sum']))
+            samples.append(('_count', labels, entry['count']))
+        return samples
+
+
+class HistogramTimer:
+    """Times a block into a histogram"""
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and histograms
+
+    Exported as Prometheus text or a JSON snapshot. Registering a name twice
+    returns the existing metric, so modules can declare what they use.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric unless one with the same name exists"""
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(CounterMetric(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self.register(GaugeMetric(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=HistogramMetric.DEFAULT_BUCKETS):
+        return self.register(HistogramMetric(name, help_text, labels, buckets))
+
+    @staticmethod
+    def format_labels(labels):
+        """Render {k: v} as a Prometheus label set"""
+        if not labels:
+            return ''
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                   for v in labels.values())
+        return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+    def render_prometheus(self):
+        """Text exposition format 0.0.4"""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                text = str(value) if isinstance(value, int) else repr(float(value))
+                lines.append(f"{metric.name}{suffix}{self.format_labels(labels)} {text}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON-serializable view of every metric"""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda m: m.name)
+        result = {}
+        for metric in metrics:
+            samples = []
+            for key, value in sorted(metric.current().items()):
+                samples.append({'labels': dict(zip(metric.labels, key)), 'value': value})
+            result[metric.name] = {'type': metric.kind, 'help': metric.help, 'samples': samples}
+            if isinstance(metric, HistogramMetric):
+                result[metric.name]['buckets'] = list(metric.buckets)
+        return result
+
+
+class MetricsServer:
+    """Serves the registry on a local port: /metrics (Prometheus) and /metrics.json"""
+
+    def __init__(self, registry, host='127.0.0.1', port=9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        """Bind and serve from a daemon thread"""
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    body = registry.render_prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif path == '/metrics.json':
+                    body = json.dumps(registry.snapshot()).encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logger.info(f"Metrics endpoint on http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        """Shut the listener down"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+registry = MetricsRegistry()
+COMMANDS_TOTAL = registry.counter('raki_commands_total', 'Commands handled, by intent', ('intent',))
+COMMAND_SECONDS = registry.histogram('raki_command_seconds', 'Time to handle a command including the spoken reply', ('intent',))
+STT_FAILURES = registry.counter('raki_stt_failures_total', 'Speech recognition attempts that produced no text', ('engine', 'reason'))
+TTS_CACHE_HITS = registry.counter('raki_tts_cache_hits_total', 'Phrases played from pre-rendered audio', ('engine',))
+PERSIST_SECONDS = registry.histogram('raki_persist_seconds', 'Time to encrypt and write a state file', ('file',))
+SCAN_SECONDS = registry.histogram('raki_scan_seconds', 'Background port scan duration', ('kind',))
+TTS_INTERRUPT_SECONDS = registry.histogram(
+    'raki_tts_interrupt_seconds', 'From interrupt (or detected speech onset) to playback stopping', ('source',),
+    buckets=(0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1, 2.5))
+SCHEDULER_LAG_SECONDS = registry.histogram(
+    'raki_scheduler_lag_seconds', 'How late scheduled tasks started', ('task',),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+TASK_SECONDS = registry.histogram('raki_task_seconds', 'Scheduled task runtime', ('task',))
+SCHEDULER_SKIPPED = registry.counter('raki_scheduler_skipped_total', 'Task runs skipped', ('task', 'reason'))
+STT_WORKER_RESTARTS = registry.counter('raki_stt_worker_restarts_total', 'Speech recognition worker process restarts', ('reason',))
+MEMORY_EVICTED = registry.counter('raki_memory_evicted_bytes_total', 'Bytes given back by caches over the memory budget', ('owner',))
+PROVIDER_CALLS = registry.counter('raki_provider_calls_total', 'Speech provider calls, by outcome', ('kind', 'provider', 'outcome'))
+PROVIDER_SECONDS = registry.histogram('raki_provider_seconds', 'Successful speech provider call duration', ('kind', 'provider'))
+
+
+class PlaybackControl:
+    """Stop and pause flags an engine checks while it plays one utterance"""
+    def __init__(self, running):
+        self.cancelled = threading.Event()
+        self.running = running  # Shared by the player; cleared while paused
+
+    def wait_running(self):
+        """Block while paused; True if the utterance was cancelled meanwhile"""
+        while not self.running.wait(0.05):
+            if self.cancelled.is_set():
+                return True
+        return self.cancelled.is_set()
+
+
+def stop_process(proc):
+    """Terminate a player process and its children"""
+    try:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGTERM)
+            os.killpg(proc.pid, signal.SIGCONT)  # A paused group only sees SIGTERM once continued
+        else:
+            proc.terminate()
+        proc.wait(timeout=1)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def run_player(argv, control=None, data=None, poll=0.01):
+    """Run an audio player, stopping or pausing it as control requests
+
+    data, if given, is streamed to the player's stdin. Returns False when
+    playback was cut short.
+    """
+    proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL if data is None else subprocess.PIPE,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=(os.name == 'posix'))
+    if data is not None:
+        def feed():
+            try:
+                proc.stdin.write(data)
+                proc.stdin.close()
+            except OSError:
+                pass  # Player exited or was stopped
+        threading.Thread(target=feed, daemon=True).start()
+    if control is None:
+        return proc.wait() == 0
+
+    paused = False
+    try:
+        while proc.poll() is None:
+            if control.cancelled.wait(poll):
+                stop_process(proc)
+                return False
+            if os.name == 'posix' and paused == control.running.is_set():
+                paused = not paused
+                os.killpg(proc.pid, signal.SIGSTOP if paused else signal.SIGCONT)
+        return proc.returncode == 0
+    finally:
+        if proc.poll() is None:
+            stop_process(proc)
+
+
+def audio_player_command(path):
+    """Command line for an interruptible external player, or None"""
+    if platform.system() == 'Darwin':
+        return ['afplay', path]
+    if path.endswith('.wav'):
+        for player in (['aplay', '-q'], ['paplay']):
+            if shutil.which(player[0]):
+                return player + [path]
+    if shutil.which('mpg123'):
+        return ['mpg123', '-q', path]
+    if shutil.which('ffplay'):
+        return ['ffplay', '-nodisp', '-autoexit', '-loglevel', 'quiet', path]
+    return None
+
+
+def audio_stream_command(fmt):
+    """Command line for a player that reads a whole clip from stdin, or None"""
+    if platform.system() == 'Darwin':
+        return None  # afplay only plays files
+    if fmt == 'wav' and shutil.which('aplay'):
+        return ['aplay', '-q', '-']
+    if fmt == 'mp3' and shutil.which('mpg123'):
+        return ['mpg123', '-q', '-']
+    if shutil.which('ffplay'):
+        return ['ffplay', '-nodisp', '-autoexit', '-loglevel', 'quiet', '-']
+    return None
+
+
+def play_audio_bytes(data, fmt, control=None):
+    """Play an in-memory clip, piping it to the player when possible"""
+    argv = audio_stream_command(fmt)
+    if argv:
+        return run_player(argv, control, data)
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return play_audio_file(path, control)
+    finally:
+        os.remove(path)
+
+
+def play_audio_file(path, control=None):
+    """Play a wav/mp3 file; returns False if it was interrupted"""
+    argv = audio_player_command(path)
+    if argv:
+        return run_player(argv, control)
+
+    if platform.system() == 'Windows' and path.endswith('.wav'):
+        import winsound
+        import wave
+        with wave.open(path) as w:
+            duration = w.getnframes() / float(w.getframerate())
+        winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+        if control is not None and control.cancelled.wait(duration):
+            winsound.PlaySound(None, winsound.SND_PURGE)
+            return False
+        if control is None:
+            time.sleep(duration)
+        return True
+
+    # Last resort; blocks until the clip ends
+    from playsound import playsound
+    playsound(path)
+    return True
+
+
+class PhrasePack:
+    """Pre-rendered audio for fixed phrases
+
+    One file of concatenated clips plus a JSON index of offsets next to it.
+    The clip file is memory-mapped, so lookups cost a dict access and
+    playback streams straight out of the page cache.
+    """
+
+    def __init__(self, path=PHRASE_PACK_FILE):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.index = {}
+        self.file = None
+        self.map = None
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'clips': 0, 'bytes': 0}
+        # Clips played since the mapping's pages were last given back
+        self.touched = set()
+        self.resident_bytes = 0
+        self.last_used = 0
+
+    @staticmethod
+    def key(voice, profile, lang, text):
+        """Clip key for one chunk as a given voice and profile would say it"""
+        raw = "\0".join((voice, profile, lang, text)).encode('utf-8')
+        return hashlib.sha1(raw).hexdigest()
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def open(self):
+        """Map an existing pack; a missing or stale pack leaves it empty"""
+        with self.lock:
+            self.close()
+            if not (os.path.exists(self.path) and os.path.exists(self.index_path)):
+                return self
+            try:
+                with open(self.index_path) as f:
+                    index = json.load(f)
+                if index.get('version') != PHRASE_PACK_VERSION:
+                    logger.info("Phrase pack is from another version; it will be rebuilt")
+                    return self
+                if os.path.getsize(self.path):
+                    self.file = open(self.path, 'rb')
+                    self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.index = index['clips']
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Error opening phrase pack: {str(e)}")
+                self.close()
+            self.stats['clips'] = len(self.index)
+            self.stats['bytes'] = len(self.map) if self.map else 0
+        return self
+
+    def close(self):
+        """Release the mapping"""
+        if self.map:
+            self.map.close()
+        if self.file:
+            self.file.close()
+        self.map = self.file = None
+        self.index = {}
+        self.touched = set()
+        self.resident_bytes = 0
+
+    def get(self, key):
+        """(bytes, format) for a clip, or None"""
+        entry = self.index.get(key)
+        if entry is None or self.map is None:
+            self.stats['misses'] += 1
+            return None
+        offset, length, fmt = entry
+        self.stats['hits'] += 1
+        self.last_used = time.time()
+        if key not in self.touched:
+            self.touched.add(key)
+            self.resident_bytes += length
+        # A copy, so no exported buffer pins the mapping when the pack is swapped
+        return self.map[offset:offset + length], fmt
+
+    def memory_bytes(self):
+        """Bytes of played clips likely resident in the mapping"""
+        return self.resident_bytes
+
+    def release(self, nbytes):
+        """Give the mapping's pages back; clips fault back in from the page cache"""
+        with self.lock:
+            if self.map is None or not hasattr(mmap, 'MADV_DONTNEED'):
+                return 0
+            self.map.madvise(mmap.MADV_DONTNEED)
+            freed, self.resident_bytes = self.resident_bytes, 0
+            self.touched = set()
+        return freed
+
+    def add(self, clips):
+        """Rewrite the pack with clips ({key: (bytes, format)}) added"""
+        if not clips:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with self.lock:
+            index = {}
+            offset = 0
+            with open(tmp_path, 'wb') as f:
+                for key, (offset_old, length, fmt) in self.index.items():
+                    f.write(self.map[offset_old:offset_old + length])
+                    index[key] = [offset, length, fmt]
+                    offset += length
+                for key, (data, fmt) in clips.items():
+                    f.write(data)
+                    index[key] = [offset, len(data), fmt]
+                    offset += len(data)
+            self.close()
+            os.replace(tmp_path, self.path)
+            with open(f"{self.index_path}.tmp", 'w') as f:
+                json.dump({'version': PHRASE_PACK_VERSION, 'clips': index}, f)
+            os.replace(f"{self.index_path}.tmp", self.index_path)
+        self.open()
+        logger.info(f"Phrase pack now holds {len(self.index)} clips ({self.stats['bytes']} bytes)")
+
+
+class Utterance:
+    """One queued response, spoken chunk by chunk, or a task for the worker"""
+    def __init__(self, chunks, lang, profile, running, task=None):
+        self.chunks = chunks
+        self.lang = lang
+        self.profile = profile
+        self.task = task
+        self.control = PlaybackControl(running)
+        self.done = threading.Event()
+        self.interrupted = False
+        self.interrupt_time = None
+        self.interrupt_source = None
+
+    def wait(self, timeout=None):
+        """Block until spoken, stopped or flushed"""
+        return self.done.wait(timeout)
+
+
+class SpeechPlayer:
+    """Single playback worker that drives the TTS engine
+
+    Every engine call happens on this thread, so engines that are not
+    thread-safe (pyttsx3) see one caller no matter who asked to speak.
+    stop() cuts the current utterance and drops the queue, flush() only
+    drops the queue, and pause()/resume() hold playback in place.
+    """
+
+    def __init__(self, engine, apply_profile):
+        self.engine = engine
+        self.apply_profile = apply_profile
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.running = threading.Event()
+        self.running.set()
+        self.speaking = threading.Event()
+        self.stop_event = threading.Event()
+        self.current = None
+        self.thread = None
+        self.phrases = None
+        self.stats = {'utterances': 0, 'interrupted': 0, 'flushed': 0, 'last_interrupt_ms': None}
+
+    def start(self):
+        """Start the playback thread"""
+        self.thread = threading.Thread(target=self.run, name='speech', daemon=True)
+        self.thread.start()
+        return self
+
+    def say(self, chunks, lang='en', profile='neutral'):
+        """Queue chunks for playback and return the Utterance"""
+        utterance = Utterance(chunks, lang, profile, self.running)
+        with self.condition:
+            self.queue.append(utterance)
+            self.speaking.set()
+            self.condition.notify()
+        return utterance
+
+    def submit(self, task):
+        """Run task() on the playback thread between utterances"""
+        job = Utterance([], None, None, self.running, task=task)
+        with self.condition:
+            self.queue.append(job)
+            self.condition.notify()
+        return job
+
+    def flush(self):
+        """Drop queued utterances; the current one keeps playing"""
+        with self.condition:
+            dropped = [u for u in self.queue if u.task is None]
+            tasks = [u for u in self.queue if u.task is not None]
+            self.queue.clear()
+            self.queue.extend(tasks)
+            self.stats['flushed'] += len(dropped)
+        for utterance in dropped:
+            utterance.interrupted = True
+            utterance.done.set()
+        return len(dropped)
+
+    def interrupt(self, since=None, source='stop'):
+        """Cut the current utterance; since is when the request really began"""
+        with self.condition:
+            utterance = self.current
+            if utterance is None or utterance.control.cancelled.is_set():
+                return False
+            utterance.interrupt_time = since or time.perf_counter()
+            utterance.interrupt_source = source
+            utterance.control.cancelled.set()
+        return True
+
+    def stop(self, since=None, source='stop'):
+        """Flush the queue and cut the current utterance"""
+        self.flush()
+        self.interrupt(since, source)
+        self.resume()
+
+    def pause(self):
+        """Hold playback where it is"""
+        self.running.clear()
+
+    def resume(self):
+        """Continue after pause()"""
+        self.running.set()
+
+    def shutdown(self):
+        """Stop speaking and end the worker"""
+        self.stop_event.set()
+        self.stop()
+        with self.condition:
+            self.condition.notify_all()
+
+    def run(self):
+        """Speak queued utterances in order"""
+        while True:
+            with self.condition:
+                while not self.queue and not self.stop_event.is_set():
+                    self.speaking.clear()
+                    self.condition.wait()
+                if self.stop_event.is_set():
+                    self.speaking.clear()
+                    return
+                self.current = self.queue.popleft()
+                if self.current.task is None:
+                    self.speaking.set()
+                else:
+                    self.speaking.clear()
+            utterance = self.current
+            try:
+                if utterance.task is not None:
+                    utterance.task()
+                else:
+                    self.play(utterance)
+            except Exception as e:
+                logger.error(f"Playback error: {str(e)}")
+            finally:
+                with self.condition:
+                    self.current = None
+                utterance.done.set()
+
+    def play_cached(self, chunk, utterance):
+        """Play chunk from the phrase pack if it was pre-rendered"""
+        if self.phrases is None or not hasattr(self.engine, 'voice_key'):
+            return False
+        voice = self.engine.voice_key(utterance.lang)
+        clip = self.phrases.get(PhrasePack.key(voice, utterance.profile, utterance.lang, chunk))
+        if clip is None:
+            return False
+        TTS_CACHE_HITS.inc(engine=voice.split(':', 1)[0])
+        with tracer.span('tts.phrase_pack'):
+            play_audio_bytes(clip[0], clip[1], utterance.control)
+        return True
+
+    def play(self, utterance):
+        """Speak one utterance, honouring pause and stop between and within chunks"""
+        control = utterance.control
+        pause = self.apply_profile(utterance.profile)
+        try:
+            # Chunks may be a generator still segmenting the text
+            for i, chunk in enumerate(utterance.chunks):
+                # Natural pause between sentences, cut short by stop()
+                if i and control.cancelled.wait(max(0, pause + random.uniform(-0.1, 0.1))):
+                    break
+                if control.wait_running():
+                    break
+                if not self.play_cached(chunk, utterance):
+                    self.engine.speak(chunk, utterance.lang, control)
+                if control.cancelled.is_set():
+                    break
+        finally:
+            self.apply_profile('neutral')
+        self.stats['utterances'] += 1
+        if control.cancelled.is_set():
+            latency = time.perf_counter() - utterance.interrupt_time
+            utterance.interrupted = True
+            self.stats['interrupted'] += 1
+            self.stats['last_interrupt_ms'] = round(latency * 1000, 1)
+            TTS_INTERRUPT_SECONDS.observe(latency, source=utterance.interrupt_source)
+            logger.info(f"Playback interrupted ({utterance.interrupt_source}) in {latency * 1000:.0f} ms")
+
+
+class SpeechOnsetDetector:
+    """Energy-based detector for the user talking over playback
+
+    The baseline follows the level of the room plus Raki's own echo; speech
+    is reported after `frames` consecutive frames louder than both
+    `min_rms` and `ratio` times that baseline.
+    """
+
+    def __init__(self, min_rms=900, ratio=2.5, frames=3, frame_seconds=0.02):
+        self.min_rms = min_rms
+        self.ratio = ratio
+        self.frames = frames
+        self.frame_seconds = frame_seconds
+        self.reset()
+
+    def reset(self):
+        """Forget the baseline, e.g. when a new utterance starts"""
+        self.baseline = None
+        self.run = 0
+        self.onset = None
+
+    def feed(self, data, now=None):
+        """Process one int16 frame; returns the onset time once speech is confirmed"""
+        import numpy as np
+        now = time.perf_counter() if now is None else now
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+        if self.baseline is None:
+            self.baseline = rms
+            return None
+        if rms > max(self.min_rms, self.baseline * self.ratio):
+            if self.run == 0:
+                self.onset = now - self.frame_seconds
+            self.run += 1
+            if self.run >= self.frames:
+                self.run = 0
+                return self.onset
+        else:
+            self.run = 0
+            self.baseline = 0.95 * self.baseline + 0.05 * rms
+        return None
+
+
+class BargeInMonitor:
+    """Keeps the microphone live during playback and stops speech on barge-in"""
+
+    RATE = 16000
+    FORMAT_INT16 = 8  # pyaudio.paInt16
+
+    def __init__(self, player, detector, audio=None):
+        if audio is None:
+            import pyaudio
+            audio = pyaudio.PyAudio()
+        self.audio = audio
+        self.player = player
+        self.detector = detector
+        self.frame = int(self.RATE * detector.frame_seconds)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stats = {'detections': 0, 'errors': 0}
+
+    def start(self):
+        """Start the monitor thread"""
+        self.thread = threading.Thread(target=self.run, name='barge_in', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop monitoring"""
+        self.stop_event.set()
+
+    def run(self):
+        """Open the microphone whenever the player is speaking"""
+        while not self.stop_event.is_set():
+            if not self.player.speaking.wait(0.2):
+                continue
+            try:
+                self.listen()
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Barge-in monitor error: {str(e)}")
+                self.stop_event.wait(5)
+
+    def listen(self):
+        """Watch one stretch of playback"""
+        stream = self.audio.open(format=self.FORMAT_INT16, channels=1, rate=self.RATE,
+                                 input=True, frames_per_buffer=self.frame)
+        self.detector.reset()
+        try:
+            while self.player.speaking.is_set() and not self.stop_event.is_set():
+                data = stream.read(self.frame, exception_on_overflow=False)
+                onset = self.detector.feed(data)
+                if onset is not None and self.player.current is not None:
+                    self.stats['detections'] += 1
+                    self.player.stop(since=onset, source='barge_in')
+                    self.detector.reset()
+        finally:
+            stream.stop_stream()
+            stream.close()
+
+
+def sentence_cut(text, start, end, final):
+    """Index just past the first sentence mark in text[start:end], or None
+
+    Ethiopic and CJK marks always end a sentence. Latin ones need a space,
+    a non-Latin letter ("ነው?እሺ") or a lower-to-upper case change
+    ("done.Next") after them, so decimals, domains and abbreviations stay
+    whole; at the end of a still-growing buffer they wait for more text.
+    """
+    for i in range(start, min(end, len(text))):
+        char = text[i]
+        if char not in SENTENCE_MARKS:
+            continue
+        j = i + 1
+        while j < len(text) and (text[j] in SENTENCE_MARKS or text[j] in CLOSING_MARKS):
+            j += 1
+        if char not in ".!?":
+            return j
+        if j == len(text):
+            if final:
+                return j
+            continue
+        following = text[j]
+        if following.isspace() or (following.isalpha() and not following.isascii()):
+            return j
+        if following.isupper() and i > 0 and text[i - 1].islower():
+            return j
+    return None
+
+
+def segment_speech(pieces, max_chars=120, first_max_chars=60):
+    """Yield speakable chunks from a string or an iterable of text pieces
+
+    Chunks end at sentence marks; anything longer than the cap is split at
+    the last clause mark, then the last space, before it. The first chunk
+    has a tighter cap so the engine can start talking sooner. Works as a
+    stream: chunks are yielded as soon as enough text has arrived.
+    """
+    if isinstance(pieces, str):
+        pieces = [pieces]
+    buffer = ""
+    limit = first_max_chars
+
+    def next_cut(final):
+        cut = sentence_cut(buffer, 0, limit + 1, final)
+        if cut is not None:
+            return cut
+        if len(buffer) <= limit:
+            return len(buffer) if final else None
+        window = buffer[:limit]
+        clause = max(window.rfind(mark) for mark in CLAUSE_MARKS)
+        if clause > 0:
+            return clause + 1
+        space = window.rfind(' ')
+        return space + 1 if space > 0 else limit
+
+    for final, piece in itertools.chain(((False, p) for p in pieces), [(True, "")]):
+        buffer += piece
+        while buffer.strip():
+            cut = next_cut(final)
+            if cut is None:
+                break
+            chunk, buffer = buffer[:cut].strip(), buffer[cut:].lstrip()
+            if chunk:
+                yield chunk
+                limit = max_chars
+
+
 class HumanizedTTS:
     def __init__(self, config):
         self.config = config
@@ -47,17 +1146,29 @@ class HumanizedTTS:
         self.speech_profiles = self.create_speech_profiles()
         self.current_profile = 'neutral'
         self.conversation_context = {}
+        self.player = SpeechPlayer(self.engine, self.apply_speech_profile).start()
         
     def init_engine(self):
-        """Initialize the appropriate TTS engine"""
-        if self.config['tts_provider'] == 'google':
+        """Initialize the configured TTS engine, with local fallbacks behind circuit breakers"""
+        names = [self.config['tts_provider']] + list(self.config.get('tts_fallbacks', []))
+        # Fallbacks are built on the speech thread once it runs (see prepare_fallbacks)
+        return TTSProviders(names, self.make_engine, **breaker_options(self.config)).prepare(names[:1])
+
+    def make_engine(self, provider):
+        """Create one TTS engine by provider name"""
+        if provider == 'google':
             return GoogleTTS()
-        elif self.config['tts_provider'] == 'festival':
+        elif provider == 'festival':
             return FestivalTTS()
-        elif self.config['tts_provider'] == 'marytts':
+        elif provider == 'marytts':
             return MaryTTS(self.config)
         else:  # Default to pyttsx3
             return Pyttsx3TTS()
+
+    def prepare_fallbacks(self):
+        """Build the fallback engines on the speech thread, which pyttsx3 must stay on"""
+        if isinstance(self.engine, TTSProviders):
+            self.player.submit(self.engine.prepare)
     
     def create_speech_profiles(self):
         """Define natural speech characteristics for different contexts"""
@@ -123,35 +1234,78 @@ class HumanizedTTS:
         
         return text
     
-    def humanized_speak(self, text, lang='en'):
-        """Convert text to speech with human-like characteristics"""
+    def chunks(self, pieces, lang, echo=False):
+        """Segment text (or a stream of text) and add prosody chunk by chunk"""
+        for chunk in segment_speech(pieces, self.config.get('tts_max_chunk_chars', 120),
+                                    self.config.get('tts_first_chunk_chars', 60)):
+            if echo:
+                logger.info(f"Raki AI: {chunk}")
+                print(f"Raki AI: {chunk}")
+            with tracer.span('tts.prosody'):
+                yield self.add_prosody(chunk, lang)
+    
+    def prepare(self, text, lang):
+        """Speech profile and chunks for text, exactly as the player gets them"""
+        # Determine speech context; the worker applies the profile
+        return self.detect_speech_context(text, lang), list(self.chunks(text, lang))
+    
+    def render_phrase(self, text, lang, pack):
+        """Render the chunks of text the pack lacks; runs on the speech worker"""
+        if not hasattr(self.engine, 'render'):
+            return {}
+        profile, chunks = self.prepare(text, lang)
+        clips = {}
+        self.apply_speech_profile(profile)
+        try:
+            voice = self.engine.voice_key(lang)
+            for chunk in chunks:
+                key = pack.key(voice, profile, lang, chunk)
+                if key not in pack:
+                    clips[key] = self.engine.render(chunk, lang)
+        except Exception as e:
+            logger.warning(f"Phrase pre-render failed: {str(e)}")
+        finally:
+            self.apply_speech_profile('neutral')
+        return clips
+    
+    def update_phrase_pack(self, pack, phrases, wait=False):
+        """Pre-render phrases missing from pack, then swap in the new pack
+
+        Each phrase is its own worker task, so live speech is never queued
+        behind the whole build.
+        """
+        clips = {}
+        for text, lang in phrases:
+            self.player.submit(functools.partial(
+                lambda t, l: clips.update(self.render_phrase(t, l, pack)), text, lang))
+        done = self.player.submit(lambda: pack.add(clips))
+        if wait:
+            done.wait()
+        return done
+    
+    @traced('tts.humanized_speak')
+    def humanized_speak(self, text, lang='en', wait=True):
+        """Convert text to speech with human-like characteristics
+
+        text may also be an iterable of pieces still being produced; the
+        first clause is spoken while the rest arrives. Playback runs on the
+        speech worker; with wait=False the Utterance is returned as soon as
+        it is queued.
+        """
         if not text:
-            return
+            return None
             
-        # Determine speech context
-        context = self.detect_speech_context(text, lang)
-        pause_duration = self.apply_speech_profile(context)
-        
-        # Add natural prosody
-        processed_text = self.add_prosody(text, lang)
-        
-        logger.info(f"Raki AI: {text}")
-        print(f"Raki AI: {text}")
-        
-        # Split into sentences for natural pausing
-        sentences = re.split(r'(?<=[.!?]) +', processed_text)
-        
-        # Speak with appropriate pausing
-        for i, sentence in enumerate(sentences):
-            self.engine.speak(sentence, lang)
-            
-            # Add natural pause between sentences
-            if i < len(sentences) - 1:
-                actual_pause = pause_duration + random.uniform(-0.1, 0.1)
-                time.sleep(actual_pause)
+        if isinstance(text, str):
+            context = self.detect_speech_context(text, lang)
+            logger.info(f"Raki AI: {text}")
+            print(f"Raki AI: {text}")
+            chunks = self.chunks(text, lang)
+        else:
+            # Streamed text: the profile can only follow the language
+            context = 'amharic' if lang == 'am' else 'neutral'
+            chunks = self.chunks(text, lang, echo=True)
         
-        # Reset to neutral profile
-        self.apply_speech_profile('neutral')
+        utterance = self.player.say(chunks, lang, context)
         
         # Update conversation context
         self.conversation_context = {
@@ -159,18 +1313,23 @@ class HumanizedTTS:
             'time': time.time(),
             'lang': lang
         }
+        if wait:
+            utterance.wait()
+        return utterance
 
 class MaryTTS:
     def __init__(self, config):
         self.config = config
         self.server_url = config.get('marytts_url', MARYTTS_SERVER)
+        self.timeout = config.get('provider_timeout', 5)
         self.voices = self.get_available_voices()
         self.default_voice = self.select_default_voice()
         
     def get_available_voices(self):
         """Get available voices from MaryTTS server"""
+        import requests
         try:
-            response = requests.get(f"{self.server_url}/voices")
+            response = requests.get(f"{self.server_url}/voices", timeout=self.timeout)
             if response.status_code == 200:
                 return response.json()
         except Exception as e:
@@ -191,6 +1350,14 @@ class MaryTTS:
             return self.voices[0]['name']
         
         return 'cmu-slt-hsmm'  # Default voice if none found
+
+    def probe(self):
+        """Raise unless the server synthesizes; /voices can answer while synthesis hangs"""
+        if not self.voices:
+            # Pick up the voices of a server that started after us
+            self.voices = self.get_available_voices()
+            self.default_voice = self.select_default_voice()
+        self.render("ok", 'en')
     
     def set_rate(self, rate):
         """Set speech rate (relative speed)"""
@@ -206,21 +1373,23 @@ class MaryTTS:
         """Set speech volume (0.0 to 1.0)"""
         self.volume = volume
     
-    def speak(self, text, lang):
-        """Convert text to speech using MaryTTS"""
-        if not text:
-            return
-            
-        # Clean text for MaryTTS
-        clean_text = text.replace('[PAUSE]', ', ').replace('[EMPHASIZE]', '').replace('[/EMPHASIZE]', '')
-        
-        # Select appropriate voice based on language
-        voice = self.default_voice
+    def voice_for(self, lang):
+        """Voice used for a language"""
         if lang == 'am':
             # Prefer Amharic voice if available
             am_voices = [v['name'] for v in self.voices if v['locale'].startswith('am')]
             if am_voices:
-                voice = am_voices[0]
+                return am_voices[0]
+        return self.default_voice
+    
+    def voice_key(self, lang):
+        """Identifies the voice and settings for phrase pack lookups"""
+        return f"marytts:{self.voice_for(lang)}:{self.rate}:{self.pitch}:{self.volume}"
+    
+    def render(self, text, lang):
+        """Synthesize text to (wav bytes, 'wav')"""
+        # Clean text for MaryTTS
+        clean_text = text.replace('[PAUSE]', ', ').replace('[EMPHASIZE]', '').replace('[/EMPHASIZE]', '')
         
         params = {
             'INPUT_TEXT': clean_text,
@@ -228,37 +1397,40 @@ class MaryTTS:
             'OUTPUT_TYPE': 'AUDIO',
             'AUDIO': 'WAVE',
             'LOCALE': 'am_ET' if lang == 'am' else 'en_US',
-            'VOICE': voice,
+            'VOICE': self.voice_for(lang),
             'EFFECT_RATE': str(self.rate),
             'EFFECT_PITCH': str(self.pitch),
             'EFFECT_VOLUME': str(self.volume)
         }
         
+        import requests
+        response = requests.get(f"{self.server_url}/process", params=params, timeout=self.timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"MaryTTS error: {response.status_code} - {response.text}")
+        return response.content, 'wav'
+    
+    @traced('tts.marytts')
+    def speak(self, text, lang, control=None):
+        """Convert text to speech using MaryTTS"""
+        if not text:
+            return
         try:
-            response = requests.get(f"{self.server_url}/process", params=params)
-            if response.status_code == 200:
-                # Play audio directly
-                with open("response.wav", "wb") as f:
-                    f.write(response.content)
-                
-                # Play audio using platform-specific player
-                if platform.system() == 'Darwin':  # macOS
-                    os.system('afplay response.wav')
-                elif platform.system() == 'Linux':  # Linux
-                    os.system('aplay response.wav')
-                elif platform.system() == 'Windows':  # Windows
-                    import winsound
-                    winsound.PlaySound("response.wav", winsound.SND_FILENAME)
-                
-                os.remove("response.wav")
-            else:
-                logger.error(f"MaryTTS error: {response.status_code} - {response.text}")
+            data, fmt = self.render(text, lang)
+        except Exception as e:
+            raise ProviderError(f"MaryTTS unavailable: {str(e)}")
+        try:
+            # Play through an external player that stop() can cut off
+            play_audio_bytes(data, fmt, control)
         except Exception as e:
             logger.error(f"MaryTTS playback error: {str(e)}")
 
 class Pyttsx3TTS:
     def __init__(self):
+        import pyttsx3
         self.engine = pyttsx3.init()
+        self.base_rate = self.engine.getProperty('rate')
+        # Property changes are queued until the next run, so track them here
+        self.settings = {'voice': self.engine.getProperty('voice'), 'rate': 1.0, 'pitch': 1.0, 'volume': 1.0}
         self.configure_voice()
         
     def configure_voice(self):
@@ -269,6 +1441,7 @@ class Pyttsx3TTS:
         ethiopian_voices = [v for v in voices if 'ethiopia' in v.id.lower() or 'amharic' in v.id.lower()]
         if ethiopian_voices:
             self.engine.setProperty('voice', ethiopian_voices[0].id)
+            self.settings['voice'] = ethiopian_voices[0].id
             return
             
         # Prefer high-quality voices
@@ -280,6 +1453,7 @@ class Pyttsx3TTS:
             for voice in voices:
                 if pv.lower() in voice.name.lower():
                     self.engine.setProperty('voice', voice.id)
+                    self.settings['voice'] = voice.id
                     return
         
         # Final fallback
@@ -287,9 +1461,10 @@ class Pyttsx3TTS:
     
     def set_rate(self, rate):
         """Set speech rate"""
-        # Convert relative rate to absolute value (pyttsx3 uses words per minute)
-        base_rate = self.engine.getProperty('rate')
-        self.engine.setProperty('rate', base_rate * rate)
+        # Convert relative rate to absolute value (pyttsx3 uses words per minute);
+        # scale the initial rate so repeated profiles don't compound
+        self.engine.setProperty('rate', int(self.base_rate * rate))
+        self.settings['rate'] = rate
     
     def set_pitch(self, pitch):
         """Set speech pitch"""
@@ -297,12 +1472,33 @@ class Pyttsx3TTS:
             # Pitch adjustment not well supported on macOS
             return
         self.engine.setProperty('pitch', pitch)
+        self.settings['pitch'] = pitch
     
     def set_volume(self, volume):
         """Set speech volume"""
         self.engine.setProperty('volume', volume)
+        self.settings['volume'] = volume
+    
+    def voice_key(self, lang):
+        """Identifies the voice and settings for phrase pack lookups"""
+        return "pyttsx3:" + ":".join(str(self.settings[name]) for name in ('voice', 'rate', 'pitch', 'volume'))
+    
+    def render(self, text, lang):
+        """Synthesize text to (audio bytes, format) via a temporary file"""
+        clean_text = text.replace('[PAUSE]', ' ').replace('[EMPHASIZE]', '').replace('[/EMPHASIZE]', '')
+        fmt = 'aiff' if platform.system() == 'Darwin' else 'wav'
+        fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+        os.close(fd)
+        try:
+            self.engine.save_to_file(clean_text, path)
+            self.engine.runAndWait()
+            with open(path, 'rb') as f:
+                return f.read(), fmt
+        finally:
+            os.remove(path)
     
-    def speak(self, text, lang):
+    @traced('tts.pyttsx3')
+    def speak(self, text, lang, control=None):
         """Convert text to speech"""
         if not text:
             return
@@ -311,7 +1507,21 @@ class Pyttsx3TTS:
         clean_text = text.replace('[PAUSE]', ' ').replace('[EMPHASIZE]', '').replace('[/EMPHASIZE]', '')
         
         self.engine.say(clean_text)
-        self.engine.runAndWait()
+        if control is None:
+            self.engine.runAndWait()
+            return
+        
+        # Drive the event loop ourselves so stop() takes effect mid-sentence
+        self.engine.startLoop(False)
+        try:
+            while self.engine.isBusy():
+                if control.cancelled.is_set():
+                    self.engine.stop()
+                    break
+                self.engine.iterate()
+                time.sleep(0.01)
+        finally:
+            self.engine.endLoop()
 
 class GoogleTTS:
     def __init__(self):
@@ -336,26 +1546,40 @@ class GoogleTTS:
         """Set speech volume (Google TTS doesn't support dynamic volume)"""
         pass
     
-    def speak(self, text, lang):
-        """Convert text to speech using Google's TTS"""
-        if not text:
-            return
-            
+    LANGUAGES = {
+        'en': 'en', 'am': 'am', 'om': 'om', 
+        'ti': 'ti', 'fr': 'fr', 'zh': 'zh-CN'
+    }
+    
+    def voice_key(self, lang):
+        """Identifies the voice for phrase pack lookups"""
+        return f"google:{self.LANGUAGES.get(lang, 'en')}"
+
+    def probe(self):
+        """Raise unless Google's TTS endpoint is reachable"""
+        socket.create_connection(('translate.google.com', 443), timeout=3).close()
+    
+    def render(self, text, lang):
+        """Synthesize text to (mp3 bytes, 'mp3')"""
         # Clean text
         clean_text = text.replace('[PAUSE]', ', ').replace('[EMPHASIZE]', '').replace('[/EMPHASIZE]', '')
         
-        lang_map = {
-            'en': 'en', 'am': 'am', 'om': 'om', 
-            'ti': 'ti', 'fr': 'fr', 'zh': 'zh-CN'
-        }
         tts = self.gTTS(
             text=clean_text, 
-            lang=lang_map.get(lang, 'en'), 
+            lang=self.LANGUAGES.get(lang, 'en'), 
             slow=False
         )
-        tts.save("response.mp3")
-        self.playsound("response.mp3")
-        os.remove("response.mp3")
+        buffer = io.BytesIO()
+        tts.write_to_fp(buffer)
+        return buffer.getvalue(), 'mp3'
+    
+    @traced('tts.google')
+    def speak(self, text, lang, control=None):
+        """Convert text to speech using Google's TTS"""
+        if not text:
+            return
+        data, fmt = self.render(text, lang)
+        play_audio_bytes(data, fmt, control)
 
 class FestivalTTS:
     def __init__(self):
@@ -377,7 +1601,54 @@ class FestivalTTS:
         """Set speech volume (Festival doesn't support dynamic volume)"""
         pass
     
-    def speak(self, text, lang):
+    # Map languages to Festival voices
+    VOICES = {
+        'en': 'kal_diphone',
+        'am': 'cmu_us_slt_arctic_hts',  # Best approximation for Amharic
+        'fr': 'fr_paulelaine',
+        'zh': 'cmu_us_slt_arctic_hts'
+    }
+    
+    def voice_key(self, lang):
+        """Identifies the voice and settings for phrase pack lookups"""
+        return f"festival:{self.VOICES.get(lang, 'kal_diphone')}:{self.rate_factor}:{self.pitch}"
+    
+    def settings(self, lang):
+        """Scheme selecting the voice, pitch and rate"""
+        voice = self.VOICES.get(lang, 'kal_diphone')
+        script = f'(voice_{voice}) '
+        script += f'(set! duffint_params \'((start {self.pitch}) (end {self.pitch}))) '
+        script += f'(Parameter.set \'Duration_Stretch {self.rate_factor}) '
+        return script
+    
+    def run_script(self, script, control=None):
+        """Run a Festival script in batch mode"""
+        fd, path = tempfile.mkstemp(suffix=".scm")
+        with os.fdopen(fd, "w") as f:
+            f.write(script)
+        try:
+            return run_player(['festival', '-b', path], control)
+        finally:
+            os.remove(path)
+    
+    def render(self, text, lang):
+        """Synthesize text to (wav bytes, 'wav')"""
+        clean_text = text.replace('[PAUSE]', '. ').replace('"', '')
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            self.run_script(self.settings(lang) +
+                            f'(utt.save.wave (utt.synth (Utterance Text "{clean_text}")) "{path}" \'riff)')
+            with open(path, 'rb') as f:
+                data = f.read()
+            if not data:
+                raise ProviderError("Festival produced no audio")
+            return data, 'wav'
+        finally:
+            os.remove(path)
+    
+    @traced('tts.festival')
+    def speak(self, text, lang, control=None):
         """Convert text to speech using Festival"""
         if not text:
             return
@@ -385,54 +1656,255 @@ class FestivalTTS:
         # Clean and format text for Festival
         clean_text = text.replace('[PAUSE]', '. ')
         
-        # Map languages to Festival voices
-        voice_map = {
-            'en': 'kal_diphone',
-            'am': 'cmu_us_slt_arctic_hts',  # Best approximation for Amharic
-            'fr': 'fr_paulelaine',
-            'zh': 'cmu_us_slt_arctic_hts'
-        }
-        voice = voice_map.get(lang, 'kal_diphone')
-        
         # Add SSML-like markup for emphasis
-        ssml_text = f'(voice_{voice}) (Parameter.set \'Audio_Command "aplay -q -c 1 -t raw -f s16 -r $SR $FILE") '
-        ssml_text += f'(set! duffint_params \'((start {self.pitch}) (end {self.pitch}))) '
-        ssml_text += f'(Parameter.set \'Duration_Stretch {self.rate_factor}) '
+        ssml_text = '(Parameter.set \'Audio_Command "aplay -q -c 1 -t raw -f s16 -r $SR $FILE") '
+        ssml_text += self.settings(lang)
         ssml_text += f'(SayText "{clean_text}")'
-        
-        # Use temporary script file
-        with open("festival_script.scm", "w") as f:
-            f.write(ssml_text)
-            
-        os.system('festival -b festival_script.scm')
-        os.remove("festival_script.scm")
+        if not self.run_script(ssml_text, control) and not (control and control.cancelled.is_set()):
+            raise ProviderError("Festival exited with an error")
 
-class GoogleSTT:
-    def __init__(self):
-        self.recognizer = sr.Recognizer()
-        
-    def listen(self):
-        """Capture voice input using Google's speech recognition"""
-        with sr.Microphone() as source:
-            logger.info("Listening...")
-            print("Listening...")
+class AudioFrontEnd:
+    """Cleans 16-bit mono microphone audio before speech recognition
+
+    Three stages, each vectorized over a whole buffer:
+
+    - resampling to out_rate through a Kaiser-windowed sinc polyphase
+      filter, so devices that only capture at 44.1 or 48 kHz still give
+      recognizers 16 kHz audio without aliasing
+    - spectral-subtraction noise suppression on a sqrt-Hann STFT with 50%
+      overlap; the noise profile is learned from the quietest frames and
+      then follows frames that look like noise
+    - automatic gain control in 10 ms blocks: quiet speakers are raised
+      towards agc_target (at most max_gain), loud ones lowered, silence
+      left alone, and gain drops at once when a block would clip
+
+    Buffers of any length can be fed as they arrive. reset() starts a new
+    utterance but keeps the learned noise profile and gain.
+    """
+
+    def __init__(self, in_rate=16000, out_rate=16000, suppression=2.0, floor=0.1,
+                 agc_target=3000, max_gain=10.0, gate=200, frame=512, zero_crossings=16):
+        import numpy as np
+        self.np = np
+        self.out_rate = out_rate
+        self.suppression = suppression
+        self.floor = floor
+        self.agc_target = agc_target
+        self.max_gain = max_gain
+        self.gate = gate
+        self.frame = frame
+        self.hop = frame // 2
+        self.zero_crossings = zero_crossings
+        # Periodic sqrt-Hann: analysis x synthesis windows sum to 1 at 50% overlap
+        self.window = np.sqrt(np.hanning(frame + 1)[:frame])
+        self.noise = None
+        self.gain = 1.0
+        self.in_rate = None
+        self.set_input_rate(in_rate)
+
+    def set_input_rate(self, rate):
+        """Rebuild the resampling filter for a new capture rate"""
+        rate = int(rate)
+        if rate == self.in_rate:
+            return
+        self.in_rate = rate
+        divisor = int(self.np.gcd(rate, self.out_rate))
+        self.up, self.down = self.out_rate // divisor, rate // divisor
+        self.bank = self.design_filter() if self.up != self.down else None
+        self.reset()
+
+    def design_filter(self):
+        """Polyphase bank (up x taps) of a low-pass below both Nyquist rates"""
+        np = self.np
+        cutoff = 0.5 * min(1.0, self.up / self.down) * 0.9  # Cycles per input sample
+        half_width = int(np.ceil(self.zero_crossings / (2 * cutoff)))
+        taps = 2 * half_width
+        length = taps * self.up
+        t = (np.arange(length) - (length - 1) / 2) / self.up
+        h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(length, 8.6)
+        h *= self.up / h.sum()
+        return h.reshape(taps, self.up).T.copy()
+
+    def reset(self):
+        """Start a new utterance: drop buffered samples, keep noise profile and gain"""
+        np = self.np
+        taps = self.bank.shape[1] if self.bank is not None else 1
+        self.history = np.zeros(taps - 1)
+        self.position = 0
+        self.in_tail = np.zeros(0)
+        self.out_tail = np.zeros(self.hop)
+        self.owed = 0
+
+    def process(self, data, rate=None, final=False):
+        """Clean an int16 buffer; returns int16 bytes at out_rate
+
+        Output lags input by up to one STFT frame; final=True flushes that
+        tail and resets for the next utterance.
+        """
+        np = self.np
+        if rate is not None:
+            self.set_input_rate(rate)
+        x = np.frombuffer(data, dtype=np.int16).astype(np.float64)
+        if self.bank is not None:
+            x = self.resample(x)
+        if self.suppression > 0:
+            self.owed += len(x)
+            if final:
+                x = np.concatenate((x, np.zeros(self.frame)))
+            x = self.suppress(x)[:self.owed]
+            self.owed -= len(x)
+        if self.agc_target:
+            x = self.level(x)
+        if final:
+            self.reset()
+        return np.clip(np.rint(x), -32768, 32767).astype(np.int16).tobytes()
+
+    def resample(self, x):
+        """Polyphase rational resampling, continuing from the previous buffer"""
+        np = self.np
+        taps = self.bank.shape[1]
+        buffer = np.concatenate((self.history, x))
+        available = len(x) * self.up
+        count = max(0, -(-(available - self.position) // self.down))
+        offsets = self.position + self.down * np.arange(count)
+        phases, bases = offsets % self.up, offsets // self.up + taps - 1
+        windows = buffer[bases[:, None] - np.arange(taps)[None, :]]
+        y = np.einsum('ij,ij->i', self.bank[phases], windows)
+        self.position += count * self.down - available
+        self.history = buffer[len(buffer) - (taps - 1):]
+        return y
+
+    def suppress(self, x):
+        """Spectral subtraction with overlap-add across buffers"""
+        np = self.np
+        frame, hop = self.frame, self.hop
+        buffer = np.concatenate((self.in_tail, x))
+        count = (len(buffer) - frame) // hop + 1 if len(buffer) >= frame else 0
+        if count == 0:
+            self.in_tail = buffer
+            return np.zeros(0)
+
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, frame)[::hop][:count]
+        spectrum = np.fft.rfft(frames * self.window, axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        self.track_noise(power)
+        gain = np.sqrt(np.maximum(1 - self.suppression * self.noise / np.maximum(power, 1e-9),
+                                  self.floor ** 2))
+        out = np.fft.irfft(spectrum * gain, n=frame, axis=1) * self.window
+
+        y = np.zeros((count + 1) * hop)
+        y[:count * hop] += out[:, :hop].ravel()
+        y[hop:] += out[:, hop:].ravel()
+        y[:hop] += self.out_tail
+        self.out_tail = y[count * hop:]
+        self.in_tail = buffer[count * hop:]
+        return y[:count * hop]
+
+    def track_noise(self, power):
+        """Learn the noise spectrum from quiet frames"""
+        np = self.np
+        energy = power.mean(axis=1)
+        if self.noise is None:
+            quiet = energy <= np.percentile(energy, 20)
+            self.noise = power[quiet].mean(axis=0)
+            return
+        quiet = energy < 2.5 * self.noise.mean()
+        if quiet.any():
+            self.noise = 0.9 * self.noise + 0.1 * power[quiet].mean(axis=0)
+        else:
+            self.noise *= 1.01  # Let the estimate climb when the room gets louder
+
+    def level(self, x):
+        """Automatic gain control smoothed over 10 ms blocks"""
+        np = self.np
+        if not len(x):
+            return x
+        block = self.out_rate // 100
+        count = -(-len(x) // block)
+        blocks = np.zeros(count * block)
+        blocks[:len(x)] = x
+        blocks = blocks.reshape(count, block)
+        rms = np.sqrt((blocks ** 2).mean(axis=1))
+        peak = np.abs(blocks).max(axis=1)
+
+        desired = np.clip(self.agc_target / np.maximum(rms, 1e-9), 1 / self.max_gain, self.max_gain)
+        desired = np.where(rms > self.gate, desired, np.nan)
+        gains = np.empty(count)
+        # One-pole smoothing (about 100 ms) in closed form, in spans short enough for a ** -n
+        a = 0.9
+        for start in range(0, count, 256):
+            span = desired[start:start + 256]
+            span = np.where(np.isnan(span), self.gain, span)  # Hold the gain through silence
+            n = np.arange(len(span))
+            gains[start:start + len(span)] = a ** (n + 1) * self.gain + (1 - a) * a ** n * np.cumsum(span / a ** n)
+            self.gain = gains[start + len(span) - 1]
+        gains = np.minimum(gains, 32000 / np.maximum(peak, 1))
+
+        centers = (np.arange(count) + 0.5) * block
+        return x * np.interp(np.arange(len(x)), centers, gains)
+
+
+class GoogleSTT:
+    def __init__(self, frontend=None, timeout=None):
+        import speech_recognition as sr
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+        self.recognizer.operation_timeout = timeout  # Bounds the request to Google
+        self.timeout = timeout or 3
+        self.frontend = AudioFrontEnd(**frontend) if frontend is not None else None
+        
+    def listen(self):
+        """Capture voice input using Google's speech recognition"""
+        with self.sr.Microphone() as source:
+            return self.recognize(source)
+
+    def transcribe(self, reader):
+        """Recognize the next utterance from a RingReader"""
+        # speech_recognition only reads these attributes of an opened source
+        source = self.sr.AudioSource.__new__(self.sr.AudioSource)
+        source.stream, source.SAMPLE_RATE, source.SAMPLE_WIDTH, source.CHUNK = reader, reader.ring.rate, 2, 1024
+        return self.recognize(source)
+
+    def recognize(self, source):
+        """Record one utterance from an open source and send it to Google"""
+        logger.info("Listening...")
+        print("Listening...")
+        with tracer.span('stt.capture'):
             self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-            audio = self.recognizer.listen(source, timeout=5)
-            
             try:
-                command = self.recognizer.recognize_google(audio)
-                logger.info(f"You said: {command}")
-                print(f"You said: {command}")
-                return command.lower()
-            except sr.UnknownValueError:
-                return ""
-            except sr.RequestError:
-                logger.warning("Network error. Switching to offline mode.")
-                print("Network error. Switching to offline mode.")
+                audio = self.recognizer.listen(source, timeout=5)
+            except self.sr.WaitTimeoutError:
+                STT_FAILURES.inc(engine='google', reason='timeout')
                 return ""
+        
+        if self.frontend:
+            # Recognize at 16 kHz whatever rate the device captured at
+            with tracer.span('stt.frontend'):
+                data = self.frontend.process(audio.get_raw_data(convert_width=2), audio.sample_rate, final=True)
+            audio = self.sr.AudioData(data, self.frontend.out_rate, 2)
+        
+        try:
+            with tracer.span('stt.google'):
+                command = self.recognizer.recognize_google(audio)
+            logger.info(f"You said: {command}")
+            print(f"You said: {command}")
+            return command.lower()
+        except self.sr.UnknownValueError:
+            STT_FAILURES.inc(engine='google', reason='unintelligible')
+            return ""
+        except self.sr.RequestError as e:
+            STT_FAILURES.inc(engine='google', reason='network')
+            print("Network error. Switching to offline mode.")
+            # The pool hands the captured utterance to an offline recognizer
+            raise ProviderError(f"Google speech recognition unavailable: {str(e)}",
+                                audio.get_raw_data(convert_rate=16000, convert_width=2))
+
+    def probe(self):
+        """Raise unless Google's speech service is reachable"""
+        socket.create_connection(('www.google.com', 443), timeout=self.timeout).close()
 
 class VoskSTT:
-    def __init__(self, model_name='en'):
+    def __init__(self, model_name='en', frontend=None, download=True):
         try:
             from vosk import Model, KaldiRecognizer
             import pyaudio
@@ -443,10 +1915,13 @@ class VoskSTT:
             # Download model if needed
             self.model_path = os.path.join(VOSK_MODEL_DIR, model_name)
             if not os.path.exists(self.model_path):
+                if not download:
+                    raise FileNotFoundError(f"Vosk model {model_name} is not installed")
                 self.download_model(model_name)
                 
             self.model = Model(self.model_path)
             self.audio = pyaudio.PyAudio()
+            self.frontend = AudioFrontEnd(**frontend) if frontend is not None else None
         except ImportError:
             logger.error("Vosk requires vosk and pyaudio packages")
             raise
@@ -459,98 +1934,3326 @@ class VoskSTT:
             'fr': 'https://alphacephei.com/vosk/models/vosk-model-small-fr-0.22.zip',
             'zh': 'https://alphacephei.com/vosk/models/vosk-model-small-cn-0.22.zip'
         }
-        
-        if model_name not in model_urls:
-            raise ValueError(f"Unsupported model: {model_name}")
-            
-        os.makedirs(VOSK_MODEL_DIR, exist_ok=True)
-        zip_path = os.path.join(VOSK_MODEL_DIR, f"{model_name}.zip")
-        
-        logger.info(f"Downloading {model_name} model...")
-        print(f"Downloading {model_name} model...")
-        with requests.get(model_urls[model_name], stream=True) as r:
-            r.raise_for_status()
-            with open(zip_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        
-        # Unzip model
-        import zipfile
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(VOSK_MODEL_DIR)
-        
-        # Rename directory to match model name
-        extracted = [d for d in os.listdir(VOSK_MODEL_DIR) if d.startswith("vosk-model")]
-        if extracted:
-            os.rename(os.path.join(VOSK_MODEL_DIR, extracted[0]), 
-                     os.path.join(VOSK_MODEL_DIR, model_name))
-        
-        os.remove(zip_path)
-        logger.info(f"Model {model_name} downloaded and installed")
-        print(f"Model {model_name} downloaded and installed")
-        
-    def listen(self):
-        """Capture voice input using Vosk offline recognition"""
-        stream = self.audio.open(format=self.pyaudio.paInt16, channels=1,
-                                rate=16000, input=True, frames_per_buffer=8192)
-        stream.start_stream()
-        
-        recognizer = self.KaldiRecognizer(self.model, 16000)
-        logger.info("Listening (offline)...")
-        print("Listening (offline)...")
-        
-        start_time = time.time()
-        while time.time() - start_time < 6:  # 6 second timeout
-            data = stream.read(4096, exception_on_overflow=False)
-            if recognizer.AcceptWaveform(data):
-                result = json.loads(recognizer.Result())
-                command = result.get('text', '').lower()
-                logger.info(f"You said: {command}")
-                print(f"You said: {command}")
-                return command
-                
-        return ""
+        
+        if model_name not in model_urls:
+            raise ValueError(f"Unsupported model: {model_name}")
+            
+        os.makedirs(VOSK_MODEL_DIR, exist_ok=True)
+        zip_path = os.path.join(VOSK_MODEL_DIR, f"{model_name}.zip")
+        
+        import requests
+        logger.info(f"Downloading {model_name} model...")
+        print(f"Downloading {model_name} model...")
+        with requests.get(model_urls[model_name], stream=True) as r:
+            r.raise_for_status()
+            with open(zip_path, 'wb') as f:
+                for chunk in r.iter_content(chunk_size=8192):
+                    f.write(chunk)
+        
+        # Unzip model
+        import zipfile
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            zip_ref.extractall(VOSK_MODEL_DIR)
+        
+        # Rename directory to match model name
+        extracted = [d for d in os.listdir(VOSK_MODEL_DIR) if d.startswith("vosk-model")]
+        if extracted:
+            os.rename(os.path.join(VOSK_MODEL_DIR, extracted[0]), 
+                     os.path.join(VOSK_MODEL_DIR, model_name))
+        
+        os.remove(zip_path)
+        logger.info(f"Model {model_name} downloaded and installed")
+        print(f"Model {model_name} downloaded and installed")
+        
+    @traced('stt.vosk')
+    def listen(self):
+        """Capture voice input using Vosk offline recognition"""
+        # With the front-end, capture at the device's own rate and resample
+        rate = 16000
+        if self.frontend:
+            rate = int(self.audio.get_default_input_device_info()['defaultSampleRate'])
+            self.frontend.set_input_rate(rate)
+            self.frontend.reset()
+        stream = self.audio.open(format=self.pyaudio.paInt16, channels=1,
+                                rate=rate, input=True, frames_per_buffer=rate // 2)
+        stream.start_stream()
+        
+        def chunks():
+            while True:
+                data = stream.read(rate // 4, exception_on_overflow=False)
+                yield self.frontend.process(data) if self.frontend else data
+        
+        try:
+            return self.decode(chunks())
+        finally:
+            stream.stop_stream()
+            stream.close()
+
+    def transcribe(self, reader):
+        """Recognize the next utterance from a RingReader"""
+        return self.decode(reader.chunks(4000))
+
+    def decode(self, chunks, timeout=6):
+        """Recognize the first utterance in a stream of 16 kHz chunks"""
+        recognizer = self.KaldiRecognizer(self.model, 16000)
+        logger.info("Listening (offline)...")
+        print("Listening (offline)...")
+        
+        start_time = time.time()
+        for data in chunks:
+            if recognizer.AcceptWaveform(data):
+                result = json.loads(recognizer.Result())
+                command = result.get('text', '').lower()
+                logger.info(f"You said: {command}")
+                print(f"You said: {command}")
+                return command
+            if time.time() - start_time >= timeout:
+                break
+                
+        STT_FAILURES.inc(engine='vosk', reason='timeout')
+        return ""
+
+    @traced('stt.vosk')
+    def recognize_audio(self, data):
+        """Recognize an utterance already captured as 16 kHz 16-bit audio"""
+        recognizer = self.KaldiRecognizer(self.model, 16000)
+        recognizer.AcceptWaveform(data)
+        command = json.loads(recognizer.FinalResult()).get('text', '').lower()
+        logger.info(f"You said: {command}")
+        print(f"You said: {command}")
+        return command
+
+
+class SharedAudioRing:
+    """Single-writer ring of 16-bit mono audio in shared memory
+
+    A 64 byte header holds the sample rate, the capacity, the number of
+    samples written so far and the writer's last heartbeat (monotonic ns,
+    which Linux shares between processes); int16 audio follows. Readers in
+    any process keep their own cursor into the block, so audio is never
+    pickled or copied between processes.
+    """
+
+    HEADER_BYTES = 64
+
+    def __init__(self, shm, owner=False):
+        import numpy as np
+        self.np = np
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((4,), dtype=np.uint64, buffer=shm.buf[:32])
+        self.rate = int(self.header[0])
+        self.capacity = int(self.header[1])
+        self.samples = np.ndarray((self.capacity,), dtype=np.int16,
+                                  buffer=shm.buf[self.HEADER_BYTES:self.HEADER_BYTES + self.capacity * 2])
+
+    @classmethod
+    def create(cls, seconds=30, rate=16000):
+        """Allocate a new ring holding seconds of audio"""
+        from multiprocessing import shared_memory
+        capacity = int(seconds * rate)
+        shm = shared_memory.SharedMemory(create=True, size=cls.HEADER_BYTES + capacity * 2)
+        shm.buf[:16] = struct.pack('=QQ', rate, capacity)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Map a ring created by another process"""
+        from multiprocessing import shared_memory
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def written(self):
+        """Samples written since the ring was created"""
+        return int(self.header[2])
+
+    def write(self, data):
+        """Append int16 audio and beat the heartbeat"""
+        samples = self.np.frombuffer(data, dtype=self.np.int16)[-self.capacity:]
+        written = int(self.header[2])
+        start = written % self.capacity
+        first = min(samples.size, self.capacity - start)
+        self.samples[start:start + first] = samples[:first]
+        self.samples[:samples.size - first] = samples[first:]
+        # Publish the new position only once the audio is in place
+        self.header[2] = written + samples.size
+        self.header[3] = time.monotonic_ns()
+
+    def heartbeat_age(self):
+        """Seconds since the writer last wrote, or None if it never has"""
+        beat = int(self.header[3])
+        return None if not beat else (time.monotonic_ns() - beat) / 1e9
+
+    def view(self, start, count):
+        """Samples start..start+count; a view of shared memory unless they wrap"""
+        offset = start % self.capacity
+        if offset + count <= self.capacity:
+            return self.samples[offset:offset + count]
+        return self.np.concatenate((self.samples[offset:], self.samples[:offset + count - self.capacity]))
+
+    def reader(self):
+        """A reader starting at the newest audio"""
+        return RingReader(self)
+
+    def open(self, rate=16000, **kwargs):
+        """PyAudio-style input stream, so the ring can stand in for a microphone"""
+        if rate != self.rate:
+            raise ValueError(f"Ring carries {self.rate} Hz audio, not {rate} Hz")
+        return self.reader()
+
+    def close(self):
+        """Unmap the ring in this process"""
+        self.header = self.samples = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # A reader still holds a view; the mapping goes with the process
+
+    def unlink(self):
+        """Free the shared block (creator only)"""
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingReader:
+    """One consumer's cursor into a SharedAudioRing
+
+    Reads wait until enough audio has been written; a reader that falls a
+    whole ring behind skips ahead to the newest audio. read() matches a
+    PyAudio input stream.
+    """
+
+    def __init__(self, ring, timeout=2.0):
+        self.ring = ring
+        self.cursor = ring.written
+        self.timeout = timeout
+        self.overruns = 0
+
+    def read_view(self, frames):
+        """The next frames samples as an int16 array, without copying unless the ring wraps"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            written = self.ring.written
+            if written - self.cursor > self.ring.capacity:
+                self.overruns += 1
+                self.cursor = written - frames
+            missing = self.cursor + frames - written
+            if missing <= 0:
+                break
+            if time.monotonic() >= deadline:
+                raise TimeoutError("No audio from the capture process")
+            time.sleep(missing / self.ring.rate)
+        samples = self.ring.view(self.cursor, frames)
+        self.cursor += frames
+        return samples
+
+    def read(self, frames, exception_on_overflow=False):
+        """The next frames samples as bytes"""
+        return self.read_view(frames).tobytes()
+
+    def chunks(self, frames):
+        """Endless stream of frames-sample chunks"""
+        while True:
+            yield self.read(frames)
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MicrophoneCapture:
+    """Default microphone as 16 kHz int16, through AudioFrontEnd when configured"""
+
+    def __init__(self, frontend=None, chunk_seconds=0.05):
+        import pyaudio
+        self.audio = pyaudio.PyAudio()
+        self.frontend = AudioFrontEnd(**frontend) if frontend is not None else None
+        self.rate = 16000
+        if self.frontend:
+            self.rate = int(self.audio.get_default_input_device_info()['defaultSampleRate'])
+            self.frontend.set_input_rate(self.rate)
+        self.frames = int(self.rate * chunk_seconds)
+        self.stream = self.audio.open(format=pyaudio.paInt16, channels=1, rate=self.rate,
+                                      input=True, frames_per_buffer=self.frames * 4)
+
+    def read(self):
+        """Next chunk of captured audio"""
+        data = self.stream.read(self.frames, exception_on_overflow=False)
+        return self.frontend.process(data) if self.frontend else data
+
+
+def make_stt_engine(provider, model_name='en', frontend=None, timeout=None, download=True):
+    """One speech recognizer by provider name; Google unless it's vosk"""
+    if provider == 'vosk':
+        return VoskSTT(model_name, frontend, download)
+    return GoogleSTT(frontend, timeout)
+
+
+def stt_worker_main(ring_name, commands, results, make_engine, make_capture):
+    """STT worker process: capture into the shared ring and answer listen requests"""
+    ring = SharedAudioRing.attach(ring_name)
+    try:
+        capture = make_capture()
+        engine = make_engine()
+        if isinstance(engine, ProviderPool):
+            engine.prepare()
+    except Exception as e:
+        logger.error(f"STT worker failed to start: {str(e)}")
+        results.put(('error', None, str(e)))
+        return
+
+    def capture_loop():
+        try:
+            while True:
+                ring.write(capture.read())
+        except Exception as e:
+            logger.error(f"STT worker capture failed: {str(e)}")
+            os._exit(1)  # The supervisor starts a fresh worker
+
+    threading.Thread(target=capture_loop, name='stt_capture', daemon=True).start()
+    results.put(('ready', None, None))
+    for command, seq in iter(commands.get, ('stop', None)):
+        try:
+            text = engine.transcribe(ring.reader())
+        except Exception as e:
+            logger.error(f"STT worker recognition error: {str(e)}")
+            text = ""
+        results.put(('text', seq, text))
+
+
+class STTWorker:
+    """Speech recognition in a child process
+
+    The worker captures into a SharedAudioRing and decodes on request, so
+    Kaldi or speech_recognition work never competes with playback and the
+    scheduler for this process. Requests and transcripts travel over small
+    queues; audio stays in shared memory, where the barge-in monitor reads
+    it too. supervise() restarts a worker that died or whose capture
+    stopped, backing off while new workers keep dying young.
+    """
+
+    def __init__(self, make_engine, make_capture, ring_seconds=30, listen_timeout=15,
+                 stall_seconds=5, startup_timeout=120):
+        import multiprocessing
+        # Spawn rather than fork: the child must not inherit our threads' locks
+        self.context = multiprocessing.get_context('spawn')
+        self.ring = SharedAudioRing.create(ring_seconds)
+        self.make_engine = make_engine
+        self.make_capture = make_capture
+        self.listen_timeout = listen_timeout
+        self.stall_seconds = stall_seconds
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.commands = self.results = None
+        self.started = 0
+        self.backoff = 0
+        self.next_start = 0
+        self.stopping = False
+        self.seq = itertools.count(1)
+        self.listen_lock = threading.Lock()
+        self.restart_lock = threading.Lock()
+        self.stats = {'restarts': 0, 'timeouts': 0}
+
+    def start(self):
+        """Spawn the worker process"""
+        self.commands = self.context.Queue()
+        self.results = self.context.Queue()
+        self.ring.header[3] = 0  # No heartbeat until the new worker captures
+        self.process = self.context.Process(
+            target=stt_worker_main, name='raki_stt', daemon=True,
+            args=(self.ring.name, self.commands, self.results, self.make_engine, self.make_capture))
+        self.process.start()
+        self.started = time.monotonic()
+        return self
+
+    def health(self):
+        """'ok', or why the worker needs restarting"""
+        if not self.process.is_alive():
+            return 'crash'
+        age = self.ring.heartbeat_age()
+        if age is None:
+            return 'startup' if time.monotonic() - self.started > self.startup_timeout else 'ok'
+        return 'stall' if age > self.stall_seconds else 'ok'
+
+    def supervise(self):
+        """Restart the worker if it died or stalled; called periodically"""
+        with self.restart_lock:
+            if self.stopping:
+                return
+            reason = self.health()
+            now = time.monotonic()
+            if reason == 'ok' or now < self.next_start:
+                return
+            self.backoff = min(30, max(1, self.backoff * 2)) if now - self.started < 30 else 0
+            self.next_start = now + self.backoff
+            logger.warning(f"Restarting STT worker ({reason})")
+            self.terminate()
+            self.stats['restarts'] += 1
+            STT_WORKER_RESTARTS.inc(reason=reason)
+            self.start()
+
+    def terminate(self):
+        """End the current worker process and drop its queues"""
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join(1)
+        for channel in (self.commands, self.results):
+            channel.cancel_join_thread()
+            channel.close()
+
+    def listen(self):
+        """Ask the worker for the next utterance"""
+        with self.listen_lock:
+            if self.health() != 'ok':
+                self.supervise()
+            results = self.results
+            seq = next(self.seq)
+            self.commands.put(('listen', seq))
+            deadline = time.monotonic() + self.listen_timeout
+            # Give up early if the worker dies or is replaced meanwhile
+            while time.monotonic() < deadline and results is self.results and self.process.is_alive():
+                try:
+                    kind, reply, payload = results.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if kind == 'text' and reply == seq:
+                    return payload
+                if kind == 'error':
+                    STT_FAILURES.inc(engine='worker', reason='startup')
+                    return ""
+            self.stats['timeouts'] += 1
+            STT_FAILURES.inc(engine='worker', reason='timeout' if self.process.is_alive() else 'crash')
+        self.supervise()
+        return ""
+
+    def stop(self):
+        """Stop the worker and free the ring"""
+        with self.restart_lock:
+            self.stopping = True
+            try:
+                self.commands.put(('stop', None))
+                self.process.join(0.5)
+            except (OSError, ValueError):
+                pass
+            self.terminate()
+        self.ring.close()
+        self.ring.unlink()
+
+
+# Engines that run on this machine; they take over when network providers fail
+LOCAL_PROVIDERS = ('vosk', 'pyttsx3', 'festival')
+
+
+class ProviderError(Exception):
+    """A speech provider couldn't serve a request; audio carries a captured utterance to retry"""
+
+    def __init__(self, message, audio=None):
+        super().__init__(message)
+        self.audio = audio
+
+
+def breaker_options(config):
+    """CircuitBreaker settings from the config"""
+    return {
+        'failures': config.get('provider_failures', 2),
+        'failure_rate': config.get('provider_failure_rate', 0.5),
+        'cooldown': config.get('provider_cooldown', 30)
+    }
+
+
+class CircuitBreaker:
+    """Health of one provider, from the outcomes of its recent calls
+
+    Closed, calls go through. failures consecutive failures, or failure_rate
+    over a full window of calls, open it: the provider is skipped for the
+    cooldown, which doubles up to max_cooldown while it keeps failing. Once
+    the cooldown has passed it is half-open, and the next probe or trial
+    call either closes it again or starts a longer cooldown. Latency is a
+    moving average of successful calls.
+    """
+
+    def __init__(self, failures=2, failure_rate=0.5, cooldown=30, max_cooldown=300, window=10):
+        self.failures = failures
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.outcomes = collections.deque(maxlen=window)
+        self.consecutive = 0
+        self.state = 'closed'
+        self.opened_at = 0
+        self.wait = cooldown
+        self.latency = None
+        self.lock = threading.Lock()
+
+    def half_open(self):
+        """Whether an open breaker's cooldown has passed"""
+        return self.state == 'open' and time.monotonic() - self.opened_at >= self.wait
+
+    def allows(self, trial=False):
+        """Whether a call may go to the provider; trial lets a half-open one be tried live"""
+        with self.lock:
+            return self.state == 'closed' or (trial and self.half_open())
+
+    def open(self):
+        """Stop routing calls to the provider"""
+        with self.lock:
+            self.trip()
+
+    def trip(self):
+        """Open, or reopen with a longer cooldown; the caller holds the lock"""
+        if self.state == 'open':
+            # Failed again after its cooldown: wait longer before the next try
+            self.wait = min(self.max_cooldown, self.wait * 2)
+        else:
+            self.state = 'open'
+            self.wait = self.cooldown
+        self.opened_at = time.monotonic()
+
+    def success(self, seconds=None):
+        """Record a served call; returns True when it closed an open breaker"""
+        with self.lock:
+            self.outcomes.append(True)
+            self.consecutive = 0
+            if seconds is not None:
+                self.latency = seconds if self.latency is None else 0.7 * self.latency + 0.3 * seconds
+            if self.state == 'closed':
+                return False
+            self.state = 'closed'
+            self.outcomes.clear()
+            return True
+
+    def failure(self):
+        """Record a failed call, opening the breaker when the provider looks down"""
+        with self.lock:
+            self.outcomes.append(False)
+            self.consecutive += 1
+            full = len(self.outcomes) == self.outcomes.maxlen
+            if (self.state == 'open' or self.consecutive >= self.failures or
+                    (full and self.outcomes.count(False) / len(self.outcomes) >= self.failure_rate)):
+                self.trip()
+
+    def failure_share(self):
+        """Share of recent calls that failed"""
+        with self.lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class ProviderPool:
+    """Interchangeable speech providers behind circuit breakers
+
+    names lists providers in order of preference and factory(name) builds
+    one; engines are built on first use or by prepare(). Calls go to the
+    fastest healthy network provider, then to local engines. An error fails
+    the call over to the next provider at once and counts against the
+    failed one. probe() checks open network providers in the background so
+    live requests don't wait on a dead service; without probes (no
+    scheduler, or a local engine) a half-open provider gets one live call.
+    """
+    kind = 'speech'
+
+    def __init__(self, names, factory, **options):
+        self.names = list(dict.fromkeys(names))
+        self.factory = factory
+        self.breakers = {name: CircuitBreaker(**options) for name in self.names}
+        self.engines = {}
+        self.probing = False
+        self.build_lock = threading.Lock()
+        self.last_used = None
+        self.stats = {'calls': 0, 'failovers': 0, 'exhausted': 0}
+
+    def engine(self, name):
+        """The provider's engine, built on first use"""
+        engine = self.engines.get(name)
+        if engine is None:
+            with self.build_lock:
+                engine = self.engines.get(name)
+                if engine is None:
+                    engine = self.factory(name)
+                    self.configure(engine)
+                    self.engines[name] = engine
+        return engine
+
+    def configure(self, engine):
+        """Bring a newly built engine in line with the pool"""
+
+    def prepare(self, names=None):
+        """Build engines ahead of their first call; ones that fail start open"""
+        for name in names or self.names:
+            try:
+                self.engine(name)
+            except Exception as e:
+                logger.warning(f"{self.kind} provider {name} unavailable: {str(e)}")
+                self.breakers[name].open()
+        return self
+
+    def order(self):
+        """Providers in the order calls try them"""
+        remote = [name for name in self.names if name not in LOCAL_PROVIDERS]
+        # Unmeasured providers sort first so each gets timed once
+        remote.sort(key=lambda name: self.breakers[name].latency or 0)
+        return remote + [name for name in self.names if name in LOCAL_PROVIDERS]
+
+    def current(self):
+        """The provider the next call would try first"""
+        for name in self.order():
+            if self.breakers[name].state == 'closed':
+                return name
+        return self.names[0]
+
+    def retry(self, method, args, error):
+        """Method and arguments for the next provider after error"""
+        return method, args
+
+    def call(self, method, *args, size=1):
+        """Call method on the best available provider, failing over on errors
+
+        size normalizes latency across calls (characters of text, say).
+        """
+        self.stats['calls'] += 1
+        order = self.order()
+        candidates = [name for name in order
+                      if self.breakers[name].allows(trial=name in LOCAL_PROVIDERS or not self.probing)]
+        if not candidates:
+            # Everything is open: local engines are still the best bet
+            candidates = [name for name in order if name in LOCAL_PROVIDERS]
+        error = None
+        for name in candidates:
+            breaker = self.breakers[name]
+            try:
+                engine = self.engine(name)
+            except Exception as e:
+                logger.warning(f"{self.kind} provider {name} unavailable: {str(e)}")
+                breaker.open()
+                error = e
+                continue
+            function = getattr(engine, method, None)
+            if function is None:
+                continue
+            start = time.perf_counter()
+            try:
+                result = function(*args)
+            except Exception as e:
+                breaker.failure()
+                PROVIDER_CALLS.inc(kind=self.kind, provider=name, outcome='failure')
+                logger.warning(f"{self.kind} provider {name} failed: {str(e)}")
+                error = e
+                method, args = self.retry(method, args, e)
+                continue
+            elapsed = time.perf_counter() - start
+            if breaker.success(elapsed / max(1, size)):
+                logger.info(f"{self.kind} provider {name} recovered")
+            PROVIDER_CALLS.inc(kind=self.kind, provider=name, outcome='ok')
+            PROVIDER_SECONDS.observe(elapsed, kind=self.kind, provider=name)
+            if error is not None:
+                self.stats['failovers'] += 1
+            self.last_used = name
+            return result
+        self.stats['exhausted'] += 1
+        raise error or ProviderError(f"No {self.kind} provider available")
+
+    def probe(self):
+        """Check open network providers whose cooldown has passed; runs on the scheduler"""
+        self.probing = True
+        for name in self.names:
+            breaker = self.breakers[name]
+            if name in LOCAL_PROVIDERS or not breaker.half_open():
+                continue
+            try:
+                engine = self.engine(name)
+                if hasattr(engine, 'probe'):
+                    engine.probe()
+            except Exception as e:
+                logger.info(f"{self.kind} provider {name} still unavailable: {str(e)}")
+                breaker.failure()
+                PROVIDER_CALLS.inc(kind=self.kind, provider=name, outcome='probe_failure')
+                continue
+            breaker.success()
+            logger.info(f"{self.kind} provider {name} is back")
+
+    def health(self):
+        """Per provider: breaker state, failure share and latency"""
+        return {name: {'state': breaker.state, 'failure_share': breaker.failure_share(),
+                       'latency': breaker.latency}
+                for name, breaker in self.breakers.items()}
+
+
+class STTProviders(ProviderPool):
+    """Speech recognition with failover; a drop-in for one recognizer
+
+    When a network recognizer fails after capturing an utterance, the next
+    provider recognizes that same audio instead of listening again.
+    """
+    kind = 'stt'
+
+    def retry(self, method, args, error):
+        if isinstance(error, ProviderError) and error.audio is not None:
+            return 'recognize_audio', (error.audio,)
+        return method, args
+
+    def listen(self):
+        """Capture and recognize the next utterance"""
+        return self.recognize('listen')
+
+    def transcribe(self, reader):
+        """Recognize the next utterance from a RingReader"""
+        return self.recognize('transcribe', reader)
+
+    def recognize(self, method, *args):
+        try:
+            return self.call(method, *args)
+        except Exception as e:
+            logger.error(f"No speech recognizer could handle the request: {str(e)}")
+            STT_FAILURES.inc(engine='all', reason='unavailable')
+            return ""
+
+
+class TTSProviders(ProviderPool):
+    """Speech synthesis with failover; a drop-in engine for SpeechPlayer
+
+    Rate, pitch and volume go to every engine, including ones built later,
+    so a fallback speaks with the current profile.
+    """
+    kind = 'tts'
+
+    def __init__(self, names, factory, **options):
+        super().__init__(names, factory, **options)
+        self.settings = {'rate': 1.0, 'pitch': 1.0, 'volume': 1.0}
+
+    def configure(self, engine):
+        engine.set_rate(self.settings['rate'])
+        engine.set_pitch(self.settings['pitch'])
+        engine.set_volume(self.settings['volume'])
+
+    def adjust(self, setting, value):
+        self.settings[setting] = value
+        for engine in list(self.engines.values()):
+            getattr(engine, f"set_{setting}")(value)
+
+    def set_rate(self, rate):
+        """Set speech rate on every engine"""
+        self.adjust('rate', rate)
+
+    def set_pitch(self, pitch):
+        """Set speech pitch on every engine"""
+        self.adjust('pitch', pitch)
+
+    def set_volume(self, volume):
+        """Set speech volume on every engine"""
+        self.adjust('volume', volume)
+
+    def voice_key(self, lang):
+        """Phrase pack key of the engine that would speak now"""
+        engine = self.engines.get(self.current())
+        return engine.voice_key(lang) if engine is not None else f"{self.current()}:{lang}"
+
+    def render(self, text, lang):
+        """Synthesize text to (audio bytes, format) with the current engine
+
+        No failover here: clips are stored under that engine's voice_key.
+        """
+        name = self.current()
+        try:
+            return self.engine(name).render(text, lang)
+        except Exception:
+            self.breakers[name].failure()
+            raise
+
+    def speak(self, text, lang, control=None):
+        """Speak text on the first engine that can"""
+        try:
+            self.call('speak', text, lang, control, size=len(text))
+        except Exception as e:
+            logger.error(f"No TTS engine could speak: {str(e)}")
+
+
+class StreamCipher:
+    """Chunked authenticated encryption for persisted state files
+
+    Layout: a 16 byte header (magic, version, chunk size, nonce prefix)
+    followed by length-prefixed AES-GCM segments. Every segment carries its
+    own tag, a counter in its nonce and a final-segment flag, so segments
+    cannot be reordered, dropped or truncated without detection. Plaintext
+    is JSON Lines, which lets readers decode one record at a time.
+    """
+
+    def __init__(self, key, chunk_size=STREAM_CHUNK_SIZE):
+        from cryptography.fernet import Fernet
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        from cryptography.exceptions import InvalidTag
+
+        # Derive a separate AEAD key from the Fernet key in secret.key
+        raw_key = base64.urlsafe_b64decode(key)
+        stream_key = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=b"raki-stream-v1"
+        ).derive(raw_key)
+        self.aead = AESGCM(stream_key)
+        self.fernet = Fernet(key)
+        self.InvalidTag = InvalidTag
+        self.chunk_size = chunk_size
+
+    def _nonce(self, prefix, counter, final):
+        """Build the per-segment nonce"""
+        return prefix + struct.pack(">IB", counter, 1 if final else 0)
+
+    def write_records(self, path, records):
+        """Encrypt an iterable of JSON-serializable records to path"""
+        started = time.perf_counter()
+        tmp_path = f"{path}.tmp"
+        prefix = os.urandom(STREAM_NONCE_PREFIX_SIZE)
+        header = STREAM_MAGIC + struct.pack(">BI", STREAM_VERSION, self.chunk_size) + prefix
+        counter = 0
+        pending = bytearray()
+
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+
+            def seal(data, final):
+                nonce = self._nonce(prefix, counter, final)
+                sealed = self.aead.encrypt(nonce, bytes(data), header)
+                f.write(struct.pack(">I", len(sealed)))
+                f.write(sealed)
+
+            for record in records:
+                pending += json.dumps(record, ensure_ascii=False).encode('utf-8') + b"\n"
+                while len(pending) > self.chunk_size:
+                    seal(pending[:self.chunk_size], False)
+                    del pending[:self.chunk_size]
+                    counter += 1
+
+            seal(pending, True)
+
+        os.replace(tmp_path, path)
+        # Cache entries are labelled by directory to keep the label set small
+        label = os.path.basename(os.path.dirname(path)) or os.path.basename(path)
+        PERSIST_SECONDS.observe(time.perf_counter() - started, file=label)
+
+    def iter_segments(self, path):
+        """Yield decrypted plaintext segments of a stream file"""
+        with open(path, 'rb') as f:
+            header = f.read(STREAM_HEADER_SIZE)
+            if len(header) != STREAM_HEADER_SIZE or not header.startswith(STREAM_MAGIC):
+                raise ValueError(f"Not a Raki stream file: {path}")
+
+            version, chunk_size = struct.unpack(">BI", header[4:9])
+            if version != STREAM_VERSION:
+                raise ValueError(f"Unsupported stream version: {version}")
+            prefix = header[9:]
+
+            counter = 0
+            while True:
+                length_bytes = f.read(4)
+                if len(length_bytes) != 4:
+                    raise ValueError("Stream file truncated before final segment")
+
+                (length,) = struct.unpack(">I", length_bytes)
+                if length > chunk_size + STREAM_TAG_SIZE:
+                    raise ValueError("Stream segment exceeds declared chunk size")
+
+                sealed = f.read(length)
+                if len(sealed) != length:
+                    raise ValueError("Stream segment truncated")
+
+                # The final flag is authenticated, so try the common case first
+                for final in (False, True):
+                    try:
+                        data = self.aead.decrypt(self._nonce(prefix, counter, final), sealed, header)
+                        break
+                    except self.InvalidTag:
+                        continue
+                else:
+                    raise ValueError(f"Stream segment {counter} failed authentication")
+
+                yield data
+                if final:
+                    if f.read(1):
+                        raise ValueError("Unexpected data after final segment")
+                    return
+                counter += 1
+
+    def iter_lines(self, path):
+        """Yield raw JSON lines without parsing them"""
+        buffer = b""
+        for segment in self.iter_segments(path):
+            buffer += segment
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line:
+                    yield line
+        if buffer:
+            yield buffer
+
+    def iter_records(self, path):
+        """Lazily yield records, reading legacy Fernet files transparently"""
+        if self.is_stream_file(path):
+            for line in self.iter_lines(path):
+                yield json.loads(line)
+            return
+
+        # Compatibility reader for files written by encrypt_data
+        with open(path, 'rb') as f:
+            data = json.loads(self.fernet.decrypt(f.read().strip()))
+        if isinstance(data, list):
+            yield from data
+        else:
+            yield data
+
+    @staticmethod
+    def is_stream_file(path):
+        """Check whether path uses the chunked format"""
+        with open(path, 'rb') as f:
+            return f.read(len(STREAM_MAGIC)) == STREAM_MAGIC
+
+
+class StateStore:
+    """Named collections shared between threads
+
+    Each collection is held as an immutable tuple snapshot, so reads never
+    lock: get() returns whatever snapshot is current. Writers take the
+    collection's own lock, build a new tuple and swap it in, then notify
+    subscribers with the new snapshot outside the lock. Items themselves
+    are shared between snapshots and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.versions = {}
+        self.locks = {}
+        self.listeners = {}
+        self.registry_lock = threading.Lock()
+
+    def lock(self, name):
+        """Write lock for one collection, created on first use"""
+        lock = self.locks.get(name)
+        if lock is None:
+            with self.registry_lock:
+                lock = self.locks.setdefault(name, threading.Lock())
+        return lock
+
+    def get(self, name):
+        """Current snapshot of a collection (a tuple)"""
+        return self.data.get(name, ())
+
+    def memory_bytes(self):
+        """Approximate bytes held by the current snapshots"""
+        return deep_sizeof(dict(self.data))
+
+    def versioned(self, name):
+        """(version, snapshot); the version grows with every write"""
+        with self.lock(name):
+            return self.versions.get(name, 0), self.data.get(name, ())
+
+    def subscribe(self, name, callback):
+        """Call callback(name, snapshot) after every change to a collection"""
+        with self.registry_lock:
+            self.listeners.setdefault(name, []).append(callback)
+
+    def update(self, name, func, notify=True):
+        """Replace a collection with func(snapshot); returns the new snapshot"""
+        with self.lock(name):
+            snapshot = tuple(func(self.data.get(name, ())))
+            self.data[name] = snapshot
+            self.versions[name] = self.versions.get(name, 0) + 1
+        if notify:
+            self.notify(name, snapshot)
+        return snapshot
+
+    def append(self, name, item, limit=None):
+        """Add an item, keeping at most the newest limit items"""
+        return self.update(name, lambda items: (items + (item,))[-limit:] if limit else items + (item,))
+
+    def take(self, name, predicate):
+        """Atomically remove and return the items matching predicate"""
+        taken = []
+        with self.lock(name):
+            kept = []
+            for item in self.data.get(name, ()):
+                (taken if predicate(item) else kept).append(item)
+            if not taken:
+                return taken
+            snapshot = self.data[name] = tuple(kept)
+            self.versions[name] = self.versions.get(name, 0) + 1
+        self.notify(name, snapshot)
+        return taken
+
+    def notify(self, name, snapshot):
+        """Tell subscribers about a change"""
+        for callback in self.listeners.get(name, ()):
+            try:
+                callback(name, snapshot)
+            except Exception as e:
+                logger.error(f"State listener error for {name}: {str(e)}")
+
+
+class ScheduledTask:
+    """A periodic or one-shot job owned by the Scheduler"""
+    def __init__(self, name, func, interval=None, jitter=0.0, blocking=True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.blocking = blocking
+        self.deadline = None
+        self.seq = None
+        self.running = False
+        self.runs = 0
+
+
+class Scheduler:
+    """One timer thread for every background service
+
+    Periodic tasks (every) and deadline tasks (at) wait in a heap. Due
+    blocking tasks go to a small pool of worker threads through a bounded
+    queue; a task that is still running when it comes due again is skipped
+    rather than stacked. stop() wakes the timer at once, so shutdown does
+    not wait out anyone's sleep. Lag (how late a task started) and runtime
+    are recorded per task.
+    """
+
+    def __init__(self, workers=2, queue_size=16):
+        self.heap = []
+        self.tasks = {}
+        self.condition = threading.Condition()
+        self.stopping = threading.Event()
+        self.work = queue.Queue(maxsize=queue_size)
+        self.worker_count = workers
+        self.threads = {}
+        self.counter = itertools.count()
+        self.stats = {'dispatched': 0, 'skipped': 0, 'dropped': 0, 'failed': 0}
+
+    def start(self):
+        """Start the timer and worker threads"""
+        self.threads['scheduler'] = threading.Thread(target=self.run, name='scheduler', daemon=True)
+        for i in range(self.worker_count):
+            name = f'scheduler_worker_{i}'
+            self.threads[name] = threading.Thread(target=self.work_loop, name=name, daemon=True)
+        for thread in self.threads.values():
+            thread.start()
+        return self
+
+    def every(self, name, interval, func, jitter=0.1, delay=None, blocking=True):
+        """Run func every interval seconds, spread by ±jitter × interval"""
+        task = ScheduledTask(name, func, interval, jitter, blocking)
+        self.push(task, time.monotonic() + (interval if delay is None else delay))
+        return task
+
+    def at(self, name, when, func, blocking=True):
+        """Run func once at wall-clock time when; replaces a pending task of that name"""
+        task = ScheduledTask(name, func, blocking=blocking)
+        self.push(task, time.monotonic() + max(0.0, when - time.time()))
+        return task
+
+    def pending(self, name):
+        """Whether a task of that name is waiting to run"""
+        return name in self.tasks
+
+    def cancel(self, name):
+        """Forget a task; a run already in progress finishes"""
+        with self.condition:
+            self.tasks.pop(name, None)
+
+    def push(self, task, deadline):
+        """(Re)schedule task at a monotonic deadline"""
+        with self.condition:
+            task.deadline = deadline
+            task.seq = next(self.counter)
+            self.tasks[task.name] = task
+            heapq.heappush(self.heap, (deadline, task.seq, task))
+            self.condition.notify()
+
+    def run(self):
+        """Timer loop: sleep until the earliest deadline or a change"""
+        while not self.stopping.is_set():
+            with self.condition:
+                # Drop entries for cancelled, replaced or rescheduled tasks
+                while self.heap:
+                    _, seq, task = self.heap[0]
+                    if self.tasks.get(task.name) is task and task.seq == seq:
+                        break
+                    heapq.heappop(self.heap)
+                timeout = self.heap[0][0] - time.monotonic() if self.heap else None
+                if timeout is None or timeout > 0:
+                    self.condition.wait(timeout)
+                    continue
+                deadline, _, task = heapq.heappop(self.heap)
+                if task.interval is None:
+                    del self.tasks[task.name]
+                else:
+                    self.reschedule(task, deadline)
+            if not self.stopping.is_set():
+                self.dispatch(task, time.monotonic() - deadline)
+
+    def reschedule(self, task, deadline):
+        """Queue the next run of a periodic task; call with the condition held"""
+        now = time.monotonic()
+        next_deadline = deadline + task.interval
+        if next_deadline < now:
+            next_deadline = now + task.interval  # Missed runs are skipped, not replayed
+        next_deadline += random.uniform(-task.jitter, task.jitter) * task.interval
+        task.deadline = next_deadline
+        task.seq = next(self.counter)
+        heapq.heappush(self.heap, (next_deadline, task.seq, task))
+
+    def dispatch(self, task, lag):
+        """Start a due task inline or on the worker pool"""
+        SCHEDULER_LAG_SECONDS.observe(max(0.0, lag), task=task.name)
+        if task.running:
+            self.stats['skipped'] += 1
+            SCHEDULER_SKIPPED.inc(task=task.name, reason='overrun')
+            return
+        if not task.blocking:
+            self.execute(task)
+            return
+        task.running = True
+        try:
+            self.work.put_nowait(task)
+            self.stats['dispatched'] += 1
+        except queue.Full:
+            task.running = False
+            self.stats['dropped'] += 1
+            SCHEDULER_SKIPPED.inc(task=task.name, reason='queue_full')
+            logger.warning(f"Scheduler queue full; skipped {task.name}")
+
+    def execute(self, task):
+        """Run one task, recording its runtime"""
+        start = time.perf_counter()
+        try:
+            with tracer.span(f'task.{task.name}'):
+                task.func()
+        except Exception as e:
+            self.stats['failed'] += 1
+            logger.error(f"Scheduled task {task.name} failed: {str(e)}")
+        finally:
+            task.running = False
+            task.runs += 1
+            TASK_SECONDS.observe(time.perf_counter() - start, task=task.name)
+
+    def work_loop(self):
+        """Worker thread: run blocking tasks until stopped"""
+        while True:
+            task = self.work.get()
+            if task is None or self.stopping.is_set():
+                return
+            self.execute(task)
+
+    def stop(self, timeout=0.05):
+        """Cancel everything; waits at most timeout for in-flight work"""
+        self.stopping.set()
+        with self.condition:
+            self.tasks.clear()
+            self.heap.clear()
+            self.condition.notify_all()
+        for _ in range(self.worker_count):
+            try:
+                self.work.put_nowait(None)
+            except queue.Full:
+                break
+        deadline = time.monotonic() + timeout
+        for thread in self.threads.values():
+            thread.join(max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in self.threads.values())
+
+
+def deep_sizeof(obj):
+    """Approximate bytes held by obj and the containers and strings inside it"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, collections.deque)):
+            stack.extend(item)
+    return total
+
+
+class MemoryAccountant:
+    """One memory budget shared by every cache and buffer
+
+    Owners register a function reporting the bytes they hold and, if they
+    can give memory back, a release(nbytes) function that frees about that
+    much and returns what it freed, plus when they were last used. check()
+    runs on the scheduler: over budget, evictable owners are asked in turn,
+    largest first or least recently used first, until the total is back
+    under low_water of the budget. Fixed buffers register without release
+    so reports still account for them.
+    """
+
+    def __init__(self, budget=0, policy='largest', low_water=0.8):
+        self.budget = budget
+        self.policy = policy
+        self.low_water = low_water
+        self.owners = {}
+        self.lock = threading.Lock()
+        self.last_snapshot = None
+        self.stats = {'checks': 0, 'evictions': 0, 'evicted_bytes': 0, 'over_budget': 0}
+
+    def register(self, name, size, release=None, last_used=None):
+        """Account for an owner; size() returns bytes held"""
+        with self.lock:
+            self.owners[name] = {'size': size, 'release': release, 'last_used': last_used}
+
+    def unregister(self, name):
+        """Stop accounting for an owner"""
+        with self.lock:
+            self.owners.pop(name, None)
+
+    def sizes(self):
+        """Bytes held by each owner"""
+        with self.lock:
+            owners = dict(self.owners)
+        sizes = {}
+        for name, owner in owners.items():
+            try:
+                sizes[name] = int(owner['size']())
+            except Exception as e:
+                logger.warning(f"Memory size of {name} unavailable: {str(e)}")
+                sizes[name] = 0
+        return sizes
+
+    def eviction_order(self, sizes):
+        """Evictable owners in the order they give memory back"""
+        with self.lock:
+            owners = {name: owner for name, owner in self.owners.items()
+                      if owner['release'] and sizes.get(name)}
+        if self.policy == 'lru':
+            # Owners that can't say when they were used count as in use now
+            now = time.time()
+            return sorted(owners, key=lambda name: owners[name]['last_used']() if owners[name]['last_used'] else now)
+        return sorted(owners, key=sizes.get, reverse=True)
+
+    def check(self):
+        """Evict down to the low-water mark when over budget; returns bytes freed"""
+        self.stats['checks'] += 1
+        sizes = self.sizes()
+        total = sum(sizes.values())
+        if not self.budget or total <= self.budget:
+            return 0
+        self.stats['over_budget'] += 1
+        target = total - int(self.budget * self.low_water)
+        freed = 0
+        for name in self.eviction_order(sizes):
+            if freed >= target:
+                break
+            try:
+                released = int(self.owners[name]['release'](min(sizes[name], target - freed)) or 0)
+            except Exception as e:
+                logger.error(f"Memory release by {name} failed: {str(e)}")
+                continue
+            if released:
+                freed += released
+                self.stats['evictions'] += 1
+                MEMORY_EVICTED.inc(released, owner=name)
+        self.stats['evicted_bytes'] += freed
+        if total - freed > self.budget:
+            logger.warning(f"Memory still over budget after eviction: {total - freed} of {self.budget} bytes")
+        return freed
+
+    def report(self):
+        """Total, budget and per-owner bytes, largest first"""
+        sizes = self.sizes()
+        return {
+            'total': sum(sizes.values()),
+            'budget': self.budget,
+            'owners': dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+        }
+
+    def allocation_sites(self, limit=10):
+        """Top allocation sites from tracemalloc, with growth since the previous call
+
+        Returns None while tracemalloc isn't tracing. Each site is
+        (file:line, bytes, bytes grown, allocations).
+        """
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ))
+        if self.last_snapshot is None:
+            stats = [(stat.traceback[0], stat.size, 0, stat.count) for stat in snapshot.statistics('lineno')]
+        else:
+            stats = [(stat.traceback[0], stat.size, stat.size_diff, stat.count)
+                     for stat in snapshot.compare_to(self.last_snapshot, 'lineno')]
+        self.last_snapshot = snapshot
+        # Growing sites first, then the largest
+        stats.sort(key=lambda stat: (stat[2], stat[1]), reverse=True)
+        return [(f"{os.path.basename(frame.filename)}:{frame.lineno}", size, grown, count)
+                for frame, size, grown, count in stats[:limit]]
+
+
+class RingBuffer:
+    """Fixed-size time series backed by NumPy arrays"""
+
+    def __init__(self, capacity):
+        import numpy as np
+        self.np = np
+        self.capacity = capacity
+        self.times = np.full(capacity, np.nan)
+        self.values = np.full(capacity, np.nan)
+        self.index = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def append(self, timestamp, value):
+        """Store a sample, overwriting the oldest one when full"""
+        with self.lock:
+            self.times[self.index] = timestamp
+            self.values[self.index] = self.np.nan if value is None else value
+            self.index = (self.index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self):
+        """Return copies of (times, values), oldest first"""
+        with self.lock:
+            if self.count < self.capacity:
+                return self.times[:self.count].copy(), self.values[:self.count].copy()
+            return (self.np.concatenate((self.times[self.index:], self.times[:self.index])),
+                    self.np.concatenate((self.values[self.index:], self.values[:self.index])))
+
+    def latest(self):
+        """Most recent value, or None if there is none"""
+        with self.lock:
+            if not self.count:
+                return None
+            value = self.values[self.index - 1]
+        return None if self.np.isnan(value) else float(value)
+
+    def window(self, seconds, now=None):
+        """Samples taken within the last `seconds`"""
+        now = time.time() if now is None else now
+        times, values = self.ordered()
+        mask = times >= now - seconds
+        return times[mask], values[mask]
+
+    def mean(self, seconds, now=None):
+        """Average over the last `seconds`, ignoring missing samples"""
+        _, values = self.window(seconds, now)
+        values = values[~self.np.isnan(values)]
+        return float(values.mean()) if values.size else None
+
+    def trend(self, seconds, now=None):
+        """Least-squares slope over the last `seconds`, in units per minute"""
+        times, values = self.window(seconds, now)
+        valid = ~self.np.isnan(values)
+        times, values = times[valid], values[valid]
+        if values.size < 2 or times[-1] == times[0]:
+            return None
+        slope = self.np.polyfit(times - times[0], values, 1)[0]
+        return float(slope * 60)
+
+    def duration_above(self, threshold):
+        """Seconds the series has stayed above threshold up to its latest sample"""
+        times, values = self.ordered()
+        if not values.size or not values[-1] > threshold:
+            return 0.0
+        below = self.np.nonzero(~(values > threshold))[0]
+        start = below[-1] + 1 if below.size else 0
+        return float(times[-1] - times[start])
+
+
+class MetricsSampler:
+    """Background thread recording system metrics into ring buffers"""
+
+    METRICS = ('cpu', 'ram', 'disk', 'temperature', 'battery',
+               'battery_plugged', 'net_sent', 'net_recv')
+
+    def __init__(self, interval=5.0, capacity=720):
+        import psutil
+        self.psutil = psutil
+        self.interval = interval
+        self.series = {name: RingBuffer(capacity) for name in self.METRICS}
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_net = None
+        self.listeners = []
+
+        # The first cpu_percent() call only sets the baseline
+        psutil.cpu_percent(interval=None)
+
+    def read_temperature(self):
+        """Hottest core temperature in °C, or None"""
+        try:
+            sensors = self.psutil.sensors_temperatures()
+        except (AttributeError, OSError):
+            return None
+        entries = sensors.get('coretemp') or next(iter(sensors.values()), [])
+        readings = [entry.current for entry in entries if entry.current is not None]
+        return max(readings) if readings else None
+
+    def read_network(self, now):
+        """Bytes per second sent and received since the previous sample"""
+        counters = self.psutil.net_io_counters()
+        previous, self.last_net = self.last_net, (now, counters.bytes_sent, counters.bytes_recv)
+        if not previous or now <= previous[0]:
+            return None, None
+        elapsed = now - previous[0]
+        return ((counters.bytes_sent - previous[1]) / elapsed,
+                (counters.bytes_recv - previous[2]) / elapsed)
+
+    def sample_once(self):
+        """Take one sample of every metric and return it"""
+        now = time.time()
+        sample = {
+            'cpu': self.psutil.cpu_percent(interval=None),
+            'ram': self.psutil.virtual_memory().percent,
+            'disk': self.psutil.disk_usage('/').percent,
+            'temperature': self.read_temperature(),
+            'battery': None,
+            'battery_plugged': None
+        }
+
+        try:
+            battery = self.psutil.sensors_battery()
+            if battery:
+                sample['battery'] = battery.percent
+                sample['battery_plugged'] = 1.0 if battery.power_plugged else 0.0
+        except (AttributeError, OSError):
+            pass
+
+        sample['net_sent'], sample['net_recv'] = self.read_network(now)
+
+        for name, value in sample.items():
+            self.series[name].append(now, value)
+
+        for callback in self.listeners:
+            try:
+                callback(now, sample)
+            except Exception as e:
+                logger.error(f"Metrics listener error: {str(e)}")
+        return sample
+
+    def subscribe(self, callback):
+        """Call callback(timestamp, sample) after every sample"""
+        self.listeners.append(callback)
+
+    def export_trace(self):
+        """Recorded history as (timestamp, sample) pairs, oldest first"""
+        ordered = {name: series.ordered() for name, series in self.series.items()}
+        times = ordered['cpu'][0]
+        trace = []
+        for i, timestamp in enumerate(times):
+            sample = {}
+            for name, (_, values) in ordered.items():
+                value = values[i] if i < len(values) else float('nan')
+                sample[name] = None if value != value else float(value)
+            trace.append((float(timestamp), sample))
+        return trace
+
+    def memory_bytes(self):
+        """Bytes held by the ring buffers"""
+        return sum(series.times.nbytes + series.values.nbytes for series in self.series.values())
+
+    def has_samples(self):
+        """Whether at least one sample has been recorded"""
+        return self.series['cpu'].count > 0
+
+    def snapshot(self):
+        """Latest value of every metric, sampling now if nothing is recorded yet"""
+        if not self.has_samples():
+            return self.sample_once()
+        return {name: series.latest() for name, series in self.series.items()}
+
+    def run(self):
+        """Sampling loop"""
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.sample_once()
+            except Exception as e:
+                logger.error(f"Metrics sampling error: {str(e)}")
+
+    def start(self):
+        """Start the sampler thread"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the sampler thread"""
+        self.stop_event.set()
+
+
+class DiagnosticsRunner:
+    """Runs registered health probes concurrently under a latency budget"""
+
+    def __init__(self, budget=1.0, max_workers=4):
+        from concurrent.futures import ThreadPoolExecutor
+        self.budget = budget
+        self.probes = {}
+        self.timings = {}
+        self.missed = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='probe')
+
+    def register(self, name, probe):
+        """Add a probe: a callable returning a list of issue strings"""
+        self.probes[name] = probe
+
+    def timed(self, name, probe):
+        """Run a probe and record its runtime, even if the caller gave up on it"""
+        start = time.perf_counter()
+        try:
+            return probe()
+        finally:
+            with self.lock:
+                self.timings[name] = time.perf_counter() - start
+
+    def run(self):
+        """Run every probe; return (issues, names of probes that missed the deadline)"""
+        from concurrent.futures import wait
+        futures = {name: self.executor.submit(self.timed, name, probe)
+                   for name, probe in self.probes.items()}
+        wait(futures.values(), timeout=self.budget)
+
+        issues = []
+        unknown = []
+        for name, future in futures.items():
+            if not future.done():
+                unknown.append(name)
+                with self.lock:
+                    self.missed[name] = self.missed.get(name, 0) + 1
+                continue
+            try:
+                issues.extend(future.result())
+            except Exception as e:
+                logger.error(f"Diagnostics probe {name} failed: {str(e)}")
+                unknown.append(name)
+        return issues, unknown
+
+    def report(self):
+        """Last runtime and missed-deadline count per probe"""
+        with self.lock:
+            return {name: {'last_ms': round(self.timings[name] * 1000, 2) if name in self.timings else None,
+                           'missed': self.missed.get(name, 0)}
+                    for name in self.probes}
+
+    def shutdown(self):
+        """Stop accepting probe runs"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AlertRule:
+    """One threshold or rate-of-change condition over a metric"""
+
+    def __init__(self, name, metric, threshold, kind='threshold', direction='above',
+                 clear=None, duration=0, realert=None, message=None, only_if=None):
+        self.name = name
+        self.metric = metric
+        self.threshold = threshold
+        self.kind = kind
+        self.direction = direction
+        # Hysteresis: an active alert only resolves once past the clear level
+        self.clear = threshold if clear is None else clear
+        self.duration = duration
+        self.realert = realert
+        self.message = message or f"{metric} {direction} {threshold}: {{value:.0f}}"
+        self.only_if = only_if or {}
+        self.reset()
+
+    @classmethod
+    def from_config(cls, spec):
+        """Build a rule from a config dictionary"""
+        return cls(**spec)
+
+    def reset(self):
+        """Forget all evaluation state"""
+        self.active = False
+        self.pending_since = None
+        self.last_alert = None
+        self.previous = None
+
+    def breached(self, value):
+        """Whether value crosses the firing threshold"""
+        return value > self.threshold if self.direction == 'above' else value < self.threshold
+
+    def cleared(self, value):
+        """Whether value is back past the clear level"""
+        return value < self.clear if self.direction == 'above' else value > self.clear
+
+    def observe(self, timestamp, sample):
+        """Feed one sample; return 'fired', 'reminder', 'resolved' or None"""
+        value = sample.get(self.metric)
+        if value is None:
+            return None
+
+        if self.kind == 'rate':
+            previous, self.previous = self.previous, (timestamp, value)
+            if not previous or timestamp <= previous[0]:
+                return None
+            # Rate of change in units per minute
+            value = (value - previous[1]) / (timestamp - previous[0]) * 60
+
+        self.value = value
+        if any(sample.get(metric) != expected for metric, expected in self.only_if.items()):
+            if self.active:
+                self.active = False
+                self.pending_since = None
+                return 'resolved'
+            self.pending_since = None
+            return None
+
+        if not self.active:
+            if not self.breached(value):
+                self.pending_since = None
+                return None
+            if self.pending_since is None:
+                self.pending_since = timestamp
+            if timestamp - self.pending_since >= self.duration:
+                self.active = True
+                self.last_alert = timestamp
+                return 'fired'
+            return None
+
+        if self.cleared(value):
+            self.active = False
+            self.pending_since = None
+            return 'resolved'
+        if self.realert and timestamp - self.last_alert >= self.realert:
+            self.last_alert = timestamp
+            return 'reminder'
+        return None
+
+    def describe(self, timestamp):
+        """Speakable description of the current alert"""
+        text = self.message.format(value=self.value)
+        if self.pending_since is not None and timestamp - self.pending_since >= 60:
+            text += f" for {describe_duration(timestamp - self.pending_since)}"
+        return text
+
+
+class AlertEngine:
+    """Evaluates alert rules incrementally as metric samples arrive"""
+
+    def __init__(self, rules):
+        self.rules = [rule if isinstance(rule, AlertRule) else AlertRule.from_config(rule)
+                      for rule in rules]
+        self.listeners = []
+        self.evaluations = 0
+        self.alerts = 0
+
+    def subscribe(self, callback):
+        """Call callback(events) whenever a sample changes alert state"""
+        self.listeners.append(callback)
+
+    def observe(self, timestamp, sample):
+        """Evaluate every rule against one sample and notify on transitions"""
+        events = []
+        for rule in self.rules:
+            self.evaluations += 1
+            state = rule.observe(timestamp, sample)
+            if state:
+                events.append({
+                    'rule': rule.name,
+                    'state': state,
+                    'time': timestamp,
+                    'text': rule.describe(timestamp)
+                })
+                if state != 'resolved':
+                    self.alerts += 1
+
+        if events:
+            for callback in self.listeners:
+                callback(events)
+        return events
+
+    def replay(self, trace):
+        """Feed recorded (timestamp, sample) pairs through fresh rule state"""
+        for rule in self.rules:
+            rule.reset()
+        self.evaluations = 0
+        self.alerts = 0
+
+        samples = 0
+        events = []
+        start = time.perf_counter()
+        for timestamp, sample in trace:
+            samples += 1
+            events.extend(self.observe(timestamp, sample))
+
+        return {
+            'samples': samples,
+            'evaluations': self.evaluations,
+            'alerts': self.alerts,
+            'resolved': sum(1 for e in events if e['state'] == 'resolved'),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+            'events': events
+        }
+
+
+class PortScanService:
+    """Keeps the last port scan and reports only what changed
+
+    Full scans use nmap when it is installed and fall back to plain socket
+    connects otherwise. Quick checks only reconnect to known ports plus a
+    short watch list, so they are cheap enough to run often.
+    """
+
+    WATCH_PORTS = (21, 22, 23, 25, 53, 80, 111, 139, 443, 445, 631, 1433, 3000, 3306,
+                   3389, 5000, 5432, 5900, 6379, 8000, 8080, 8443, 8888, 9200, 27017)
+
+    def __init__(self, host='localhost', ports='1-1024', timeout=0.3, full_interval=1800):
+        self.host = host
+        self.ports = ports
+        self.timeout = timeout
+        self.full_interval = full_interval
+        self.open_ports = None
+        self.last_full_scan = 0
+        self.changes = collections.deque(maxlen=100)
+        self.stats = {'full_scans': 0, 'quick_scans': 0, 'last_full_ms': None,
+                      'last_quick_ms': None, 'changes': 0}
+
+        try:
+            import nmap
+            self.nmap = nmap.PortScanner()
+        except Exception as e:
+            logger.warning(f"nmap unavailable, using socket scan: {str(e)}")
+            self.nmap = None
+
+    def port_range(self):
+        """Ports covered by a full scan, from a spec like '1-1024,8080'"""
+        ports = set(self.WATCH_PORTS)
+        for part in str(self.ports).split(','):
+            if '-' in part:
+                low, high = part.split('-')
+                ports.update(range(int(low), int(high) + 1))
+            elif part.strip():
+                ports.add(int(part))
+        return sorted(ports)
+
+    def service_name(self, port):
+        """Best-effort service name for a port"""
+        try:
+            return socket.getservbyport(port, 'tcp')
+        except OSError:
+            return 'unknown'
+
+    def is_open(self, port):
+        """Check a single port with a TCP connect"""
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            return sock.connect_ex((self.host, port)) == 0
+
+    def connect_scan(self, ports):
+        """Socket-connect scan of the given ports; returns {port: service}"""
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=64) as pool:
+            results = pool.map(self.is_open, ports)
+        return {port: self.service_name(port) for port, is_open in zip(ports, results) if is_open}
+
+    def nmap_scan(self):
+        """Full nmap scan; returns {port: service}"""
+        # Include the watch list so quick checks and full scans agree
+        ports = ','.join([str(self.ports)] + [str(p) for p in self.WATCH_PORTS])
+        self.nmap.scan(self.host, ports=ports, arguments='-T4')
+        found = {}
+        for host in self.nmap.all_hosts():
+            for port, info in self.nmap[host].get('tcp', {}).items():
+                if info.get('state') == 'open':
+                    found[port] = info.get('name') or self.service_name(port)
+        return found
+
+    def full_scan(self):
+        """Scan the whole configured range"""
+        start = time.perf_counter()
+        found = self.nmap_scan() if self.nmap else self.connect_scan(self.port_range())
+        self.last_full_scan = time.time()
+        self.stats['full_scans'] += 1
+        self.stats['last_full_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        SCAN_SECONDS.observe(time.perf_counter() - start, kind='full')
+        return self.update(found)
+
+    def quick_scan(self):
+        """Re-check known and watched ports only"""
+        start = time.perf_counter()
+        ports = sorted(set(self.open_ports) | set(self.WATCH_PORTS))
+        found = self.connect_scan(ports)
+        # Keep nmap's service names for ports that are still open
+        for port in found:
+            if port in self.open_ports:
+                found[port] = self.open_ports[port]
+        self.stats['quick_scans'] += 1
+        self.stats['last_quick_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        SCAN_SECONDS.observe(time.perf_counter() - start, kind='quick')
+        return self.update(found)
+
+    def update(self, found):
+        """Store a result and describe differences from the previous one"""
+        previous, self.open_ports = self.open_ports, found
+        if previous is None:
+            logger.info(f"Port scan baseline: {sorted(found)}")
+            return []
+
+        changes = []
+        for port in sorted(set(found) - set(previous)):
+            changes.append(f"new port {port} opened ({found[port]})")
+        for port in sorted(set(previous) - set(found)):
+            changes.append(f"port {port} closed ({previous[port]})")
+
+        now = time.time()
+        for change in changes:
+            self.changes.append((now, change))
+            logger.info(f"Port scan change: {change}")
+        self.stats['changes'] += len(changes)
+        return changes
+
+    def scan(self):
+        """Run a full scan when one is due, otherwise a quick check"""
+        if self.open_ports is None or time.time() - self.last_full_scan >= self.full_interval:
+            return self.full_scan()
+        return self.quick_scan()
+
+
+class LocationProvider:
+    """IP geolocation behind a persistent TTL cache
+
+    current() never touches the network. When the cached entry has expired
+    or the machine's network addresses have changed it returns the cached
+    value and refreshes in a background thread.
+    """
+
+    def __init__(self, cipher, cache_file=LOCATION_CACHE_FILE, ttl=86400, retry_after=300, lookup=None):
+        self.cipher = cipher
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.lookup = lookup or self.geocoder_lookup
+        self.lock = threading.Lock()
+        self.refreshing = False
+        self.last_failure = 0
+        self.stats = {'hits': 0, 'refreshes': 0, 'failures': 0}
+        self.entry = self.load_cache()
+
+    def load_cache(self):
+        """Read the cached entry, if any"""
+        if not os.path.exists(self.cache_file):
+            return None
+        try:
+            return next(self.cipher.iter_records(self.cache_file), None)
+        except Exception as e:
+            logger.error(f"Error loading location cache: {str(e)}")
+            return None
+
+    def save_cache(self):
+        """Persist the cached entry"""
+        try:
+            self.cipher.write_records(self.cache_file, [self.entry])
+        except Exception as e:
+            logger.error(f"Error saving location cache: {str(e)}")
+
+    def geocoder_lookup(self):
+        """Blocking IP lookup through geocoder"""
+        import geocoder
+        location = geocoder.ip('me')
+        if not location or not location.ok:
+            return None
+        return {'country': location.country, 'city': location.city}
+
+    def network_fingerprint(self):
+        """Hash of the addresses on active, non-loopback interfaces"""
+        import psutil
+        stats = psutil.net_if_stats()
+        addresses = []
+        for name, addrs in psutil.net_if_addrs().items():
+            if name in stats and not stats[name].isup:
+                continue
+            for addr in addrs:
+                if addr.family in (socket.AF_INET, socket.AF_INET6) and \
+                   not addr.address.startswith(('127.', '::1', 'fe80')):
+                    addresses.append(f"{name}={addr.address}")
+        return hashlib.sha1("|".join(sorted(addresses)).encode()).hexdigest()
+
+    def is_stale(self):
+        """Whether the cached entry is missing, expired or from another network"""
+        if not self.entry:
+            return True
+        if time.time() - self.entry.get('time', 0) >= self.ttl:
+            return True
+        return self.entry.get('fingerprint') != self.network_fingerprint()
+
+    def current(self):
+        """Cached location, or None if unknown; never blocks on the network"""
+        try:
+            stale = self.is_stale()
+        except Exception as e:
+            logger.error(f"Location staleness check failed: {str(e)}")
+            stale = False
+
+        with self.lock:
+            if stale and not self.refreshing and time.time() - self.last_failure >= self.retry_after:
+                self.refreshing = True
+                threading.Thread(target=self.refresh, daemon=True).start()
+            if self.entry:
+                self.stats['hits'] += 1
+                return self.entry.get('location')
+        return None
+
+    def refresh(self):
+        """Look up the location and update the cache"""
+        try:
+            location = self.lookup()
+            if location:
+                self.entry = {
+                    'location': location,
+                    'time': time.time(),
+                    'fingerprint': self.network_fingerprint()
+                }
+                self.stats['refreshes'] += 1
+                self.save_cache()
+            else:
+                self.last_failure = time.time()
+                self.stats['failures'] += 1
+        except Exception as e:
+            logger.warning(f"Location lookup failed: {str(e)}")
+            self.last_failure = time.time()
+            self.stats['failures'] += 1
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+
+class StaticLocationProvider:
+    """Fixed location with the LocationProvider read API, for tests and offline use"""
+
+    def __init__(self, location):
+        self.location = location
+
+    def current(self):
+        """Configured location"""
+        return self.location
+
+
+class HttpClient:
+    """Shared requests session with connection pooling and default timeouts"""
+
+    def __init__(self, timeout=(3.05, 10), pool_size=10, retries=2):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.retries = retries
+        self._session = None
+        self.lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled session, created on first use"""
+        if self._session is None:
+            with self.lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    from urllib3.util.retry import Retry
+
+                    retry = Retry(total=self.retries, backoff_factor=0.3,
+                                  status_forcelist=(429, 500, 502, 503, 504),
+                                  allowed_methods=('GET', 'HEAD'))
+                    adapter = HTTPAdapter(pool_connections=self.pool_size,
+                                          pool_maxsize=self.pool_size,
+                                          max_retries=retry)
+                    session = requests.Session()
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    session.headers['User-Agent'] = 'RakiAI'
+                    self._session = session
+        return self._session
+
+    def get(self, url, **kwargs):
+        """GET with the default timeout unless one is given"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+
+class ResponseCache:
+    """Encrypted on-disk cache of API responses with TTL and a size bound
+
+    Entries are keyed by URL plus normalized parameters. When the cache grows
+    past max_bytes the least recently used entries are evicted first.
+    """
+
+    def __init__(self, cipher, directory=WEB_CACHE_DIR, ttl=86400, max_bytes=20 * 1024 * 1024):
+        self.cipher = cipher
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+        self.last_used = 0
+
+        # key -> [size in bytes, last used]
+        self.index = {}
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith('.rak'):
+                stat = os.stat(os.path.join(directory, name))
+                self.index[name[:-4]] = [stat.st_size, stat.st_mtime]
+        self.total_bytes = sum(size for size, _ in self.index.values())
+
+    @staticmethod
+    def make_key(url, params):
+        """Stable key for a request; whitespace and case in values are ignored"""
+        normalized = sorted((str(k), " ".join(str(v).lower().split())) for k, v in params.items())
+        return hashlib.sha256(json.dumps([url, normalized]).encode()).hexdigest()
+
+    def path(self, key):
+        """Cache file for a key"""
+        return os.path.join(self.directory, f"{key}.rak")
+
+    def get(self, url, params):
+        """Cached body for the request, or None"""
+        key = self.make_key(url, params)
+        with self.lock:
+            if key not in self.index:
+                self.stats['misses'] += 1
+                return None
+
+            try:
+                entry = next(self.cipher.iter_records(self.path(key)))
+            except Exception as e:
+                logger.warning(f"Dropping unreadable cache entry: {str(e)}")
+                self.remove(key)
+                self.stats['misses'] += 1
+                return None
+
+            now = time.time()
+            if now - entry['time'] > self.ttl:
+                self.remove(key)
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self.index[key][1] = now
+            self.last_used = now
+            os.utime(self.path(key))
+            self.stats['hits'] += 1
+            return entry['body']
+
+    def put(self, url, params, body):
+        """Store a response body and evict if over budget"""
+        key = self.make_key(url, params)
+        with self.lock:
+            path = self.path(key)
+            self.cipher.write_records(path, [{'time': time.time(), 'url': url, 'body': body}])
+            size = os.path.getsize(path)
+            old_size = self.index.get(key, [0])[0]
+            self.index[key] = [size, time.time()]
+            self.last_used = time.time()
+            self.total_bytes += size - old_size
+            self.stats['stores'] += 1
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until under max_bytes"""
+        while self.total_bytes > self.max_bytes and len(self.index) > 1:
+            oldest = min(self.index, key=lambda k: self.index[k][1])
+            self.remove(oldest)
+            self.stats['evictions'] += 1
+
+    def entry_bytes(self):
+        """Index bytes per entry; every entry has the same shape"""
+        if not self.index:
+            return 0
+        key, value = next(iter(self.index.items()))
+        return deep_sizeof(key) + deep_sizeof(value) + sys.getsizeof(self.index) // len(self.index)
+
+    def memory_bytes(self):
+        """Bytes held by the in-memory index"""
+        with self.lock:
+            return len(self.index) * self.entry_bytes()
+
+    def release(self, nbytes):
+        """Evict least recently used entries whose index records hold about nbytes"""
+        with self.lock:
+            if not self.index:
+                return 0
+            per_entry = self.entry_bytes()
+            count = min(len(self.index), max(1, int(nbytes / per_entry)))
+            for key in heapq.nsmallest(count, self.index, key=lambda k: self.index[k][1]):
+                self.remove(key)
+                self.stats['evictions'] += 1
+            return int(count * per_entry)
+
+    def remove(self, key):
+        """Delete one entry"""
+        size, _ = self.index.pop(key, (0, 0))
+        self.total_bytes -= size
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def hit_rate(self):
+        """Fraction of lookups answered from the cache"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def clear(self):
+        """Remove every entry"""
+        with self.lock:
+            for key in list(self.index):
+                self.remove(key)
+
+
+class SearchClient:
+    """Custom Search API calls through the shared session and response cache"""
+
+    def __init__(self, http, cache, api_url, api_key, cse_id):
+        self.http = http
+        self.cache = cache
+        self.api_url = api_url
+        self.api_key = api_key
+        self.cse_id = cse_id
+
+    def available(self):
+        """Whether API credentials are configured"""
+        return bool(self.api_key and self.cse_id)
+
+    def search(self, query, **params):
+        """Return result items for a query, from cache when possible"""
+        params = {'cx': self.cse_id, 'q': " ".join(query.split()), **params}
+
+        # The API key is left out of the cache key
+        body = self.cache.get(self.api_url, params)
+        if body is None:
+            response = self.http.get(self.api_url, params={'key': self.api_key, **params})
+            response.raise_for_status()
+            body = response.json()
+            self.cache.put(self.api_url, params, body)
+        return body.get('items', [])
+
+
+class PageFetcher:
+    """Fetches result pages concurrently under a time budget
+
+    Each host gets a limited number of simultaneous connections, bodies are
+    streamed and cut off at max_bytes, and text is extracted in the worker
+    threads so only the page text is kept.
+    """
+
+    def __init__(self, http, max_workers=6, per_host=2, max_bytes=1500000, max_chars=20000):
+        from concurrent.futures import ThreadPoolExecutor
+        self.http = http
+        self.per_host = per_host
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fetch')
+        self.host_slots = {}
+        self.lock = threading.Lock()
+        self.stats = {'fetched': 0, 'failed': 0, 'truncated': 0, 'timed_out': 0, 'bytes': 0}
+        try:
+            import lxml
+            self.parser = 'lxml'
+        except ImportError:
+            self.parser = 'html.parser'
+
+    def count(self, stat, amount=1):
+        """Thread-safe stats increment"""
+        with self.lock:
+            self.stats[stat] += amount
+
+    def host_slot(self, url):
+        """Semaphore limiting connections to the URL's host"""
+        from urllib.parse import urlparse
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self.host_slots[host]
+
+    def download(self, url, deadline):
+        """Stream an HTML page, stopping at max_bytes or the deadline"""
+        slot = self.host_slot(url)
+        if not slot.acquire(timeout=max(0, deadline - time.monotonic())):
+            self.count('timed_out')
+            return None
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.count('timed_out')
+                return None
+
+            with self.http.get(url, stream=True, timeout=(min(3.05, remaining), remaining)) as response:
+                if response.status_code != 200 or 'html' not in response.headers.get('Content-Type', ''):
+                    self.count('failed')
+                    return None
+
+                chunks = []
+                size = 0
+                for chunk in response.iter_content(chunk_size=16384):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= self.max_bytes:
+                        self.count('truncated')
+                        break
+                    if time.monotonic() > deadline:
+                        self.count('timed_out')
+                        return None
+
+            self.count('bytes', size)
+            return b"".join(chunks)[:self.max_bytes]
+        finally:
+            slot.release()
+
+    def extract_text(self, html):
+        """Main readable text of a page, without navigation and scripts"""
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, self.parser)
+        for tag in soup(['script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form', 'svg']):
+            tag.decompose()
+
+        root = soup.find('article') or soup.find('main') or soup.body or soup
+        paragraphs = [p.get_text(" ", strip=True) for p in root.find_all(['p', 'li'])]
+        text = " ".join(p for p in paragraphs if len(p) > 40) or root.get_text(" ", strip=True)
+        return " ".join(text.split())[:self.max_chars]
+
+    def fetch_text(self, url, deadline):
+        """Download and extract one page"""
+        try:
+            html = self.download(url, deadline)
+            if html is None:
+                return None
+            text = self.extract_text(html)
+            self.count('fetched')
+            return text
+        except Exception as e:
+            logger.warning(f"Fetching {url} failed: {str(e)}")
+            self.count('failed')
+            return None
+
+    def fetch_all(self, urls, budget):
+        """Fetch pages concurrently; return [(url, text)] for those done in time"""
+        from concurrent.futures import wait
+        deadline = time.monotonic() + budget
+        futures = [(url, self.executor.submit(self.fetch_text, url, deadline)) for url in urls]
+        wait([future for _, future in futures], timeout=budget)
+
+        pages = []
+        for url, future in futures:
+            if future.done() and future.result():
+                pages.append((url, future.result()))
+        return pages
+
+
+class ImagePipeline:
+    """Prefetches search images and keeps downscaled copies on disk
+
+    Downloads are streamed with a byte cap, JPEGs are decoded at reduced
+    size through draft mode, and anything over max_pixels is rejected
+    before it is decoded.
+    """
+
+    def __init__(self, http, directory=IMAGE_CACHE_DIR, size=(1280, 1280), max_bytes=15 * 1024 * 1024,
+                 max_pixels=60000000, max_files=200, workers=4):
+        from concurrent.futures import ThreadPoolExecutor
+        self.http = http
+        self.directory = directory
+        self.size = size
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.max_files = max_files
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image')
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'downloads': 0, 'rejected': 0, 'failed': 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, url):
+        """Cache file for an image URL"""
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + ".jpg")
+
+    def download(self, url):
+        """Stream the image body, refusing anything over max_bytes"""
+        with self.http.get(url, stream=True) as response:
+            response.raise_for_status()
+            declared = int(response.headers.get('Content-Length') or 0)
+            if declared > self.max_bytes:
+                raise ValueError(f"Image too large: {declared} bytes")
+            data = bytearray()
+            for chunk in response.iter_content(chunk_size=65536):
+                data += chunk
+                if len(data) > self.max_bytes:
+                    raise ValueError(f"Image exceeds {self.max_bytes} bytes")
+        return bytes(data)
+
+    def decode(self, data):
+        """Decode at roughly display size"""
+        from PIL import Image
+        img = Image.open(io.BytesIO(data))
+        if img.width * img.height > self.max_pixels:
+            raise ValueError(f"Image has too many pixels: {img.width}x{img.height}")
+        
+        # JPEG can be decoded at 1/2, 1/4 or 1/8 scale directly; ask for the
+        # aspect-correct target so draft can pick the smallest usable scale
+        scale = min(1.0, self.size[0] / img.width, self.size[1] / img.height)
+        img.draft('RGB', (int(img.width * scale), int(img.height * scale)))
+        img.thumbnail(self.size, reducing_gap=2.0)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        return img
+
+    def fetch(self, url):
+        """Download, downscale and cache one image; returns the cache path"""
+        path = self.path(url)
+        if os.path.exists(path):
+            os.utime(path)
+            self.stats['hits'] += 1
+            return path
+        try:
+            img = self.decode(self.download(url))
+            tmp_path = f"{path}.tmp"
+            img.save(tmp_path, 'JPEG', quality=85)
+            os.replace(tmp_path, path)
+            self.stats['downloads'] += 1
+            self.evict()
+            return path
+        except ValueError as e:
+            logger.warning(f"Image rejected {url}: {str(e)}")
+            self.stats['rejected'] += 1
+        except Exception as e:
+            logger.warning(f"Image fetch failed {url}: {str(e)}")
+            self.stats['failed'] += 1
+        return None
+
+    def prefetch(self, urls):
+        """Start fetching images in the background"""
+        with self.lock:
+            # Finished prefetches are on disk now; don't keep their futures forever
+            for url in [url for url, future in self.pending.items() if future.done()]:
+                del self.pending[url]
+            for url in urls:
+                if url not in self.pending:
+                    self.pending[url] = self.executor.submit(self.fetch, url)
+
+    def get(self, url, timeout=15):
+        """Cache path for an image, waiting for a prefetch if one is running"""
+        with self.lock:
+            # One lock hold: a concurrent prefetch() prunes finished futures
+            future = self.pending.get(url)
+            if future is None:
+                future = self.pending[url] = self.executor.submit(self.fetch, url)
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Image not ready {url}: {str(e)}")
+            return None
+        finally:
+            with self.lock:
+                if future.done() and self.pending.get(url) is future:
+                    del self.pending[url]
+
+    def evict(self):
+        """Keep at most max_files thumbnails, dropping the least recently used"""
+        files = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.jpg')]
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=os.path.getmtime)
+        for f in files[:len(files) - self.max_files]:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+
+
+class BoundedOutput:
+    """Keeps the first and last lines of command output, counting the rest"""
+
+    def __init__(self, head_lines=20, tail_lines=40, max_line=1000):
+        self.head_lines = head_lines
+        self.max_line = max_line
+        self.head = []
+        self.tail = collections.deque(maxlen=tail_lines)
+        self.total = 0
+
+    def add(self, line):
+        """Record one line"""
+        line = line[:self.max_line]
+        self.total += 1
+        if len(self.head) < self.head_lines:
+            self.head.append(line)
+        else:
+            self.tail.append(line)
+
+    def last_lines(self, count):
+        """The final `count` lines seen"""
+        lines = self.head + list(self.tail)
+        return lines[-count:]
+
+    def text(self):
+        """Head and tail joined, with a marker for what was dropped"""
+        omitted = self.total - len(self.head) - len(self.tail)
+        lines = list(self.head)
+        if omitted:
+            lines.append(f"... [{omitted} lines omitted] ...")
+        lines.extend(self.tail)
+        return "\n".join(lines)
+
+
+class CommandRunner:
+    """Runs allowlisted commands with streamed, bounded output
+
+    Commands are split into argv lists (only `&&` chaining is supported)
+    and each program is checked against the allowlist before anything runs.
+    No shell is involved. Output is read as it arrives, lines matching
+    PROGRESS_PATTERN can be reported through on_progress at most once per
+    progress_interval seconds, and cancel() stops a running command from
+    another thread.
+    """
+
+    PROGRESS_PATTERN = re.compile(r'^(Unpacking|Setting up|Preparing to unpack|Get:\d+|Fetched|Reading package lists|Building dependency tree)\b')
+
+    def __init__(self, allowed, timeout=1800, head_lines=20, tail_lines=40,
+                 on_progress=None, progress_interval=15):
+        self.allowed = allowed
+        self.timeout = timeout
+        self.head_lines = head_lines
+        self.tail_lines = tail_lines
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self.loop = None
+        self.task = None
+        self.last_progress = 0
+
+    def parse(self, command):
+        """Split a command line into argv lists, enforcing the allowlist"""
+        import shlex
+        lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+
+        segments = [[]]
+        for token in lexer:
+            if token == '&&':
+                segments.append([])
+            elif set(token) <= set('();<>|&'):
+                raise PermissionError(f"Unsupported shell operator: {token}")
+            else:
+                segments[-1].append(token)
+
+        for argv in segments:
+            if not argv:
+                raise ValueError("Empty command")
+            if any(c in arg for arg in argv for c in '`$'):
+                raise PermissionError("Shell substitution is not allowed")
+            program = self.program(argv)
+            if program not in self.allowed:
+                raise PermissionError(f"Command not allowed: {program}")
+        return segments
+
+    @staticmethod
+    def program(argv):
+        """Name of the program an argv runs, looking through sudo"""
+        args = list(argv)
+        if os.path.basename(args[0]) == 'sudo' and len(args) > 1:
+            if args[1].startswith('-'):
+                # Options like -u take arguments and change who runs what; only plain sudo is allowed
+                raise PermissionError(f"sudo options are not allowed: {args[1]}")
+            args = args[1:]
+        return os.path.basename(args[0])
+
+    def report_progress(self, line):
+        """Pass milestone lines to on_progress, rate limited"""
+        if not self.on_progress or not self.PROGRESS_PATTERN.match(line):
+            return
+        now = time.monotonic()
+        if now - self.last_progress >= self.progress_interval:
+            self.last_progress = now
+            try:
+                self.on_progress(line)
+            except Exception as e:
+                logger.error(f"Progress callback error: {str(e)}")
+
+    async def pump(self, stream, output):
+        """Read a process's output in chunks, splitting lines on \\n and \\r"""
+        pending = b""
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                break
+            pending += chunk
+            lines = re.split(rb'[\r\n]', pending)
+            pending = lines.pop()[-4096:]
+            for raw in lines:
+                line = raw.decode('utf-8', errors='replace').strip()
+                if line:
+                    output.add(line)
+                    self.report_progress(line)
+        if pending.strip():
+            output.add(pending.decode('utf-8', errors='replace').strip())
+
+    async def run_async(self, command):
+        """Run a command; returns a dict describing how it ended"""
+        import asyncio
+        segments = self.parse(command)
+        output = BoundedOutput(self.head_lines, self.tail_lines)
+        start = time.monotonic()
+        deadline = start + self.timeout
+        status = 'ok'
+        returncode = 0
+
+        for argv in segments:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *argv,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT
+                )
+            except OSError as e:
+                output.add(str(e))
+                status, returncode = 'error', None
+                break
+
+            try:
+                await asyncio.wait_for(self.pump(proc.stdout, output),
+                                       timeout=max(0, deadline - time.monotonic()))
+                returncode = await proc.wait()
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                proc.kill()
+                await proc.wait()
+                status = 'timeout' if isinstance(e, asyncio.TimeoutError) else 'cancelled'
+                returncode = None
+                break
+
+            if returncode != 0:
+                status = 'error'
+                break
+
+        return {
+            'status': status,
+            'returncode': returncode,
+            'output': output.text(),
+            'summary': " ".join(output.last_lines(3)),
+            'lines': output.total,
+            'duration': time.monotonic() - start
+        }
+
+    def run(self, command):
+        """Blocking wrapper around run_async"""
+        import asyncio
+        loop = asyncio.new_event_loop()
+        try:
+            self.task = loop.create_task(self.run_async(command))
+            self.loop = loop
+            return loop.run_until_complete(self.task)
+        finally:
+            self.loop = None
+            self.task = None
+            loop.close()
+
+    def cancel(self):
+        """Stop the running command, if any; safe to call from any thread"""
+        loop, task = self.loop, self.task
+        if loop and task:
+            loop.call_soon_threadsafe(task.cancel)
+            return True
+        return False
+
+
+class PackageManager:
+    """Batches package installs into single apt transactions
+
+    Install requests arriving within batch_window seconds of each other are
+    installed together, so dpkg's lock is taken and dependencies resolved
+    once. Names are checked against a cached package index first, and
+    `apt update` is skipped while apt's lists are fresh. Installs and
+    updates run one at a time on a worker thread, through runner when one
+    is given so its allowlist applies and cancel() can stop them.
+    """
+
+    NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9+.\-]+$')
+
+    def __init__(self, apt='apt', apt_cache='apt-cache', sudo=True, batch_window=3,
+                 index_file=PACKAGE_INDEX_FILE, index_max_age=6 * 3600, lists_dir='/var/lib/apt/lists',
+                 update_stamp=APT_UPDATE_STAMP, on_result=None, on_update=None, runner=None):
+        self.apt = apt
+        self.apt_cache = apt_cache
+        self.sudo = sudo
+        self.batch_window = batch_window
+        self.index_file = index_file
+        self.index_max_age = index_max_age
+        self.lists_dir = lists_dir
+        self.update_stamp = update_stamp
+        self.on_result = on_result
+        self.on_update = on_update
+        self.runner = runner or CommandRunner({os.path.basename(apt), os.path.basename(apt_cache)})
+        self.index = None
+        self.index_bytes = 0
+        self.index_used = 0
+        self.queue = []
+        self.update_requested = False
+        self.index_requested = False
+        self.condition = threading.Condition()
+        self.worker = None
+        self.stats = {'requested': 0, 'transactions': 0, 'updates': 0, 'updates_skipped': 0}
+
+    def command(self, *args):
+        """Build an apt command line, with sudo when configured"""
+        import shlex
+        parts = (['sudo'] if self.sudo else []) + [self.apt] + list(args)
+        return " ".join(shlex.quote(p) for p in parts)
+
+    def load_index(self, build=True):
+        """Package names from the cache file, building it if missing unless build is False"""
+        if self.index is None:
+            if os.path.exists(self.index_file):
+                with open(self.index_file) as f:
+                    self.index = set(f.read().split())
+                self.index_bytes = deep_sizeof(self.index)
+            elif build:
+                self.refresh_index()
+            else:
+                return None
+        self.index_used = time.time()
+        return self.index
+
+    def refresh_index(self):
+        """Rebuild the cached index from apt-cache"""
+        try:
+            result = subprocess.run([self.apt_cache, 'pkgnames'], capture_output=True,
+                                    text=True, timeout=120, check=True)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Package index unavailable: {str(e)}")
+            self.index = self.index or set()
+            return
+        self.index = set(result.stdout.split())
+        self.index_bytes = deep_sizeof(self.index)
+        with open(self.index_file, 'w') as f:
+            f.write("\n".join(sorted(self.index)))
+
+    def memory_bytes(self):
+        """Bytes held by the in-memory package index"""
+        return self.index_bytes if self.index is not None else 0
+
+    def release(self, nbytes):
+        """Drop the in-memory index; it is read back from the cache file when next needed"""
+        if self.index is None or not os.path.exists(self.index_file):
+            return 0
+        freed, self.index, self.index_bytes = self.index_bytes, None, 0
+        return freed
+
+    def index_is_fresh(self):
+        """Whether apt's lists were updated within index_max_age"""
+        # Not index_file: check() rebuilds it from whatever lists apt already has
+        stamps = [os.path.getmtime(p) for p in (self.lists_dir, self.update_stamp) if os.path.exists(p)]
+        return bool(stamps) and time.time() - max(stamps) < self.index_max_age
+
+    def check(self, name):
+        """Return (valid, suggestions) for a package name"""
+        import difflib
+        if not self.NAME_PATTERN.match(name):
+            return False, []
+        index = self.load_index(build=False)
+        if index is None:
+            self.request_index()
+        if not index or name in index:
+            # Without an index there is nothing to check against
+            return True, []
+        nearby = [n for n in index if n[:1] == name[:1] and abs(len(n) - len(name)) <= 3]
+        return False, difflib.get_close_matches(name, nearby, n=3, cutoff=0.75)
+
+    def install(self, names):
+        """Queue packages for the next transaction"""
+        with self.condition:
+            for name in names:
+                if name not in self.queue:
+                    self.queue.append(name)
+            self.stats['requested'] += len(names)
+            self.wake_worker()
+
+    def request_update(self):
+        """Queue an update and upgrade; on_update gets the result"""
+        with self.condition:
+            self.update_requested = True
+            self.wake_worker()
+
+    def request_index(self):
+        """Build the index on the worker if there is no cache file yet"""
+        if self.index is not None or os.path.exists(self.index_file):
+            return
+        with self.condition:
+            self.index_requested = True
+            self.wake_worker()
+
+    def wake_worker(self):
+        """Start the worker if needed and signal it; call with the condition held"""
+        if not self.worker:
+            self.worker = threading.Thread(target=self.run_queue, daemon=True)
+            self.worker.start()
+        self.condition.notify()
+
+    def cancel(self):
+        """Drop queued work and stop the running apt command; True if there was any"""
+        with self.condition:
+            queued = bool(self.queue) or self.update_requested
+            self.queue, self.update_requested = [], False
+        return self.runner.cancel() or queued
+
+    def run_queue(self):
+        """Worker: build a missing index, wait for a quiet window, install everything queued, then update"""
+        while True:
+            with self.condition:
+                while not self.queue and not self.update_requested and not self.index_requested:
+                    self.condition.wait()
+                build, self.index_requested = self.index_requested, False
+            
+            if build:
+                # apt-cache pkgnames can take a while; installs queued meanwhile wait for it
+                self.load_index()
+            
+            with self.condition:
+                # Keep collecting until no new request arrives for batch_window
+                while self.queue:
+                    size = len(self.queue)
+                    self.condition.wait(timeout=self.batch_window)
+                    if len(self.queue) == size:
+                        break
+                batch, self.queue = self.queue, []
+                update, self.update_requested = self.update_requested, False
+            
+            if batch:
+                self.notify(self.on_result, batch, self.run_transaction(batch))
+            if update:
+                self.notify(self.on_update, self.update())
+
+    def notify(self, callback, *args):
+        """Pass a result to a callback, logging its errors"""
+        if callback:
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"Package result callback error: {str(e)}")
+
+    def run(self, command):
+        """Run an apt command line; an allowlist refusal comes back as a 'refused' result"""
+        try:
+            return self.runner.run(command)
+        except (PermissionError, ValueError) as e:
+            logger.warning(f"Refused command {command!r}: {str(e)}")
+            return {'status': 'refused', 'returncode': None, 'output': "", 'summary': str(e),
+                    'lines': 0, 'duration': 0}
+
+    def run_transaction(self, names):
+        """Install a batch of packages in one apt call"""
+        self.stats['transactions'] += 1
+        logger.info(f"Installing packages: {' '.join(names)}")
+        return self.run(self.command('install', '-y', *names))
+
+    def update(self):
+        """Refresh lists unless fresh, then upgrade; returns the runner result"""
+        if self.index_is_fresh():
+            self.stats['updates_skipped'] += 1
+        else:
+            result = self.run(self.command('update'))
+            if result['status'] != 'ok':
+                return result
+            self.stats['updates'] += 1
+            with open(self.update_stamp, 'w') as f:
+                f.write(str(time.time()))
+            self.refresh_index()
+        return self.run(self.command('upgrade', '-y'))
+
+
+class EmailOutbox:
+    """Persistent encrypted email queue with a background sender
+
+    Messages are saved before send_email returns, so they survive restarts.
+    The sender keeps one authenticated SMTP connection open for bursts and
+    retries failed messages with exponential backoff.
+    """
+
+    def __init__(self, cipher, host, port, username='', password='', use_ssl=True, starttls=False,
+                 path=OUTBOX_FILE, max_attempts=6, backoff=30, max_backoff=3600, idle_timeout=30,
+                 timeout=20, on_status=None):
+        self.cipher = cipher
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.on_status = on_status
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.connection = None
+        self.last_used = 0
+        self.stats = {'sent': 0, 'failed': 0, 'retries': 0, 'connections': 0}
+        self.messages = self.load()
+
+    def load(self):
+        """Read queued messages left from a previous run"""
+        if not os.path.exists(self.path):
+            return []
+        try:
+            return list(self.cipher.iter_records(self.path))
+        except Exception as e:
+            logger.error(f"Error loading outbox: {str(e)}")
+            return []
+
+    def save(self):
+        """Persist the queue; call with the condition held"""
+        self.cipher.write_records(self.path, self.messages)
+
+    def enqueue(self, to_email, subject, body, sender):
+        """Queue a message for delivery"""
+        message = {
+            'id': hashlib.sha1(os.urandom(16)).hexdigest()[:12],
+            'to': to_email,
+            'from': sender,
+            'subject': subject,
+            'body': body,
+            'attempts': 0,
+            'next_attempt': 0,
+            'created': time.time()
+        }
+        with self.condition:
+            self.messages.append(message)
+            self.save()
+            self.condition.notify()
+        return message['id']
+
+    def pending(self):
+        """Number of messages waiting to be delivered"""
+        with self.condition:
+            return len(self.messages)
+
+    def connect(self):
+        """Open and authenticate an SMTP connection"""
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                smtp.starttls()
+        if self.password:
+            smtp.login(self.username, self.password)
+        self.stats['connections'] += 1
+        return smtp
+
+    def get_connection(self):
+        """Reuse the open connection if it still answers, otherwise reconnect"""
+        if self.connection:
+            try:
+                if self.connection.noop()[0] == 250:
+                    return self.connection
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self.close()
+        self.connection = self.connect()
+        return self.connection
+
+    def close(self):
+        """Close the SMTP connection"""
+        if self.connection:
+            try:
+                self.connection.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
+
+    def build(self, message):
+        """EmailMessage for a queued record"""
+        msg = EmailMessage()
+        msg['Subject'] = message['subject']
+        msg['From'] = message['from']
+        msg['To'] = message['to']
+        msg.set_content(message['body'])
+        return msg
+
+    def deliver(self, due):
+        """Send due messages over one connection; returns (sent, failed)"""
+        sent, failed = [], []
+        for message in due:
+            try:
+                self.get_connection().send_message(self.build(message))
+                self.last_used = time.time()
+                sent.append(message)
+            except Exception as e:
+                logger.warning(f"Email to {message['to']} failed: {str(e)}")
+                self.close()
+                failed.append(message)
+        return sent, failed
+
+    def notify_status(self, message, status):
+        """Report delivery status to the caller"""
+        if self.on_status:
+            try:
+                self.on_status(message, status)
+            except Exception as e:
+                logger.error(f"Outbox status callback error: {str(e)}")
+
+    def run(self):
+        """Sender loop"""
+        while not self.stop_event.is_set():
+            with self.condition:
+                now = time.time()
+                due = [m for m in self.messages if m['next_attempt'] <= now]
+                if not due:
+                    waits = [m['next_attempt'] - now for m in self.messages]
+                    if self.connection:
+                        waits.append(self.last_used + self.idle_timeout - now)
+                    self.condition.wait(timeout=max(0.05, min(waits)) if waits else None)
+                    if self.connection and time.time() - self.last_used >= self.idle_timeout:
+                        self.close()
+                    continue
+
+            sent, failed = self.deliver(due)
+
+            with self.condition:
+                for message in sent:
+                    self.messages.remove(message)
+                    self.stats['sent'] += 1
+                for message in failed:
+                    message['attempts'] += 1
+                    if message['attempts'] >= self.max_attempts:
+                        self.messages.remove(message)
+                        self.stats['failed'] += 1
+                    else:
+                        delay = min(self.max_backoff, self.backoff * 2 ** (message['attempts'] - 1))
+                        message['next_attempt'] = time.time() + delay * random.uniform(0.8, 1.2)
+                        self.stats['retries'] += 1
+                self.save()
+
+            for message in sent:
+                self.notify_status(message, 'sent')
+            for message in failed:
+                if message['attempts'] >= self.max_attempts:
+                    self.notify_status(message, 'failed')
+        self.close()
+
+    def start(self):
+        """Start the sender thread"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the sender thread"""
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify()
+
+
+def summarize_pages(pages, query, max_sentences=8):
+    """Extractive summary: the sentences most related to the query and each other"""
+    stopwords = {'that', 'this', 'with', 'from', 'have', 'were', 'which', 'their',
+                 'there', 'about', 'would', 'these', 'other', 'into', 'more', 'also'}
+    query_words = {w for w in re.findall(r'\w+', query.lower()) if len(w) > 2}
+
+    candidates = []
+    frequency = collections.Counter()
+    for page_index, (_, text) in enumerate(pages):
+        for position, sentence in enumerate(re.split(r'(?<=[.!?።])\s+', text)):
+            words = [w for w in re.findall(r'\w+', sentence.lower()) if len(w) > 3 and w not in stopwords]
+            if 8 <= len(sentence.split()) <= 60:
+                candidates.append((page_index, position, sentence, words))
+                frequency.update(set(words))
+
+    scored = []
+    seen = set()
+    for page_index, position, sentence, words in candidates:
+        if not words or sentence in seen:
+            continue
+        seen.add(sentence)
+        score = sum(frequency[w] for w in words) / len(words) ** 0.5
+        score += 3 * len(query_words.intersection(words))
+        scored.append((score, page_index, position, sentence))
+
+    best = sorted(scored, reverse=True)[:max_sentences]
+    return " ".join(sentence for _, _, _, sentence in sorted(best, key=lambda s: (s[1], s[2])))
+
+
+def static_phrases():
+    """(text, lang) for every fixed phrase Raki speaks"""
+    phrases = [(text, lang) for lang, texts in OPENINGS.items() for text in texts]
+    phrases += [(text, lang) for lang, text in HELP_MESSAGES.items()]
+    phrases += [(text, 'am') for text in ETHIOPIAN_JOKES + ETHIOPIAN_PROVERBS + CULTURAL_ADDONS]
+    phrases += [(text, 'en') for text in ENGLISH_JOKES]
+    for lang, replies in CANNED_REPLIES.items():
+        for reply in replies.values():
+            phrases += [(text, lang) for text in ([reply] if isinstance(reply, str) else reply)]
+    return phrases
+
+
+def describe_duration(seconds):
+    """Turn a number of seconds into speakable text"""
+    if seconds >= 3600:
+        hours = int(seconds // 3600)
+        return f"{hours} hour{'s' if hours != 1 else ''}"
+    if seconds >= 60:
+        minutes = int(seconds // 60)
+        return f"{minutes} minute{'s' if minutes != 1 else ''}"
+    return f"{int(seconds)} seconds"
+
 
 class RakiAI:
     def __init__(self):
-        self.config = self.load_config()
-        self.cipher = self.init_encryption()
-        self.reminders = self.load_reminders()
-        self.conversation_history = self.load_conversation_history()
+        self.startup_timings = {'import': MODULE_IMPORT_TIME}
+        self.startup_error = None
+        self.ready = threading.Event()
+        self.config = self.timed_stage('config', self.load_config)
+        tracer.enabled = tracer.enabled or self.config['tracing']
+        self.cipher = None
+        self.state = StateStore()
+        self.saved_versions = {}
+        self.save_locks = {REMINDERS_FILE: threading.Lock(), HISTORY_FILE: threading.Lock()}
         self.incognito_mode = False
         self.current_language = self.config['default_language']
         self.shutdown_flag = False
+        self.stt = None
+        self.metrics = None
+        self.diagnostics = None
+        self.alerts = None
+        self.scheduler = Scheduler(workers=self.config['scheduler_workers'],
+                                   queue_size=self.config['scheduler_queue'])
+        self.last_full_checks = 0
+        self.memory = MemoryAccountant(budget=int(self.config['memory_budget_mb'] * 1024 * 1024),
+                                       policy=self.config['memory_eviction'])
+        self.scanner = None
+        self.location = None
+        self.http = HttpClient()
+        self.search = None
+        self.fetcher = None
+        self.images = None
+        self.image_results = []
+        self.image_index = 0
+        self.outbox = None
+        self.threads = {}
+        self.metrics_server = None
+        self.barge_in = None
         
-        # Initialize voice system
-        self.tts = HumanizedTTS(self.config)
-        self.stt = self.init_stt()
+        # Initialize speech output first so the greeting isn't held up
+        self.tts = self.timed_stage('tts', HumanizedTTS, self.config)
+        if self.config['phrase_pack']:
+            pack = PhrasePack(self.config['phrase_pack_file'])
+            self.tts.player.phrases = self.timed_stage('phrase_pack', pack.open)
+        self.commands = CommandRunner(
+            self.config['allowed_commands'],
+            timeout=self.config['command_timeout'],
+            on_progress=self.speak_command_progress if self.config['speak_command_progress'] else None,
+            progress_interval=self.config['command_progress_interval']
+        )
+        self.packages = PackageManager(
+            apt=self.config['apt_command'],
+            apt_cache=self.config['apt_cache_command'],
+            sudo=self.config['apt_use_sudo'],
+            batch_window=self.config['install_batch_window'],
+            index_max_age=self.config['apt_index_max_age'],
+            on_result=self.report_install,
+            on_update=self.report_update,
+            runner=self.commands  # Package commands are held to allowed_commands
+        )
         
         # Ethiopian cultural context
-        self.ethiopian_jokes = [
-            "ለምን ኮምፒውተር በኢትዮጵያ ውስጥ በጣም ያለመሳት ነው? ምክንያቱም ሁል ጊዜ 'ኢትዮጵያ ትርፍ!' ይላል!",
-            "ሁለት ኮምፒውተሮች በአዲስ አበባ ውስጥ ይገናኛሉ። አንደኛው ሌላኛውን ይለውጣል። 'አዎ እርግጥ ነው ነገር ግን ከኔ ጋር የምትነጋገረው በአማርኛ ነው?'",
-            "ለምን ኢትዮጵያዊው ኮምፒውተር በሳምንት ሁለት ጊዜ ይጠፋል? ምክንያቱም ትሩን ያጠፋል!"
-        ]
+        self.ethiopian_jokes = list(ETHIOPIAN_JOKES)
+        self.ethiopian_proverbs = list(ETHIOPIAN_PROVERBS)
         
-        self.ethiopian_proverbs = [
-            "በብርሃን የተገነባ ቤት በጨለማ አይጠፋም።",
-            "አንድ እጅ ሁለት እጅን ያጠባል።",
-            "ውሀ እስካልገባበት ድረስ ጥጃ አይታወቅም።"
-        ]
+        # Decrypt state, load STT and warm optional clients in the background
+        threading.Thread(target=self.warm_up, daemon=True).start()
+
+    def timed_stage(self, name, func, *args):
+        """Run one startup stage and record how long it took"""
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.startup_timings[name] = elapsed
+            logger.info(f"Startup stage {name}: {elapsed * 1000:.1f} ms")
+
+    def warm_up(self):
+        """Load everything the greeting doesn't need"""
+        try:
+            self.cipher = self.timed_stage('encryption', self.init_encryption)
+            reminders = self.timed_stage('reminders', self.load_reminders)
+            history = self.timed_stage('history', self.load_conversation_history)
+            self.state.update('reminders', lambda items: reminders, notify=False)
+            self.state.update('conversation_history', lambda items: history[-20:], notify=False)
+            self.state.subscribe('reminders', lambda name, items: self.schedule_save(name, self.save_reminders))
+            self.state.subscribe('reminders', lambda name, items: self.schedule_next_reminder())
+            self.state.subscribe('conversation_history',
+                                 lambda name, items: self.schedule_save(name, self.save_conversation_history))
+            self.metrics = self.timed_stage('metrics', self.init_metrics)
+            self.diagnostics = self.timed_stage('diagnostics', self.init_diagnostics)
+            self.alerts = self.timed_stage('alerts', self.init_alerts)
+            self.search = self.timed_stage('search', self.init_search)
+            self.fetcher = self.timed_stage('fetcher', self.init_fetcher)
+            self.images = self.timed_stage('images', self.init_images)
+            self.outbox = self.timed_stage('outbox', self.init_outbox)
+            self.stt = self.timed_stage('stt', self.init_stt)
+        except Exception as e:
+            logger.error(f"Startup error: {str(e)}")
+            self.startup_error = e
+            return
+        finally:
+            self.ready.set()
         
-        # Start background services
-        threading.Thread(target=self.check_reminders, daemon=True).start()
-        threading.Thread(target=self.monitor_system, daemon=True).start()
-        threading.Thread(target=self.deep_background_scan, daemon=True).start()
+        # Start background services; periodic work shares the scheduler
+        self.scheduler.start()
+        self.outbox.start()
+        self.threads.update(self.scheduler.threads)
+        self.threads['outbox'] = self.outbox.thread
+        self.threads['speech'] = self.tts.player.thread
+        self.scheduler.every('metrics', self.metrics.interval, self.metrics.sample_once, jitter=0)
+        if isinstance(self.stt, STTWorker):
+            self.scheduler.every('stt_worker', 1, self.stt.supervise, jitter=0)
+        self.tts.prepare_fallbacks()
+        if self.providers():
+            self.scheduler.every('providers', self.config['provider_probe_interval'], self.probe_providers)
+        self.schedule_next_reminder()
+        self.init_observability()
+        self.init_memory()
+        
+        # Pay the remaining import costs before the first command needs them
+        self.timed_stage('web_clients', self.warm_web_clients)
+        self.scanner = self.timed_stage('scanner', self.init_scanner)
+        self.location = self.timed_stage('location', self.init_location)
+        self.barge_in = self.timed_stage('barge_in', self.init_barge_in)
+        if self.tts.player.phrases is not None:
+            # Render whatever the pack lacks for the current engine and voices
+            self.tts.update_phrase_pack(self.tts.player.phrases, static_phrases())
+        self.scheduler.every('security_scan', self.config['scan_quick_interval'], self.security_scan, delay=0)
+        self.packages.request_index()
+
+    def shutdown(self):
+        """Stop background services; returns how long it took in seconds"""
+        start = time.perf_counter()
+        self.shutdown_flag = True
+        self.scheduler.stop()
+        if self.ready.is_set() and not self.startup_error:
+            # Flush state whose deferred save was still pending
+            self.persist('reminders', REMINDERS_FILE, wait=True)
+            self.persist('conversation_history', HISTORY_FILE, wait=True)
+        for service in (self.outbox, self.barge_in, self.metrics_server):
+            if service:
+                service.stop()
+        if isinstance(self.stt, STTWorker):
+            self.stt.stop()
+        self.tts.player.shutdown()
+        elapsed = time.perf_counter() - start
+        logger.info(f"Shutdown took {elapsed * 1000:.1f} ms")
+        return elapsed
+
+    def init_observability(self):
+        """Register callback gauges and start the optional metrics endpoint"""
+        registry.gauge('raki_queue_depth', 'Items waiting in internal queues', ('queue',)).set_function(
+            lambda: {
+                ('scheduler',): self.scheduler.work.qsize(),
+                ('outbox',): self.outbox.pending(),
+                ('packages',): len(self.packages.queue),
+                ('speech',): len(self.tts.player.queue)
+            })
+        registry.gauge('raki_thread_alive', '1 while a background service thread is running', ('thread',)).set_function(
+            lambda: {(name,): int(thread.is_alive()) for name, thread in self.threads.items() if thread})
+        registry.gauge('raki_cache_hits', 'Cache hits since start', ('cache',)).set_function(
+            lambda: {
+                ('web',): self.search.cache.stats['hits'],
+                ('image',): self.images.stats['hits']
+            })
+        registry.gauge('raki_memory_bytes', 'Bytes held by each accounted cache or buffer', ('owner',)).set_function(
+            lambda: {(name,): size for name, size in self.memory.sizes().items()})
+        registry.gauge('raki_provider_open', '1 while a speech provider is out of rotation', ('kind', 'provider')).set_function(
+            lambda: {(pool.kind, name): int(breaker.state == 'open')
+                     for pool in self.providers() for name, breaker in pool.breakers.items()})
+        registry.gauge('raki_startup_seconds', 'Startup stage durations', ('stage',)).set_function(
+            lambda: {(stage,): seconds for stage, seconds in self.startup_timings.items()})
+
+        if self.config['metrics_port']:
+            try:
+                self.metrics_server = MetricsServer(
+                    registry, self.config['metrics_host'], self.config['metrics_port']).start()
+            except OSError as e:
+                logger.error(f"Metrics endpoint unavailable: {str(e)}")
+
+    def providers(self):
+        """Provider pools running in this process"""
+        return [pool for pool in (self.stt, self.tts.engine) if isinstance(pool, ProviderPool)]
+
+    def probe_providers(self):
+        """Check whether failed speech providers have recovered"""
+        for pool in self.providers():
+            pool.probe()
+
+    def warm_web_clients(self):
+        """Import the HTTP, HTML and imaging libraries ahead of first use"""
+        try:
+            self.http.session  # Builds the pooled session
+            import bs4
+            import geocoder
+            from PIL import Image
+        except ImportError as e:
+            logger.warning(f"Web client warm-up skipped: {str(e)}")
+
+    def init_scanner(self):
+        """Create the port scan service used by security_scan"""
+        return PortScanService(
+            host=self.config['scan_host'],
+            ports=self.config['scan_ports'],
+            timeout=self.config['scan_timeout'],
+            full_interval=self.config['scan_full_interval']
+        )
+
+    def init_memory(self):
+        """Put caches and buffers under the memory budget and check it periodically"""
+        memory = self.memory
+        cache = self.search.cache
+        phrases = self.tts.player.phrases
+        memory.register('state', self.state.memory_bytes)
+        memory.register('metrics', self.metrics.memory_bytes)
+        memory.register('trace', tracer.memory_bytes, tracer.release)
+        memory.register('web_cache', cache.memory_bytes, cache.release, lambda: cache.last_used)
+        memory.register('packages', self.packages.memory_bytes, self.packages.release,
+                        lambda: self.packages.index_used)
+        if phrases is not None:
+            memory.register('phrase_pack', phrases.memory_bytes, phrases.release, lambda: phrases.last_used)
+        if isinstance(self.stt, STTWorker):
+            memory.register('stt_ring', lambda: self.stt.ring.capacity * 2)
+        if self.config['memory_tracing']:
+            import tracemalloc
+            tracemalloc.start(self.config['memory_trace_frames'])
+        self.scheduler.every('memory', self.config['memory_check_interval'], memory.check)
+
+    def init_barge_in(self):
+        """Start the microphone monitor that lets the user interrupt playback"""
+        if not self.config['barge_in']:
+            return None
+        detector = SpeechOnsetDetector(
+            min_rms=self.config['barge_in_min_rms'],
+            ratio=self.config['barge_in_ratio'],
+            frames=self.config['barge_in_frames']
+        )
+        try:
+            # The STT worker owns the microphone; read its shared ring instead
+            audio = self.stt.ring if isinstance(self.stt, STTWorker) else None
+            monitor = BargeInMonitor(self.tts.player, detector, audio).start()
+        except Exception as e:
+            logger.warning(f"Barge-in disabled: {str(e)}")
+            return None
+        self.threads['barge_in'] = monitor.thread
+        return monitor
+
+    def init_search(self):
+        """Create the cached Custom Search client"""
+        self.http.timeout = (3.05, self.config['http_timeout'])
+        cache = ResponseCache(
+            self.stream_cipher,
+            ttl=self.config['web_cache_ttl'],
+            max_bytes=self.config['web_cache_max_bytes']
+        )
+        return SearchClient(
+            self.http, cache,
+            self.config['search_api_url'],
+            self.config.get('google_api_key', ''),
+            self.config.get('google_cse_id', '')
+        )
+
+    def init_fetcher(self):
+        """Create the page fetcher used by deep research"""
+        return PageFetcher(
+            self.http,
+            per_host=self.config['research_per_host'],
+            max_bytes=self.config['research_max_page_bytes']
+        )
+
+    def init_images(self):
+        """Create the image prefetch and thumbnail cache"""
+        size = self.config['image_display_size']
+        return ImagePipeline(
+            self.http,
+            size=(size, size),
+            max_bytes=self.config['image_max_bytes'],
+            max_pixels=self.config['image_max_pixels']
+        )
+
+    def init_outbox(self):
+        """Create the email outbox, picking up messages from earlier runs"""
+        return EmailOutbox(
+            self.stream_cipher,
+            self.config['smtp_host'],
+            self.config['smtp_port'],
+            username=self.config['email'],
+            password=self.config['email_password'],
+            use_ssl=self.config['smtp_ssl'],
+            starttls=self.config['smtp_starttls'],
+            max_attempts=self.config['email_max_attempts'],
+            on_status=self.report_email_status
+        )
+
+    def init_location(self):
+        """Create the location provider named in the config"""
+        if self.config['location_provider'] == 'static':
+            return StaticLocationProvider(self.config['static_location'])
+        return LocationProvider(self.stream_cipher, ttl=self.config['location_ttl'])
+
+    def init_metrics(self):
+        """Create the background metrics sampler"""
+        return MetricsSampler(
+            interval=self.config['metrics_interval'],
+            capacity=self.config['metrics_history_size']
+        )
+
+    def init_diagnostics(self):
+        """Register the health probes run by system_diagnostics"""
+        runner = DiagnosticsRunner(budget=self.config['diagnostics_budget'])
+        runner.register('cpu', self.probe_cpu)
+        runner.register('memory', self.probe_memory)
+        runner.register('disk', self.probe_disk)
+        runner.register('temperature', self.probe_temperature)
+        runner.register('battery', self.probe_battery)
+        runner.register('network', self.probe_network)
+        return runner
+
+    def init_alerts(self):
+        """Evaluate alert rules on every metrics sample"""
+        engine = AlertEngine(self.config['alert_rules'])
+        engine.subscribe(self.announce_alerts)
+        self.metrics.subscribe(engine.observe)
+        return engine
 
     def init_stt(self):
-        """Initialize speech-to-text engine"""
-        if self.config['stt_provider'] == 'google':
-            return GoogleSTT()
-        elif self.config['stt_provider'] == 'vosk':
-            return VoskSTT(self.config['stt_model'])
-        else:  # Default to Google
-            return GoogleSTT()
+        """Initialize speech-to-text: the configured recognizer with offline fallbacks"""
+        frontend = None
+        if self.config['audio_frontend']:
+            frontend = {
+                'suppression': self.config['noise_suppression'],
+                'floor': self.config['noise_floor'],
+                'agc_target': self.config['agc_target_rms'],
+                'max_gain': self.config['agc_max_gain']
+            }
+        providers = [self.config['stt_provider']] + list(self.config['stt_fallbacks'])
+        # Only download a Vosk model when Vosk is the chosen recognizer, not a fallback
+        factory = functools.partial(make_stt_engine, model_name=self.config['stt_model'],
+                                    timeout=self.config['provider_timeout'],
+                                    download=self.config['stt_provider'] == 'vosk')
+        if self.config['stt_process']:
+            # Capture and decode in a child process; audio comes back through shared memory
+            return STTWorker(functools.partial(STTProviders, providers, factory, **breaker_options(self.config)),
+                             functools.partial(MicrophoneCapture, frontend),
+                             ring_seconds=self.config['stt_ring_seconds']).start()
+        factory = functools.partial(factory, frontend=frontend)
+        return STTProviders(providers, factory, **breaker_options(self.config)).prepare()
 
     def load_config(self):
         """Load or create configuration"""
@@ -567,8 +5270,82 @@ class RakiAI:
             'tts_provider': 'pyttsx3',  # Options: pyttsx3, google, festival, marytts
             'stt_provider': 'google',    # Options: google, vosk
             'stt_model': 'en',           # Model for Vosk
+            'audio_frontend': True,      # Resample, denoise and level microphone audio before STT
+            'noise_suppression': 2.0,    # Spectral subtraction strength; 0 turns it off
+            'noise_floor': 0.1,          # Least gain left on a noisy frequency bin
+            'agc_target_rms': 3000,      # int16 RMS speech is brought to; 0 turns AGC off
+            'agc_max_gain': 10.0,        # Largest boost for quiet speakers (20 dB)
+            'stt_process': False,        # Capture and recognize in a worker process
+            'stt_ring_seconds': 30,      # Audio the worker keeps in shared memory
+            'stt_fallbacks': ['vosk'],   # Recognizers tried in order when stt_provider fails
+            'tts_fallbacks': ['pyttsx3'],# Engines tried in order when tts_provider fails
+            'provider_timeout': 5,       # Seconds a network STT/TTS request may take
+            'provider_failures': 2,      # Consecutive failures that take a provider out of rotation
+            'provider_failure_rate': 0.5,# ...or this share of its last 10 calls
+            'provider_cooldown': 30,     # Seconds before a failed provider is retried; doubles up to 5 min
+            'provider_probe_interval': 10,  # Seconds between background recovery checks
             'marytts_url': MARYTTS_SERVER,
-            'marytts_voice': ''
+            'marytts_voice': '',
+            'metrics_interval': 5,          # Seconds between metric samples
+            'metrics_history_size': 720,    # Samples kept per metric (1 hour at 5s)
+            'diagnostics_budget': 1.0,      # Seconds "diagnose" waits for probes
+            'diagnostics_host': '8.8.8.8',  # Connectivity check target
+            'diagnostics_port': 53,
+            'diagnostics_network_timeout': 3,
+            'alert_rules': DEFAULT_ALERT_RULES,
+            'scan_host': 'localhost',
+            'scan_ports': '1-1024',
+            'scan_timeout': 0.3,
+            'scan_quick_interval': 120,     # Seconds between quick port re-checks
+            'scan_full_interval': 1800,     # Seconds between full port scans
+            'location_provider': 'geocoder',  # Options: geocoder, static
+            'location_ttl': 86400,          # Seconds before a cached location is refreshed
+            'static_location': {'country': 'ET', 'city': 'Addis Ababa'},
+            'search_api_url': SEARCH_API_URL,
+            'http_timeout': 10,             # Seconds to wait for a response
+            'web_cache_ttl': 86400,         # Seconds a cached search stays valid
+            'web_cache_max_bytes': 20 * 1024 * 1024,
+            'research_pages': 5,            # Result pages read by deep research
+            'research_budget': 8,           # Seconds deep research may spend fetching
+            'research_per_host': 2,         # Simultaneous connections per host
+            'research_max_page_bytes': 1500000,
+            'image_prefetch': 5,            # Image results fetched ahead for "next image"
+            'image_display_size': 1280,     # Longest side of cached thumbnails
+            'image_max_bytes': 15 * 1024 * 1024,
+            'image_max_pixels': 60000000,
+            'command_timeout': 1800,        # Seconds before a terminal command is killed
+            'speak_command_progress': True, # Announce apt milestones while commands run
+            'command_progress_interval': 15,# Minimum seconds between progress announcements
+            'apt_command': 'apt',           # Point at a stand-in script for testing
+            'apt_cache_command': 'apt-cache',
+            'apt_use_sudo': True,
+            'install_batch_window': 3,      # Seconds to wait for more installs before running apt
+            'apt_index_max_age': 6 * 3600,  # Skip "apt update" if lists are newer than this
+            'smtp_host': 'smtp.gmail.com',  # Use localhost and smtp_ssl False for a debugging server
+            'smtp_port': 465,
+            'smtp_ssl': True,
+            'smtp_starttls': False,
+            'email_max_attempts': 6,        # Delivery attempts before giving up
+            'tracing': False,               # Record per-stage latency spans
+            'trace_file': 'raki_trace.json',# Chrome trace written on exit when tracing
+            'metrics_port': 0,              # Serve /metrics and /metrics.json here; 0 disables
+            'metrics_host': '127.0.0.1',
+            'barge_in': True,               # Stop speaking when the user talks over Raki
+            'barge_in_min_rms': 900,        # int16 RMS a frame must exceed to count as speech
+            'barge_in_ratio': 2.5,          # ...and this multiple of the room/echo baseline
+            'barge_in_frames': 3,           # Consecutive 20 ms frames before playback is cut
+            'phrase_pack': True,            # Play fixed phrases from pre-rendered audio
+            'tts_max_chunk_chars': 120,     # Longest chunk sent to the engine at once
+            'tts_first_chunk_chars': 60,    # Tighter cap on the first chunk for faster first audio
+            'scheduler_workers': 2,         # Threads running blocking background tasks
+            'scheduler_queue': 16,          # Due tasks waiting for a worker before runs are skipped
+            'state_save_delay': 0.2,        # Seconds to gather reminder/history changes into one write
+            'memory_budget_mb': 64,         # Cache and buffer memory before eviction starts; 0 = unlimited
+            'memory_eviction': 'largest',   # Who gives memory back first: largest or lru
+            'memory_check_interval': 30,    # Seconds between budget checks
+            'memory_tracing': False,        # Trace allocations from startup for "memory report"
+            'memory_trace_frames': 1,       # Stack frames tracemalloc keeps per allocation
+            'phrase_pack_file': PHRASE_PACK_FILE
         }
         
         if os.path.exists(CONFIG_FILE):
@@ -579,6 +5356,7 @@ class RakiAI:
                 logger.error(f"Error loading config: {str(e)}")
         return default_config
 
+    @traced('persist.save_config')
     def save_config(self):
         """Save configuration to file"""
         with open(CONFIG_FILE, 'w') as f:
@@ -586,14 +5364,16 @@ class RakiAI:
 
     def init_encryption(self):
         """Initialize encryption system"""
+        from cryptography.fernet import Fernet
         if not os.path.exists(KEY_FILE):
             key = Fernet.generate_key()
             with open(KEY_FILE, 'wb') as f:
                 f.write(key)
         
         with open(KEY_FILE, 'rb') as f:
-            key = f.read()
+            key = f.read().strip()
         
+        self.stream_cipher = StreamCipher(key)
         return Fernet(key)
 
     def encrypt_data(self, data):
@@ -610,22 +5390,49 @@ class RakiAI:
             return []
         
         try:
-            with open(REMINDERS_FILE, 'r') as f:
-                encrypted = f.read()
-                decrypted = self.decrypt_data(encrypted)
-                return json.loads(decrypted)
+            return list(self.stream_cipher.iter_records(REMINDERS_FILE))
         except Exception as e:
             logger.error(f"Error loading reminders: {str(e)}")
             return []
 
-    def save_reminders(self):
-        """Save encrypted reminders"""
+    @property
+    def reminders(self):
+        """Snapshot of pending reminders"""
+        return self.state.get('reminders')
+
+    @property
+    def conversation_history(self):
+        """Snapshot of recent conversation exchanges"""
+        return self.state.get('conversation_history')
+
+    def schedule_save(self, name, save):
+        """Save a collection shortly after it changes; a burst of changes shares one write"""
+        task = f'save_{name}'
+        if not self.scheduler.pending(task):
+            self.scheduler.at(task, time.time() + self.config['state_save_delay'], save)
+
+    def persist(self, name, path, wait=False):
+        """Write the newest snapshot of a collection, coalescing concurrent saves"""
         if self.incognito_mode:
             return
-            
-        encrypted = self.encrypt_data(json.dumps(self.reminders))
-        with open(REMINDERS_FILE, 'w') as f:
-            f.write(encrypted)
+        lock = self.save_locks[path]
+        # A saver that finds the lock taken returns at once; the holder
+        # re-checks after every write, so it also writes the newer version
+        while self.saved_versions.get(path) != self.state.versioned(name)[0]:
+            if not lock.acquire(blocking=wait):
+                return
+            try:
+                version, items = self.state.versioned(name)
+                if self.saved_versions.get(path) != version:
+                    self.stream_cipher.write_records(path, items)
+                    self.saved_versions[path] = version
+            finally:
+                lock.release()
+
+    @traced('persist.save_reminders')
+    def save_reminders(self):
+        """Save encrypted reminders"""
+        self.persist('reminders', REMINDERS_FILE)
 
     def load_conversation_history(self):
         """Load encrypted conversation history"""
@@ -633,56 +5440,49 @@ class RakiAI:
             return []
         
         try:
-            with open(HISTORY_FILE, 'r') as f:
-                encrypted = f.read()
-                decrypted = self.decrypt_data(encrypted)
-                return json.loads(decrypted)
+            return list(self.stream_cipher.iter_records(HISTORY_FILE))
         except Exception as e:
             logger.error(f"Error loading history: {str(e)}")
             return []
 
+    @traced('persist.save_conversation_history')
     def save_conversation_history(self):
         """Save encrypted conversation history"""
-        if self.incognito_mode:
-            return
-            
-        encrypted = self.encrypt_data(json.dumps(self.conversation_history))
-        with open(HISTORY_FILE, 'w') as f:
-            f.write(encrypted)
+        self.persist('conversation_history', HISTORY_FILE)
 
     def record_conversation(self, user_input, ai_response):
         """Record conversation context"""
         if not self.incognito_mode:
-            self.conversation_history.append({
+            # Keep only last 20 conversations; subscribers save the change
+            self.state.append('conversation_history', {
                 'time': datetime.datetime.now().isoformat(),
                 'user': user_input,
                 'ai': ai_response,
                 'language': self.current_language
-            })
-            # Keep only last 20 conversations
-            self.conversation_history = self.conversation_history[-20:]
-            self.save_conversation_history()
+            }, limit=20)
 
-    def speak(self, text, lang=None):
+    def speak(self, text, lang=None, wait=True):
         """Speak text with human-like characteristics"""
         lang = lang or self.current_language
-        self.tts.humanized_speak(text, lang)
+        return self.tts.humanized_speak(text, lang, wait)
 
-    def web_research(self, query, num_results=3):
+    def web_research(self, query, num_results=3, deep=False):
         """Perform deep web research on a topic"""
         try:
-            api_key = self.config.get('google_api_key', '')
-            cse_id = self.config.get('google_cse_id', '')
-            
-            if not api_key or not cse_id:
+            if not self.search.available():
                 return "Research unavailable. Missing API credentials."
                 
-            url = f"https://www.googleapis.com/customsearch/v1?key={api_key}&cx={cse_id}&q={query}&num={num_results}"
-            response = requests.get(url)
-            results = response.json().get('items', [])
+            if deep:
+                num_results = self.config['research_pages']
+            results = self.search.search(query, num=num_results)
             
             if not results:
                 return "No relevant information found."
+            
+            if deep:
+                summary = self.deep_research(query, results)
+                if summary:
+                    return summary
                 
             summary = f"Here's what I found about {query}:\n"
             for i, item in enumerate(results[:num_results]):
@@ -694,62 +5494,90 @@ class RakiAI:
         except Exception as e:
             return f"Research error: {str(e)}"
 
+    def deep_research(self, query, results):
+        """Read the result pages themselves and summarize them"""
+        urls = [item['link'] for item in results]
+        pages = self.fetcher.fetch_all(urls, self.config['research_budget'])
+        if not pages:
+            return None
+        
+        summary = summarize_pages(pages, query)
+        if not summary:
+            return None
+        
+        sources = "\n".join(f"   Source: {url}" for url, _ in pages)
+        return f"Here's a summary of {len(pages)} pages about {query}:\n{summary}\n{sources}"
+
     def image_search(self, query, num_images=1):
         """Search for images online"""
         try:
-            api_key = self.config.get('google_api_key', '')
-            cse_id = self.config.get('google_cse_id', '')
-            
-            if not api_key or not cse_id:
+            if not self.search.available():
                 return []
                 
-            url = f"https://www.googleapis.com/customsearch/v1?key={api_key}&cx={cse_id}&q={query}&searchType=image&num={num_images}"
-            response = requests.get(url)
-            results = response.json().get('items', [])
+            results = self.search.search(query, searchType='image', num=num_images)
             
             return [item['link'] for item in results[:num_images]]
-        except:
+        except Exception as e:
+            logger.error(f"Image search error: {str(e)}")
             return []
 
     def show_image(self, image_url):
         """Display image from URL"""
         try:
-            response = requests.get(image_url)
-            img = Image.open(io.BytesIO(response.content))
-            img.show()
+            from PIL import Image
+            path = self.images.get(image_url)
+            if not path:
+                return False
+            Image.open(path).show()
             return True
         except:
             return False
 
-    def deep_background_scan(self):
-        """Comprehensive background security and system scan"""
-        while not self.shutdown_flag:
-            try:
-                # Network security scan
-                scanner = nmap.PortScanner()
-                scanner.scan('localhost', arguments='-T4')
-                
-                # System vulnerability check
-                vuln_issues = []
-                if not os.path.exists('/etc/ssh/sshd_config'):
-                    vuln_issues.append("SSH not configured")
-                
-                # Dark web monitoring (simulated)
-                if random.random() < 0.1:  # 10% chance of detection
-                    self.speak("Security notice: Potential credential exposure detected")
-                
-                # Physical location context
-                location = geocoder.ip('me')
-                if location and location.country != "ET":
-                    self.speak(f"Notice: You appear to be accessing from {location.country}")
-                
-                # Wait 30 minutes between scans
-                time.sleep(1800)
-            except:
-                time.sleep(300)
+    def show_image_results(self, query):
+        """Search images, prefetch the top results and show the first one"""
+        images = self.image_search(query, num_images=self.config['image_prefetch'])
+        self.image_results = images
+        self.image_index = 0
+        if not images:
+            return False
+        self.images.prefetch(images)
+        return self.show_image(images[0])
+
+    def show_next_image(self):
+        """Show the next prefetched result from the last image search"""
+        while self.image_index + 1 < len(self.image_results):
+            self.image_index += 1
+            if self.show_image(self.image_results[self.image_index]):
+                return True
+        return False
+
+    def security_scan(self):
+        """Periodic security and system scan; full checks run when due"""
+        # Network security scan; only differences are reported
+        for change in self.scanner.scan():
+            self.speak(f"Security notice: {change}", wait=False)
+        
+        if time.time() - self.last_full_checks >= self.config['scan_full_interval']:
+            self.last_full_checks = time.time()
+            
+            # System vulnerability check
+            vuln_issues = []
+            if not os.path.exists('/etc/ssh/sshd_config'):
+                vuln_issues.append("SSH not configured")
+            
+            # Dark web monitoring (simulated)
+            if random.random() < 0.1:  # 10% chance of detection
+                self.speak("Security notice: Potential credential exposure detected", wait=False)
+            
+            # Physical location context (cached, never waits on the network)
+            location = self.location.current()
+            if location and location.get('country') and location['country'] != "ET":
+                self.speak(f"Notice: You appear to be accessing from {location['country']}", wait=False)
 
     def start_marytts_server(self):
         """Start MaryTTS server if not already running"""
+        import requests
+
         # Check if server is already running
         try:
             response = requests.get(f"{self.config['marytts_url']}/voices", timeout=2)
@@ -777,12 +5605,7 @@ class RakiAI:
         """Specialized Amharic speech with cultural context"""
         # Add Ethiopian flavor to responses
         if random.random() > 0.7:  # 30% chance of adding cultural element
-            cultural_addons = [
-                "እባክዎን ያስተውሉ።",
-                "በኢትዮጵያ ባህል መሠረት።",
-                "እንደምትለው ነው።"
-            ]
-            text = f"{random.choice(cultural_addons)} {text}"
+            text = f"{random.choice(CULTURAL_ADDONS)} {text}"
         
         self.speak(text, 'am')
 
@@ -794,14 +5617,7 @@ class RakiAI:
             return joke
         
         # English jokes
-        jokes = [
-            "Why do programmers prefer dark mode? Because light attracts bugs!",
-            "What do you call a computer that sings? A Dell!",
-            "Why was the computer cold? It left its Windows open!",
-            "What do you get when you cross a computer and a lifeguard? A screensaver!",
-            "Why did the computer go to the doctor? It had a virus!"
-        ]
-        joke = random.choice(jokes)
+        joke = random.choice(ENGLISH_JOKES)
         self.speak(joke)
         return joke
 
@@ -866,77 +5682,129 @@ class RakiAI:
         
         return {}
 
+    @traced('listen')
     def listen(self):
         """Capture voice input using selected engine"""
         return self.stt.listen()
 
-    def run_terminal_command(self, command):
-        """Execute terminal commands with safety checks"""
-        # Command whitelisting
-        allowed = any(cmd in command for cmd in self.config['allowed_commands'])
+    def command_problem(self, result):
+        """What went wrong with a terminal command, as a sentence"""
+        if result['status'] == 'refused':
+            return "For security reasons, I can't execute that command."
+        if result['status'] == 'timeout':
+            return f"The command timed out after {describe_duration(result['duration'])}."
+        if result['status'] == 'cancelled':
+            return "The command was cancelled."
+        return f"Error: {result['summary']}"
+
+    def speak_command_progress(self, line):
+        """Announce a command milestone such as apt's "Unpacking vlc ..." line"""
+        words = line.replace('...', '').split()
+        # Runs inside the command's event loop: queue it rather than wait for playback
+        self.speak(" ".join(words[:3]), wait=False)
+
+    def install_packages(self, text):
+        """Validate requested packages and queue them for a batched install"""
+        names = [n for n in re.split(r'[\s,]+|\band\b', text.lower()) if n.strip()]
+        problems = []
+        for name in names:
+            valid, suggestions = self.packages.check(name)
+            if not valid:
+                hint = f" Did you mean {' or '.join(suggestions)}?" if suggestions else ""
+                problems.append(f"I couldn't find a package called {name}.{hint}")
         
-        if not allowed:
-            self.speak("For security reasons, I can't execute that command.")
-            return ""
-            
-        try:
-            result = subprocess.check_output(
-                command, 
-                shell=True, 
-                text=True,
-                stderr=subprocess.STDOUT
-            )
-            return result
-        except subprocess.CalledProcessError as e:
-            return f"Error: {e.output[:100]}"
-        except Exception as e:
-            return f"Unexpected error: {str(e)}"
+        if problems:
+            return " ".join(problems)
+        self.packages.install(names)
+        return f"Installing {' and '.join(names)}. I'll let you know when it's done."
+
+    def report_install(self, names, result):
+        """Announce the outcome of a batched install"""
+        packages = " and ".join(names)
+        if result['status'] == 'ok':
+            self.speak(f"Successfully installed {packages}.")
+        else:
+            self.speak(f"Had some trouble installing {packages}. {self.command_problem(result)}")
+
+    def update_system(self):
+        """Queue a package list update (if stale) and upgrade on the package worker"""
+        self.packages.request_update()
+        return "Updating the system. I'll let you know when it's done."
+
+    def report_update(self, result):
+        """Announce the outcome of a queued update"""
+        if result['status'] == 'ok':
+            self.speak("System updated successfully.")
+        else:
+            self.speak(f"Ran into some issues during the update. {self.command_problem(result)}")
+
+    def cancel_terminal_command(self):
+        """Stop the running install or update and drop queued ones"""
+        return self.packages.cancel()
 
     def system_diagnostics(self):
         """Comprehensive system health check"""
-        issues = []
-        
-        # CPU and Memory
-        cpu_usage = psutil.cpu_percent()
+        issues, unknown = self.diagnostics.run()
+        for name in unknown:
+            issues.append(f"{name.capitalize()} status unknown")
+        return issues
+
+    def probe_cpu(self):
+        """Diagnostics probe for CPU load"""
+        cpu_usage = self.metrics.snapshot()['cpu']
         if cpu_usage > 85:
-            issues.append(f"High CPU usage: {cpu_usage}%")
-        
-        mem_usage = psutil.virtual_memory().percent
+            sustained = self.metrics.series['cpu'].duration_above(85)
+            if sustained >= 60:
+                return [f"CPU has been above 85% for {describe_duration(sustained)}"]
+            return [f"High CPU usage: {cpu_usage}%"]
+        return []
+
+    def probe_memory(self):
+        """Diagnostics probe for RAM usage and growth"""
+        issues = []
+        mem_usage = self.metrics.snapshot()['ram']
         if mem_usage > 85:
-            issues.append(f"High RAM usage: {mem_usage}%")
+            sustained = self.metrics.series['ram'].duration_above(85)
+            if sustained >= 60:
+                issues.append(f"RAM has been above 85% for {describe_duration(sustained)}")
+            else:
+                issues.append(f"High RAM usage: {mem_usage}%")
         
-        # Disk space
-        disk = shutil.disk_usage('/')
-        disk_percent = disk.percent
+        ram_trend = self.metrics.series['ram'].trend(600)
+        if ram_trend is not None and ram_trend > 1:
+            issues.append(f"RAM usage is climbing about {ram_trend:.1f}% per minute")
+        return issues
+
+    def probe_disk(self):
+        """Diagnostics probe for disk space"""
+        disk_percent = self.metrics.snapshot()['disk']
         if disk_percent > 90:
-            issues.append(f"Low disk space: {disk_percent}% used")
-        
-        # Temperature (Linux-specific)
-        try:
-            temp = psutil.sensors_temperatures()
-            if 'coretemp' in temp:
-                for entry in temp['coretemp']:
-                    if entry.current > 85:
-                        issues.append(f"High temperature: {entry.current}°C")
-        except:
-            pass
-        
-        # Battery (if available)
-        try:
-            battery = psutil.sensors_battery()
-            if battery:
-                if battery.percent < 15 and not battery.power_plugged:
-                    issues.append(f"Low battery: {battery.percent}% remaining")
-        except:
-            pass
-        
-        # Network connectivity
+            return [f"Low disk space: {disk_percent}% used"]
+        return []
+
+    def probe_temperature(self):
+        """Diagnostics probe for CPU temperature (Linux-specific)"""
+        temperature = self.metrics.snapshot()['temperature']
+        if temperature is not None and temperature > 85:
+            return [f"High temperature: {temperature}°C"]
+        return []
+
+    def probe_battery(self):
+        """Diagnostics probe for battery level (if available)"""
+        snapshot = self.metrics.snapshot()
+        battery = snapshot['battery']
+        if battery is not None and battery < 15 and not snapshot['battery_plugged']:
+            return [f"Low battery: {battery}% remaining"]
+        return []
+
+    def probe_network(self):
+        """Diagnostics probe for network connectivity"""
+        target = (self.config['diagnostics_host'], self.config['diagnostics_port'])
         try:
-            socket.create_connection(("8.8.8.8", 53), timeout=3)
+            with socket.create_connection(target, timeout=self.config['diagnostics_network_timeout']):
+                return []
         except OSError:
-            issues.append("Network connection unavailable")
-        
-        return issues
+            return ["Network connection unavailable"]
 
     def set_reminder(self, text, time_str=None):
         """Set reminder with optional time"""
@@ -972,41 +5840,45 @@ class RakiAI:
                 except:
                     remind_time = datetime.datetime.now() + datetime.timedelta(hours=1)
         
-        self.reminders.append({
+        # Subscribers save the reminders and reschedule the next one
+        self.state.append('reminders', {
             'text': text,
             'time': remind_time.timestamp(),
             'created': datetime.datetime.now().timestamp()
         })
-        self.save_reminders()
         return f"{remind_time.strftime('%H:%M')}"
 
     def check_reminders(self):
-        """Background thread to check for due reminders"""
-        while not self.shutdown_flag:
-            now = datetime.datetime.now().timestamp()
-            to_remove = []
-            
-            for i, reminder in enumerate(self.reminders):
-                if now >= reminder['time']:
-                    self.speak(f"Reminder: {reminder['text']}")
-                    to_remove.append(i)
-            
-            # Remove triggered reminders
-            for i in sorted(to_remove, reverse=True):
-                self.reminders.pop(i)
-            if to_remove:
-                self.save_reminders()
-            
-            time.sleep(60)  # Check every minute
+        """Announce due reminders, then schedule the next one"""
+        now = datetime.datetime.now().timestamp()
+        
+        # Taking due reminders is atomic, so each fires exactly once
+        for reminder in self.state.take('reminders', lambda r: now >= r['time']):
+            self.speak(f"Reminder: {reminder['text']}", wait=False)
+        self.schedule_next_reminder()
 
-    def monitor_system(self):
-        """Background thread to monitor system health"""
-        while not self.shutdown_flag:
-            time.sleep(300)  # Check every 5 minutes
-            issues = self.system_diagnostics()
-            if issues:
-                self.speak("I've detected some system issues: " + ", ".join(issues[:3]) + 
-                          ". Would you like me to attempt repairs?")
+    def schedule_next_reminder(self):
+        """Wake the scheduler exactly when the earliest reminder is due"""
+        reminders = self.reminders
+        if reminders:
+            self.scheduler.at('reminders', min(r['time'] for r in reminders), self.check_reminders)
+        else:
+            self.scheduler.cancel('reminders')
+
+    def announce_alerts(self, events):
+        """Speak alert state changes from the alert engine"""
+        # Speak only new or repeating problems; log recoveries
+        issues = []
+        for event in events:
+            if event['state'] == 'resolved':
+                logger.info(f"Alert resolved: {event['rule']}")
+            else:
+                logger.warning(f"Alert {event['state']}: {event['text']}")
+                issues.append(event['text'])
+        
+        if issues:
+            self.speak("I've detected some system issues: " + ", ".join(issues[:3]) + 
+                      ". Would you like me to attempt repairs?", wait=False)
 
     def send_email(self, to_email, subject=None, body=None):
         """Send email with voice interaction"""
@@ -1019,41 +5891,75 @@ class RakiAI:
                 self.speak("What should the message say?")
                 body = self.listen() or "No content"
             
-            msg = EmailMessage()
-            msg['Subject'] = subject
-            msg['From'] = self.config['email']
-            msg['To'] = to_email
-            msg.set_content(body)
-            
-            with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-                smtp.login(
-                    self.config['email'], 
-                    self.config['email_password']
-                )
-                smtp.send_message(msg)
-            
+            # Delivery happens in the background; the message is saved first
+            self.outbox.enqueue(to_email, subject, body, self.config['email'])
             return True
         except Exception as e:
             logger.error(f"Email error: {str(e)}")
             return False
 
+    def report_email_status(self, message, status):
+        """Announce the outcome of a queued email"""
+        if status == 'sent':
+            self.speak(f"Your email to {message['to']} was delivered.")
+        else:
+            self.speak(f"I couldn't deliver your email to {message['to']} after several attempts.")
+
+    def performance_report(self):
+        """Summarize where recent turns spent their time"""
+        if not tracer.enabled:
+            return "Tracing is off. Turn on tracing in the config to collect timings."
+        
+        report = tracer.report()
+        if not report:
+            return "No timings recorded yet."
+        
+        slowest = sorted(report.items(), key=lambda item: item[1]['total_ms'], reverse=True)[:5]
+        parts = [f"{name.replace('_', ' ')}: median {stats['p50_ms']:.0f} ms over {stats['count']} calls"
+                 for name, stats in slowest]
+        return "Performance report. " + "; ".join(parts) + "."
+
+    def memory_report(self):
+        """Summarize cache memory and, with allocation tracing, where memory grows"""
+        import tracemalloc
+        mb = 1024 * 1024
+        report = self.memory.report()
+        response = f"Caches and buffers hold {report['total'] / mb:.1f} megabytes"
+        if report['budget']:
+            response += f" of a {report['budget'] / mb:.0f} megabyte budget"
+        largest = [f"{name.replace('_', ' ')} {size / mb:.1f}" for name, size in list(report['owners'].items())[:3] if size]
+        if largest:
+            response += ". Largest: " + ", ".join(largest) + " megabytes"
+        
+        sites = self.memory.allocation_sites()
+        if sites is None:
+            tracemalloc.start(self.config['memory_trace_frames'])
+            self.memory.allocation_sites()  # Baseline for the next report
+            return response + ". Allocation tracing is on now; ask again later to hear where memory grows."
+        for site, size, grown, count in sites:
+            logger.info(f"Allocation site {site}: {size} bytes in {count} blocks, {grown:+d} since last report")
+        top = "; ".join(f"{site}, {size / mb:.1f} megabytes, {grown / 1024:+.0f} kilobytes"
+                        for site, size, grown, count in sites[:3])
+        return response + ". Top allocation sites: " + top + "."
+
     def system_info(self):
         """Provide detailed system information"""
+        snapshot = self.metrics.snapshot()
         info = [
             f"OS: {platform.system()} {platform.release()}",
-            f"CPU: {psutil.cpu_percent()}% usage",
-            f"Memory: {psutil.virtual_memory().percent}% used",
-            f"Disk: {shutil.disk_usage('/').percent}% full"
+            f"CPU: {snapshot['cpu']}% usage",
+            f"Memory: {snapshot['ram']}% used",
+            f"Disk: {snapshot['disk']}% full"
         ]
         
+        # Add recent averages once there is enough history
+        cpu_average = self.metrics.series['cpu'].mean(600)
+        if cpu_average is not None and self.metrics.series['cpu'].count > 1:
+            info.append(f"CPU average over 10 minutes: {cpu_average:.0f}%")
+        
         # Add temperature if available
-        try:
-            temp = psutil.sensors_temperatures()
-            if 'coretemp' in temp:
-                core_temp = temp['coretemp'][0].current
-                info.append(f"Temperature: {core_temp}°C")
-        except:
-            pass
+        if snapshot['temperature'] is not None:
+            info.append(f"Temperature: {snapshot['temperature']}°C")
         
         return ", ".join(info)
 
@@ -1079,9 +5985,14 @@ class RakiAI:
     def wipe_history(self):
         """Delete all stored data"""
         try:
-            for f in [REMINDERS_FILE, CONFIG_FILE, HISTORY_FILE]:
+            for f in [REMINDERS_FILE, CONFIG_FILE, HISTORY_FILE, LOCATION_CACHE_FILE, OUTBOX_FILE]:
                 if os.path.exists(f):
                     os.remove(f)
+            if self.search:
+                self.search.cache.clear()
+            if os.path.isdir(IMAGE_CACHE_DIR):
+                shutil.rmtree(IMAGE_CACHE_DIR)
+                os.makedirs(IMAGE_CACHE_DIR)
             return True
         except:
             return False
@@ -1090,8 +6001,11 @@ class RakiAI:
         """Toggle incognito mode"""
         self.incognito_mode = enable
 
+    @traced('process_command')
     def process_command(self, command):
         """Process voice commands with enhanced capabilities"""
+        started = time.perf_counter()
+        intent = 'conversation'  # Metrics label; each branch below sets its own
         user_input = command
         response = ""
         lang = self.current_language
@@ -1099,57 +6013,69 @@ class RakiAI:
         # Amharic language processing
         if lang == 'am':
             if "ሰላም" in command or "ጤና" in command:
-                response = "ሰላም! እንዴት ልርዶዎ?"
+                intent = 'greeting'
+                response = CANNED_REPLIES['am']['greeting']
             elif "አድርግ" in command or "ረዳ" in command:
-                response = "እባክዎ ያስቀምጡ፣ ወዲያው እሠራለሁ!"
+                intent = 'help'
+                response = CANNED_REPLIES['am']['help']
             elif "ምስል" in command:
+                intent = 'image_search'
                 search_term = command.replace("ምስል", "").strip()
-                images = self.image_search(search_term)
-                if images:
-                    self.show_image(images[0])
+                if self.show_image_results(search_term):
                     response = f"ይህ ምስል ላይ እያሳየ ነው: {search_term}"
                 else:
-                    response = "ምስል ማግኘት አልቻልኩም። ይቅርታ!"
+                    response = CANNED_REPLIES['am']['image_failed']
             elif "ፈልግ" in command:
+                intent = 'research'
                 topic = command.replace("ፈልግ", "").strip()
                 research = self.web_research(topic)
-                response = f"ስለ {topic} ያገኘሁት መረጃ: {research[:200]}..." if research else "መረጃ ማግኘት አልቻልኩም።"
+                response = f"ስለ {topic} ያገኘሁት መረጃ: {research[:200]}..." if research else CANNED_REPLIES['am']['research_failed']
             elif "ቀልድ" in command:
+                intent = 'joke'
                 joke = self.tell_joke('am')
                 response = joke
             elif "ታሪክ" in command or "ፕሮግራም" in command:
-                response = "ራኪ ኤአይ በራኪቦይ ኦኤስ ላይ የሚሰራ የኢትዮጵያ ሰው ሰራሽ አስማት ነው። በፓይዘን ተገንብቶ በኢትዮጵያ ባህል እና ቋንቋ የተለየ ነው!"
+                intent = 'about'
+                response = CANNED_REPLIES['am']['about']
             else:
                 response = self.deep_conversation(command)
         
         # English commands
         else:
             # System commands
-            if 'install' in command:
+            if CANCEL_PATTERN.fullmatch(command.strip()):
+                intent = 'cancel_command'
+                cancelled = self.cancel_terminal_command()
+                response = CANNED_REPLIES['en']['cancelling' if cancelled else 'nothing_to_cancel']
+            
+            elif 'install' in command:
+                intent = 'install'
                 pkg = re.search(r'install (.+)', command)
                 if pkg:
-                    pkg_name = pkg.group(1).strip()
-                    result = self.run_terminal_command(f"sudo apt install {pkg_name} -y")
-                    if "Error" not in result:
-                        response = f"Successfully installed {pkg_name}."
-                    else:
-                        response = f"Had some trouble installing {pkg_name}. {result}"
+                    response = self.install_packages(pkg.group(1).strip())
                 else:
-                    response = "Please specify which package you'd like me to install."
+                    response = CANNED_REPLIES['en']['install_missing']
             
             elif 'update' in command or 'upgrade' in command:
-                result = self.run_terminal_command("sudo apt update && sudo apt upgrade -y")
-                if "Error" not in result:
-                    response = "System updated successfully."
-                else:
-                    response = "Ran into some issues during the update. " + result
+                intent = 'update'
+                response = self.update_system()
+            
+            elif 'performance report' in command:
+                intent = 'performance_report'
+                response = self.performance_report()
+            
+            elif 'memory report' in command:
+                intent = 'memory_report'
+                response = self.memory_report()
             
             elif 'diagnos' in command:
+                intent = 'diagnostics'
                 issues = self.system_diagnostics()
-                response = "All systems normal." if not issues else "Issues found: " + ", ".join(issues[:3])
+                response = CANNED_REPLIES['en']['diagnostics_ok'] if not issues else "Issues found: " + ", ".join(issues[:3])
             
             # Personal productivity
             elif 'remind' in command:
+                intent = 'reminder'
                 match = re.search(r'remind me (?:to )?(.+) (?:at|in) (.+)', command)
                 if match:
                     reminder_text = match.group(1).strip()
@@ -1158,77 +6084,92 @@ class RakiAI:
                     response = f"Reminder set for {reminder_text} at {remind_time}."
             
             elif 'email' in command:
+                intent = 'email'
                 match = re.search(r'email (.+?) (?:about )?(.+)', command)
                 if match:
                     recipient = match.group(1).strip()
-                    message = match.group(2].strip()
+                    message = match.group(2).strip()
                     if self.send_email(recipient, body=message):
-                        response = f"Email sent to {recipient}."
+                        response = f"Sending your email to {recipient}."
             
             # Web capabilities
+            elif 'deep research' in command:
+                intent = 'deep_research'
+                topic = command.replace("deep research", "").strip()
+                research = self.web_research(topic, deep=True)
+                response = research[:1200] if research else CANNED_REPLIES['en']['no_research']
+            
             elif 'research' in command or 'search web' in command:
+                intent = 'research'
                 topic = command.replace("research", "").replace("search web", "").strip()
                 research = self.web_research(topic)
-                response = research[:250] + "..." if research else "No research results found."
+                response = research[:250] + "..." if research else CANNED_REPLIES['en']['no_research']
+            
+            elif 'next image' in command:
+                intent = 'next_image'
+                if self.show_next_image():
+                    response = CANNED_REPLIES['en']['next_image']
+                else:
+                    response = CANNED_REPLIES['en']['no_more_images']
             
             elif 'image' in command and 'search' in command:
+                intent = 'image_search'
                 search_term = command.replace("image", "").replace("search", "").strip()
-                images = self.image_search(search_term)
-                if images:
-                    self.show_image(images[0])
+                if self.show_image_results(search_term):
                     response = f"Showing image of {search_term}"
             
             # Conversation
             elif 'joke' in command:
+                intent = 'joke'
                 self.tell_joke()
-                response = "Hope that brought a smile!"
+                response = CANNED_REPLIES['en']['after_joke']
             
             elif 'discuss' in command or 'talk about' in command:
+                intent = 'discuss'
                 topic = command.replace("discuss", "").replace("talk about", "").strip()
                 response = self.deep_conversation(topic)
             
             # Language control
             elif 'amharic' in command:
+                intent = 'language'
                 self.current_language = 'am'
-                response = "አማርኛ ተናገር! እባክዎ ያስቀምጡ።"
+                response = CANNED_REPLIES['am']['language']
             
             # Privacy features
             elif 'incognito' in command:
+                intent = 'incognito'
                 enable = 'enable' in command or 'on' in command
                 self.set_incognito(enable)
-                response = f"Incognito mode {'enabled' if enable else 'disabled'}."
+                response = CANNED_REPLIES['en']['incognito_on' if enable else 'incognito_off']
             
             elif 'wipe history' in command:
+                intent = 'wipe_history'
                 if self.wipe_history():
-                    response = "All personal data erased."
+                    response = CANNED_REPLIES['en']['erased']
             
             # Conversational responses
             elif any(greet in command for greet in ['hello', 'hi', 'hey']):
-                responses = ["Hello! How can I assist you today?"]
-                response = random.choice(responses)
+                intent = 'greeting'
+                response = random.choice(CANNED_REPLIES['en']['greeting'])
             
             elif any(thanks in command for thanks in ['thank', 'thanks', 'appreciate']):
-                responses = ["You're welcome! Always happy to help."]
-                response = random.choice(responses)
+                intent = 'thanks'
+                response = random.choice(CANNED_REPLIES['en']['thanks'])
             
             elif 'how are you' in command:
-                responses = ["I'm functioning perfectly! How can I assist you today?"]
-                response = random.choice(responses)
+                intent = 'how_are_you'
+                response = random.choice(CANNED_REPLIES['en']['how_are_you'])
             
             # Ethiopian cultural context
             elif 'ethiopia' in command:
-                responses = [
-                    "Ethiopia is the cradle of humanity with a rich cultural heritage dating back millennia.",
-                    "Did you know Ethiopia has its own calendar with 13 months?",
-                    "Ethiopian coffee is considered some of the finest in the world!"
-                ]
-                response = random.choice(responses)
+                intent = 'ethiopia'
+                response = random.choice(CANNED_REPLIES['en']['ethiopia'])
             
             # Exit command
             elif any(exit_cmd in command for exit_cmd in ['exit', 'stop', 'sleep']):
+                intent = 'exit'
                 self.shutdown_flag = True
-                responses = ["Goodbye! Feel free to call if you need anything."]
-                response = random.choice(responses)
+                response = random.choice(CANNED_REPLIES['en']['goodbye'])
             
             else:
                 response = self.deep_conversation(command)
@@ -1241,44 +6182,78 @@ class RakiAI:
                 self.speak(response)
             self.record_conversation(user_input, response)
         
+        COMMANDS_TOTAL.inc(intent=intent)
+        COMMAND_SECONDS.observe(time.perf_counter() - started, intent=intent)
         return not self.shutdown_flag
 
+    def greet(self):
+        """Speak an opening line and record time to first greeting"""
+        openings = OPENINGS['am' if self.current_language == 'am' else 'en']
+        self.startup_timings['first_greeting'] = time.perf_counter() - _MODULE_LOAD_START
+        self.speak(random.choice(openings), self.current_language)
+
     def main_loop(self):
         """Main interaction loop with enhanced capabilities"""
-        if self.current_language == 'am':
-            openings = [
-                "ሰላም! ራኪ ኤአይ ነኝ። እንዴት ልርዶዎ?",
-                "ቀን በሰላም! ረዳት ሆኜ ሊገኝ እችላለሁ። እባክዎን ያስቀምጡ።",
-                "ሰላምታ! ዛሬ ምን ላድርግ ይፈልጋሉ?"
-            ]
-        else:
-            openings = [
-                "Hello! I'm Raki AI, your personal assistant. How can I help?",
-                "Good day! I'm here and ready to assist. What can I do for you?",
-                "Raki AI activated. How may I assist you today?"
-            ]
+        self.greet()
         
-        self.speak(random.choice(openings), self.current_language)
+        # Wait for speech recognition and saved state before listening
+        self.ready.wait()
+        if self.startup_error:
+            raise self.startup_error
         
         while not self.shutdown_flag:
             command = self.listen()
             if command:
                 if 'help' in command or 'ርዱ' in command:
-                    if self.current_language == 'am':
-                        help_msg = "የምሠራው ነገር፦ መተግበሪያ መጫን፣ ስርዓት ማደስ፣ ችግር መፈተስ፣ አስታውስት ማስቀመጥ፣ ኢሜል ላክ፣ ድረገጽ ክፈት፣ ቋንቋ ቀይር፣ የምስል ፍለጋ፣ የድረገጽ ፍለጋ፣ ቀልድ ንገር። ምን ትፈልጋለህ?"
-                    else:
-                        help_msg = "I can help with: Installing software, system updates, diagnostics, " \
-                                  "setting reminders, sending emails, web research, image search, " \
-                                  "changing languages, telling jokes, and more. What would you like to do?"
+                    help_msg = HELP_MESSAGES['am' if self.current_language == 'am' else 'en']
                     self.speak(help_msg, self.current_language)
                 else:
                     self.process_command(command)
 
+MODULE_IMPORT_TIME = time.perf_counter() - _MODULE_LOAD_START
+
+def print_performance_report(path):
+    """Print per-stage latency from an exported Chrome trace"""
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    report = Tracer.summarize(events)
+    print(f"{'stage':36} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'total ms':>10}")
+    for name, stats in sorted(report.items(), key=lambda item: item[1]['total_ms'], reverse=True):
+        print(f"{name:36} {stats['count']:>6} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+              f"{stats['max_ms']:>9.1f} {stats['total_ms']:>10.1f}")
+
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Raki AI voice assistant")
+    parser.add_argument('--trace', metavar='FILE', help="record spans and write a Chrome trace to FILE on exit")
+    parser.add_argument('--performance-report', metavar='FILE', help="print a latency report from a trace file and exit")
+    parser.add_argument('--build-phrase-pack', action='store_true', help="pre-render fixed phrases for the configured engine and exit")
+    args = parser.parse_args()
+    
+    if args.performance_report:
+        print_performance_report(args.performance_report)
+        raise SystemExit(0)
+    
+    if args.trace:
+        tracer.enabled = True
+    
     assistant = RakiAI()
     
     # Start MaryTTS server if selected
     if assistant.config['tts_provider'] == 'marytts':
         assistant.start_marytts_server()
     
-    assistant.main_loop()
+    if args.build_phrase_pack:
+        pack = assistant.tts.player.phrases or PhrasePack(assistant.config['phrase_pack_file']).open()
+        assistant.tts.update_phrase_pack(pack, static_phrases(), wait=True)
+        print(f"Phrase pack {pack.path}: {pack.stats['clips']} clips, {pack.stats['bytes']} bytes")
+        raise SystemExit(0)
+    
+    try:
+        assistant.main_loop()
+    finally:
+        assistant.shutdown()
+        if tracer.enabled:
+            path = tracer.export_chrome(args.trace or assistant.config['trace_file'])
+            logger.info(f"Trace written to {path}")